@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+NyayaSetu AI - Approximate nearest-neighbour index
+Inverted-file (IVF) index over pre-normalized chunk embeddings: spherical k-means
+centroids partition the rows, and a query only scores the nprobe closest lists
+"""
+
+import json
+import time
+from typing import List, Dict, Any, Optional
+from pathlib import Path
+
+import numpy as np
+
+# Package-relative when imported as src.rag, sibling modules when run as a script
+if __package__:
+    from .kb_index import normalize_rows, top_k_indices
+else:
+    from kb_index import normalize_rows, top_k_indices
+
+ANN_INDEX_FILE = "ann_ivf.npz"
+ANN_REPORT_FILE = "ann_report.json"
+
+
+def kmeans(vectors: np.ndarray, n_clusters: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit vectors; returns normalized centroids"""
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].astype(np.float32)
+
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        counts = np.bincount(assignment, minlength=n_clusters)
+
+        # Re-seed empty clusters from random rows so every list stays usable
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+
+        updated = normalize_rows(sums)
+        if np.allclose(updated, centroids):
+            break
+        centroids = updated
+
+    return centroids
+
+
+class IVFIndex:
+    """Inverted lists of row ids grouped by nearest k-means centroid"""
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def n_rows(self) -> int:
+        """Number of store rows assigned to the inverted lists"""
+        return len(self.rows)
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, n_lists: Optional[int] = None, iterations: int = 20,
+              seed: int = 0, max_train_size: int = 100_000) -> "IVFIndex":
+        """Cluster pre-normalized embeddings into n_lists inverted lists"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if n_lists is None:
+            n_lists = max(1, int(round(np.sqrt(len(embeddings)))))
+
+        # Centroids are trained on a sample; every row is then assigned
+        rng = np.random.default_rng(seed)
+        train = embeddings
+        if len(embeddings) > max_train_size:
+            train = embeddings[np.sort(rng.choice(len(embeddings), max_train_size, replace=False))]
+
+        centroids = kmeans(train, n_lists, iterations=iterations, seed=seed)
+        assignment = np.argmax(embeddings @ centroids.T, axis=1)
+
+        rows = np.argsort(assignment, kind='stable').astype(np.int64)
+        counts = np.bincount(assignment, minlength=len(centroids))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        return cls(centroids, offsets, rows)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Row ids in the nprobe lists closest to a normalized query"""
+        nprobe = max(1, min(nprobe, self.n_lists))
+        probes = top_k_indices(self.centroids @ query, nprobe)
+        return np.concatenate([self.rows[self.offsets[p]:self.offsets[p + 1]] for p in probes])
+
+    def save(self, path):
+        """Write the index as an uncompressed .npz archive"""
+        np.savez(path, centroids=self.centroids, offsets=self.offsets, rows=self.rows)
+
+    @classmethod
+    def load(cls, path) -> "IVFIndex":
+        """Read an index written by save()"""
+        with np.load(path) as data:
+            return cls(data['centroids'], data['offsets'], data['rows'])
+
+
+def synthetic_queries(embeddings: np.ndarray, n_queries: int = 200, noise: float = 0.05, seed: int = 0) -> np.ndarray:
+    """Query vectors that blend two random chunks plus noise, for recall measurement"""
+    rng = np.random.default_rng(seed)
+    first = embeddings[rng.integers(0, len(embeddings), n_queries)]
+    second = embeddings[rng.integers(0, len(embeddings), n_queries)]
+    mix = rng.uniform(0.5, 1.0, (n_queries, 1)).astype(np.float32)
+    queries = mix * first + (1 - mix) * second
+    queries += rng.normal(0, noise, queries.shape).astype(np.float32)
+    return normalize_rows(queries)
+
+
+def recall_report(embeddings: np.ndarray, ivf: IVFIndex, queries: Optional[np.ndarray] = None,
+                  k: int = 10, nprobes: Optional[List[int]] = None) -> Dict[str, Any]:
+    """Recall@k and latency of the IVF search against the exact scan, per nprobe"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if queries is None:
+        queries = synthetic_queries(embeddings)
+    if nprobes is None:
+        nprobes = sorted({n for n in (1, 2, 4, 8, 16, 32) if n <= ivf.n_lists} | {ivf.n_lists})
+
+    start = time.perf_counter()
+    exact = [set(top_k_indices(embeddings @ q, k).tolist()) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    settings = []
+    for nprobe in nprobes:
+        found = 0
+        scanned = 0
+        start = time.perf_counter()
+        for q, truth in zip(queries, exact):
+            rows = ivf.candidates(q, nprobe)
+            scanned += len(rows)
+            best = rows[top_k_indices(embeddings[rows] @ q, k)]
+            found += len(truth.intersection(best.tolist()))
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        settings.append({
+            'nprobe': nprobe,
+            f'recall@{k}': found / sum(len(truth) for truth in exact),
+            'avg_rows_scanned': scanned / len(queries),
+            'avg_latency_ms': elapsed_ms
+        })
+
+    return {
+        'n_rows': len(embeddings),
+        'n_lists': ivf.n_lists,
+        'n_queries': len(queries),
+        'k': k,
+        'exact_avg_latency_ms': exact_ms,
+        'settings': settings
+    }
+
+
+def print_recall_report(report: Dict[str, Any]):
+    """Print a recall report as a table"""
+    k = report['k']
+    print(f"IVF recall report: {report['n_rows']} rows, {report['n_lists']} lists, "
+          f"{report['n_queries']} queries, exact scan {report['exact_avg_latency_ms']:.3f} ms/query")
+    print(f"  {'nprobe':>6}  {f'recall@{k}':>10}  {'rows scanned':>12}  {'ms/query':>8}")
+    for setting in report['settings']:
+        print(f"  {setting['nprobe']:>6}  {setting[f'recall@{k}']:>10.3f}  "
+              f"{setting['avg_rows_scanned']:>12.1f}  {setting['avg_latency_ms']:>8.3f}")
+
+
+def build_ann_index(embeddings: np.ndarray, output_dir, n_lists: Optional[int] = None, k: int = 10) -> Dict[str, Any]:
+    """Build, save and evaluate an IVF index next to the knowledge base"""
+    output_dir = Path(output_dir)
+    ivf = IVFIndex.build(embeddings, n_lists=n_lists)
+    ivf.save(output_dir / ANN_INDEX_FILE)
+
+    report = recall_report(embeddings, ivf, k=min(k, len(embeddings)))
+    with open(output_dir / ANN_REPORT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def remove_ann_index(output_dir):
+    """Delete a stale IVF index and recall report left by an earlier build"""
+    for name in (ANN_INDEX_FILE, ANN_REPORT_FILE):
+        path = Path(output_dir) / name
+        if path.exists():
+            path.unlink()
+
+
+def main():
+    """Build an IVF index for an existing knowledge base and report recall"""
+    import argparse
+    if __package__:
+        from .kb_store import load_embedding_matrix
+    else:
+        from kb_store import load_embedding_matrix
+
+    project_root = Path(__file__).parent.parent.parent
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--kb-dir", default=str(project_root / "knowledge_base"), help="Knowledge base directory")
+    parser.add_argument("--lists", type=int, default=None, help="Number of inverted lists (default: sqrt of rows)")
+    parser.add_argument("--k", type=int, default=10, help="Recall cut-off")
+    args = parser.parse_args()
+
+    embeddings = load_embedding_matrix(args.kb_dir)
+    report = build_ann_index(embeddings, args.kb_dir, n_lists=args.lists, k=args.k)
+    print_recall_report(report)
+    print(f"✓ Saved IVF index: {Path(args.kb_dir) / ANN_INDEX_FILE}")
+
+
+if __name__ == "__main__":
+    main()
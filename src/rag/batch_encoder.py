@@ -0,0 +1,111 @@
+"""
+NyayaSetu AI - Batched embedding encoder
+Throughput controls for offline embedding: explicit batch size, length-sorted
+batches to minimize padding, torch thread control and an optional pool of
+encoder processes for CPU-only hosts
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+
+# Per-process model used by pool workers
+_worker_model = None
+
+
+def set_torch_threads(threads: int):
+    """Limit torch intra-op parallelism in this process"""
+    import torch
+    torch.set_num_threads(threads)
+
+
+def _init_worker(model_name: str, threads: int, backend: str = 'torch', model_path: Optional[str] = None):
+    """Pool initializer: pin thread count, then load the model once per worker"""
+    global _worker_model
+    # Set before torch loads so OpenMP/MKL pools are sized to match
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+    try:
+        set_torch_threads(threads)
+    except ImportError:
+        pass
+
+    if __package__:
+        from .encoders import load_encoder
+    else:
+        from encoders import load_encoder
+    _worker_model = load_encoder(backend, model_name, model_path, threads=threads)
+
+
+def _encode_batch(texts: List[str]) -> np.ndarray:
+    """Worker: encode one length-homogeneous batch"""
+    return np.asarray(_worker_model.encode(texts, batch_size=len(texts), show_progress_bar=False), dtype=np.float32)
+
+
+class BatchEncoder:
+    """Encoder with the SentenceTransformer.encode interface, tuned for throughput"""
+
+    def __init__(self, model, model_name: str, batch_size: int = 32, sort_by_length: bool = True,
+                 torch_threads: Optional[int] = None, workers: int = 0, backend: str = 'torch',
+                 model_path: Optional[str] = None):
+        self.model = model
+        self.model_name = model_name
+        self.backend = backend
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.sort_by_length = sort_by_length
+        self.torch_threads = torch_threads
+        self.workers = workers
+        self._pool = None
+
+        if torch_threads:
+            try:
+                set_torch_threads(torch_threads)
+            except ImportError:
+                pass
+
+    def text_lengths(self, texts: List[str]) -> np.ndarray:
+        """Token lengths from the model's tokenizer (one batched call), else character lengths"""
+        tokenizer = getattr(self.model, 'tokenizer', None)
+        if tokenizer is not None:
+            return np.array([len(ids) for ids in tokenizer(texts, add_special_tokens=False)['input_ids']])
+        return np.array([len(text) for text in texts])
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False, **encode_kwargs) -> np.ndarray:
+        """Embed texts; rows come back in the order of texts"""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        # Longest first, so each batch pads to a similar length (and the pool starts on the slow ones)
+        order = np.argsort(-self.text_lengths(texts), kind='stable') if self.sort_by_length else np.arange(len(texts))
+        sorted_texts = [texts[i] for i in order]
+
+        if self.workers > 1:
+            batches = [sorted_texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+            encoded = np.vstack(list(self.pool().map(_encode_batch, batches)))
+        else:
+            encoded = np.asarray(self.model.encode(sorted_texts, batch_size=self.batch_size,
+                                                   show_progress_bar=show_progress_bar, **encode_kwargs), dtype=np.float32)
+
+        embeddings = np.empty_like(encoded)
+        embeddings[order] = encoded
+        return embeddings
+
+    def pool(self) -> ProcessPoolExecutor:
+        """Worker processes, each holding its own model, started on first use"""
+        if self._pool is None:
+            threads = self.torch_threads or max(1, (os.cpu_count() or 1) // self.workers)
+            # Spawned (not forked) so workers never inherit the parent's torch thread pools
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_worker, initargs=(self.model_name, threads, self.backend, self.model_path))
+        return self._pool
+
+    def close(self):
+        """Stop the worker pool, if any"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
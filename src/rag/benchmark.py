@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+NyayaSetu AI - Retrieval benchmark
+Reproducible latency and quality benchmark: cold load, encode and scoring
+latency, end-to-end percentiles for single and batched queries across
+synthetically scaled knowledge bases, and recall@k on labelled queries
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Callable
+from pathlib import Path
+
+import numpy as np
+
+# Package-relative when imported as src.rag, sibling modules when run as a script
+if __package__:
+    from .kb_index import KnowledgeBaseIndex, normalize_rows, filter_value
+    from .lexical_index import LexicalIndex
+    from .ann_index import synthetic_queries
+    from .retrieval_service import percentile
+    from .test_rag_query import load_index, load_model, search_many, default_kb_dir, SEARCH_MODES
+    from .encoders import add_encoder_arguments
+else:
+    from kb_index import KnowledgeBaseIndex, normalize_rows, filter_value
+    from lexical_index import LexicalIndex
+    from ann_index import synthetic_queries
+    from retrieval_service import percentile
+    from test_rag_query import load_index, load_model, search_many, default_kb_dir, SEARCH_MODES
+    from encoders import add_encoder_arguments
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+DEFAULT_QUERIES = PROJECT_ROOT / "data" / "eval" / "cpa2019_queries.json"
+
+
+def load_labelled_queries(path) -> List[Dict[str, Any]]:
+    """Labelled queries: [{"query": ..., "sections": ["Section 35", ...]}, ...]"""
+    with open(path, 'r', encoding='utf-8') as f:
+        labelled = json.load(f)
+    for item in labelled:
+        if not item.get('query') or not item.get('sections'):
+            raise ValueError(f"Labelled query needs 'query' and 'sections': {item}")
+    return labelled
+
+
+def latency_summary(samples_ms: List[float]) -> Dict[str, float]:
+    """Mean and nearest-rank percentiles of latency samples in milliseconds"""
+    return {
+        'n': len(samples_ms),
+        'mean': float(np.mean(samples_ms)) if samples_ms else 0.0,
+        'p50': percentile(samples_ms, 50),
+        'p95': percentile(samples_ms, 95),
+        'p99': percentile(samples_ms, 99),
+        'max': max(samples_ms, default=0.0)
+    }
+
+
+def time_calls(fn: Callable, inputs: list, warmup: int = 1) -> List[float]:
+    """Milliseconds taken by fn on each input (after untimed warm-up calls)"""
+    for item in inputs[:warmup]:
+        fn(item)
+    samples = []
+    for item in inputs:
+        start = time.perf_counter()
+        fn(item)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def batches_of(items: list, batch_size: int, n_batches: int) -> List[list]:
+    """n_batches batches of batch_size items, cycling through items"""
+    return [
+        [items[(b * batch_size + i) % len(items)] for i in range(batch_size)]
+        for b in range(n_batches)
+    ]
+
+
+def scale_index(base: KnowledgeBaseIndex, factor: int, noise: float = 0.02, seed: int = 0) -> KnowledgeBaseIndex:
+    """Knowledge base factor times the size of base: the real rows plus perturbed synthetic copies"""
+    if factor <= 1:
+        return base
+
+    rng = np.random.default_rng(seed)
+    embeddings = np.asarray(base.embeddings, dtype=np.float32)
+    blocks = [embeddings]
+    chunks = list(base.chunks)
+    for copy in range(1, factor):
+        blocks.append(embeddings + rng.normal(0, noise, embeddings.shape).astype(np.float32))
+        # Copies keep their section labels (so recall stays measurable) under a distinct act
+        for chunk in base.chunks:
+            metadata = dict(chunk['metadata'])
+            metadata['act'] = f"{metadata.get('act', '')} (synthetic copy {copy})"
+            chunks.append({'text': chunk['text'], 'metadata': metadata})
+
+    index = KnowledgeBaseIndex(chunks, embeddings=normalize_rows(np.vstack(blocks)))
+    if base.lexical is not None:
+        index.lexical = LexicalIndex.build(chunk['text'] for chunk in chunks)
+    return index
+
+
+def recall_at_k(all_results: List[List[Dict[str, Any]]], labelled: List[Dict[str, Any]],
+                ks: List[int]) -> Dict[str, float]:
+    """Share of queries with a labelled section in the top k, and mean reciprocal rank"""
+    first_hits = []
+    for results, item in zip(all_results, labelled):
+        wanted = set(item['sections'])
+        sections = [filter_value('section', result['metadata']['section']) for result in results]
+        first_hits.append(next((rank for rank, section in enumerate(sections, 1) if section in wanted), None))
+
+    report = {f'recall@{k}': sum(1 for hit in first_hits if hit is not None and hit <= k) / len(labelled) for k in ks}
+    report[f'mrr@{max(ks)}'] = sum(1 / hit for hit in first_hits if hit is not None) / len(labelled)
+    return report
+
+
+def measure_cold_load(kb_dir) -> Dict[str, float]:
+    """Import and index load in a fresh interpreter, as a service or CLI start pays it"""
+    code = (
+        "import time; start = time.perf_counter()\n"
+        "from test_rag_query import load_index\n"
+        "imported = time.perf_counter()\n"
+        f"load_index({str(kb_dir)!r})\n"
+        "print((imported - start) * 1000, (time.perf_counter() - imported) * 1000)\n"
+    )
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parent,
+                               capture_output=True, text=True, check=True)
+    process_ms = (time.perf_counter() - start) * 1000
+    import_ms, load_ms = (float(value) for value in completed.stdout.split()[-2:])
+    return {'process_ms': process_ms, 'import_ms': import_ms, 'index_load_ms': load_ms}
+
+
+def available_modes(index: KnowledgeBaseIndex, model, modes: List[str]) -> List[str]:
+    """Requested modes that this index and model can serve"""
+    usable = []
+    for mode in modes:
+        if mode in ('dense', 'hybrid') and model is None:
+            continue
+        if mode in ('lexical', 'hybrid') and index.lexical is None:
+            continue
+        usable.append(mode)
+    return usable
+
+
+def benchmark_size(index: KnowledgeBaseIndex, factor: int, model, labelled: List[Dict[str, Any]],
+                   query_embeddings: np.ndarray, modes: List[str], ks: List[int],
+                   batch_size: int, repeat: int) -> Dict[str, Any]:
+    """Scoring, end-to-end and recall measurements on one knowledge base size"""
+    queries = [item['query'] for item in labelled]
+    top_k = max(ks)
+    n_batches = max(1, len(queries) * repeat // batch_size)
+
+    # Scoring only: precomputed query vectors against the matrix
+    rows = [query_embeddings[i % len(query_embeddings)][None, :] for i in range(len(queries) * repeat)]
+    vector_batches = [np.vstack(batch) for batch in batches_of(list(query_embeddings), batch_size, n_batches)]
+    scoring_single = time_calls(lambda q: index.search_matrix(q, top_k=top_k), rows)
+    scoring_batched = time_calls(lambda q: index.search_matrix(q, top_k=top_k), vector_batches)
+
+    report = {
+        'factor': factor,
+        'rows': len(index),
+        'scoring': {
+            'single': latency_summary(scoring_single),
+            'batched': latency_summary(scoring_batched),
+            'batched_per_query': latency_summary([ms / batch_size for ms in scoring_batched])
+        },
+        'end_to_end': {},
+        'recall': {}
+    }
+
+    for mode in available_modes(index, model, modes):
+        # No embedding or result caches, so every query pays the full encode + rank
+        search = lambda batch: search_many(batch, index, model, top_k=top_k, mode=mode)
+        single = time_calls(lambda query: search([query]), queries * repeat)
+        batched = time_calls(search, batches_of(queries, batch_size, n_batches))
+        report['end_to_end'][mode] = {
+            'single': latency_summary(single),
+            'batched': latency_summary(batched),
+            'batched_per_query': latency_summary([ms / batch_size for ms in batched])
+        }
+        report['recall'][mode] = recall_at_k(search(queries), labelled, ks)
+
+    return report
+
+
+def run_benchmark(kb_dir=None, queries_path=DEFAULT_QUERIES, factors: Optional[List[int]] = None,
+                  ks: Optional[List[int]] = None, modes: Optional[List[str]] = None, batch_size: int = 16,
+                  repeat: int = 3, use_model: bool = True, seed: int = 0, encoder: str = 'torch',
+                  encoder_path: Optional[str] = None) -> Dict[str, Any]:
+    """Run the full benchmark and return the machine-readable report"""
+    kb_dir = Path(kb_dir) if kb_dir is not None else default_kb_dir()
+    factors = factors or [1, 10, 50]
+    ks = sorted(ks or [1, 3, 5, 10])
+    modes = modes or list(SEARCH_MODES)
+    labelled = load_labelled_queries(queries_path)
+    queries = [item['query'] for item in labelled]
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'settings': {
+            'kb_dir': str(kb_dir),
+            'queries': str(queries_path),
+            'n_queries': len(labelled),
+            'factors': factors,
+            'ks': ks,
+            'modes': modes,
+            'batch_size': batch_size,
+            'repeat': repeat,
+            'seed': seed,
+            'encoder': encoder,
+            'encoder_path': encoder_path
+        }
+    }
+
+    print("Measuring cold load...")
+    report['cold_load'] = measure_cold_load(kb_dir)
+
+    start = time.perf_counter()
+    base = load_index(kb_dir)
+    report['cold_load']['warm_index_load_ms'] = (time.perf_counter() - start) * 1000
+
+    model = None
+    if use_model:
+        print("Loading embedding model...")
+        start = time.perf_counter()
+        model = load_model(backend=encoder, model_path=encoder_path)
+        report['cold_load']['model_load_ms'] = (time.perf_counter() - start) * 1000
+
+        n_batches = max(1, len(queries) * repeat // batch_size)
+        encode_single = time_calls(lambda query: model.encode([query]), queries * repeat)
+        encode_batched = time_calls(lambda batch: model.encode(batch, batch_size=batch_size),
+                                    batches_of(queries, batch_size, n_batches))
+        report['encode'] = {
+            'single': latency_summary(encode_single),
+            'batched': latency_summary(encode_batched),
+            'batched_per_query': latency_summary([ms / batch_size for ms in encode_batched])
+        }
+        query_embeddings = normalize_rows(model.encode(queries))
+    else:
+        # Scoring latency does not depend on what the vectors mean
+        query_embeddings = synthetic_queries(np.asarray(base.embeddings, dtype=np.float32), len(queries), seed=seed)
+
+    report['sizes'] = []
+    for factor in factors:
+        index = scale_index(base, factor, seed=seed)
+        print(f"Benchmarking {len(index)} rows (x{factor})...")
+        report['sizes'].append(benchmark_size(index, factor, model, labelled, query_embeddings,
+                                              modes, ks, batch_size, repeat))
+    return report
+
+
+def flatten(report: Dict[str, Any], prefix: str = '') -> Dict[str, float]:
+    """Numeric leaves of a report keyed by dotted path (sizes keyed by row count)"""
+    values = {}
+    for key, value in report.items():
+        if key in ('created', 'environment', 'settings'):
+            continue
+        if key == 'sizes':
+            for size in value:
+                values.update(flatten(size, f"{prefix}rows={size['rows']}."))
+        elif isinstance(value, dict):
+            values.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[f"{prefix}{key}"] = float(value)
+    return values
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any],
+                    latency_tolerance: float = 0.2, recall_tolerance: float = 0.02) -> List[Dict[str, Any]]:
+    """Metrics that regressed: p50/p95/p99 latencies up by more than the tolerance, recall or MRR down"""
+    before, after = flatten(baseline), flatten(current)
+    regressions = []
+    for key in sorted(before.keys() & after.keys()):
+        metric = key.rsplit('.', 1)[-1]
+        old, new = before[key], after[key]
+        if metric in ('p50', 'p95', 'p99') and old > 0 and new > old * (1 + latency_tolerance):
+            regressions.append({'metric': key, 'baseline': old, 'current': new, 'change': new / old - 1})
+        elif metric.startswith(('recall@', 'mrr@')) and new < old - recall_tolerance:
+            regressions.append({'metric': key, 'baseline': old, 'current': new, 'change': new - old})
+    return regressions
+
+
+def print_summary(report: Dict[str, Any]):
+    """Print the headline numbers of a report"""
+    cold = report['cold_load']
+    print(f"\nCold load: {cold['process_ms']:.0f} ms process, {cold['import_ms']:.0f} ms imports, "
+          f"{cold['index_load_ms']:.1f} ms index" +
+          (f", {cold['model_load_ms']:.0f} ms model" if 'model_load_ms' in cold else ""))
+    if 'encode' in report:
+        encode = report['encode']
+        print(f"Encode: single p50 {encode['single']['p50']:.2f} ms, "
+              f"batched p50 {encode['batched_per_query']['p50']:.2f} ms/query")
+
+    print(f"\n  {'rows':>8}  {'mode':<8}  {'p50':>8}  {'p95':>8}  {'p99':>8}  {'batch/q':>8}  recall")
+    for size in report['sizes']:
+        scoring = size['scoring']
+        print(f"  {size['rows']:>8}  {'scoring':<8}  {scoring['single']['p50']:>8.3f}  {scoring['single']['p95']:>8.3f}  "
+              f"{scoring['single']['p99']:>8.3f}  {scoring['batched_per_query']['p50']:>8.3f}")
+        for mode, latency in size['end_to_end'].items():
+            single = latency['single']
+            recall = "  ".join(f"{name}={value:.2f}" for name, value in size['recall'][mode].items())
+            print(f"  {size['rows']:>8}  {mode:<8}  {single['p50']:>8.3f}  {single['p95']:>8.3f}  "
+                  f"{single['p99']:>8.3f}  {latency['batched_per_query']['p50']:>8.3f}  {recall}")
+
+
+def main():
+    """Benchmark retrieval latency and recall"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--kb-dir", default=str(default_kb_dir()), help="Knowledge base directory")
+    parser.add_argument("--queries", default=str(DEFAULT_QUERIES), help="Labelled query -> section JSON file")
+    parser.add_argument("--factors", type=int, nargs="+", default=[1, 10, 50],
+                        help="Knowledge base sizes, as multiples of the real one")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10], help="Recall cut-offs")
+    parser.add_argument("--modes", nargs="+", default=list(SEARCH_MODES), choices=SEARCH_MODES, help="Search modes")
+    parser.add_argument("--batch-size", type=int, default=16, help="Queries per batched call")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the query set per measurement")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for synthetic rows and queries")
+    parser.add_argument("--no-model", action="store_true", help="Skip encode, dense and hybrid measurements")
+    add_encoder_arguments(parser)
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--baseline", default=None, help="Earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative latency increase")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.kb_dir, args.queries, factors=args.factors, ks=args.k, modes=args.modes,
+                           batch_size=args.batch_size, repeat=args.repeat, use_model=not args.no_model,
+                           seed=args.seed, encoder=args.encoder, encoder_path=args.encoder_path)
+    print_summary(report)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            report['regressions'] = compare_reports(json.load(f), report, latency_tolerance=args.tolerance)
+        for regression in report['regressions']:
+            print(f"⚠ Regression: {regression['metric']} {regression['baseline']:.3f} -> "
+                  f"{regression['current']:.3f} ({regression['change']:+.1%})")
+        if not report['regressions']:
+            print(f"✓ No regressions against {args.baseline}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Saved report: {args.output}")
+
+    if report.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+NyayaSetu AI - Build pipeline metrics
+Per-stage wall time, peak memory and item counts for the knowledge base build,
+with optional tracemalloc peaks, cProfile dumps and a Chrome trace of the run
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Pipeline stages in build order
+BUILD_STAGES = ('extract', 'clean', 'structure', 'chunk', 'dedup', 'embed', 'save')
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """High-water mark of this process's resident memory"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class BuildMetrics:
+    """Accumulates exclusive time, memory and counters per stage
+
+    Stages may nest or interleave (the streaming build pulls pages, sections,
+    chunks and batches through generators): entering a stage pauses the one
+    that was running, so each stage is charged only for its own work.
+    """
+
+    def __init__(self, trace_memory: bool = False, profile_dir=None, trace: bool = False):
+        self.trace_memory = trace_memory
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self.trace = trace
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.profilers: Dict[str, cProfile.Profile] = {}
+        self.events: List[Dict[str, Any]] = []
+        self._stack: List[str] = []
+        self._resumed = 0.0
+        self._origin = time.perf_counter()
+        self._rss = peak_rss_bytes()
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def record(self, name: str) -> Dict[str, Any]:
+        if name not in self.stages:
+            self.stages[name] = {'seconds': 0.0, 'calls': 0}
+        return self.stages[name]
+
+    def _pause(self, now: float):
+        """Charge the running stage for the time, memory and profile since it resumed"""
+        if not self._stack:
+            return
+        name = self._stack[-1]
+        stage = self.record(name)
+        stage['seconds'] += now - self._resumed
+
+        rss = peak_rss_bytes()
+        if rss is not None:
+            stage['peak_rss_bytes'] = max(stage.get('peak_rss_bytes', 0), rss)
+            stage['rss_growth_bytes'] = stage.get('rss_growth_bytes', 0) + rss - self._rss
+            self._rss = rss
+
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            stage['peak_traced_bytes'] = max(stage.get('peak_traced_bytes', 0), peak)
+            tracemalloc.reset_peak()
+
+        if name in self.profilers:
+            self.profilers[name].disable()
+
+        if self.trace:
+            self.events.append({
+                'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                'ts': (self._resumed - self._origin) * 1e6, 'dur': (now - self._resumed) * 1e6
+            })
+
+    def _resume(self, now: float):
+        self._resumed = now
+        if not self._stack:
+            return
+        name = self._stack[-1]
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        if self.profile_dir:
+            self.profilers.setdefault(name, cProfile.Profile()).enable()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed work as (part of) a stage"""
+        self._pause(time.perf_counter())
+        self._stack.append(name)
+        self.record(name)['calls'] += 1
+        self._resume(time.perf_counter())
+        try:
+            yield self.stages[name]
+        finally:
+            self._pause(time.perf_counter())
+            self._stack.pop()
+            self._resume(time.perf_counter())
+
+    def iterate(self, name: str, items: Iterable) -> Iterator:
+        """Yield from items, charging the time spent producing each one to a stage"""
+        iterator = iter(items)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count(self, name: str, **counters: int):
+        """Add to a stage's item counters (pages, sections, chunks, ...)"""
+        stage = self.record(name)
+        for counter, value in counters.items():
+            stage[counter] = stage.get(counter, 0) + value
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stage metrics in build order, for stats.json"""
+        order = [name for name in BUILD_STAGES if name in self.stages]
+        order += [name for name in self.stages if name not in BUILD_STAGES]
+        summary = {}
+        for name in order:
+            stage = dict(self.stages[name])
+            stage['seconds'] = round(stage['seconds'], 4)
+            for key in [key for key in stage if key.endswith('_bytes')]:
+                stage[key[:-len('_bytes')] + '_mb'] = round(stage.pop(key) / 2 ** 20, 2)
+            summary[name] = stage
+        return summary
+
+    def save_profiles(self, top: int = 15) -> List[Path]:
+        """Write one .prof file per stage (readable with pstats or snakeviz)"""
+        if not self.profile_dir:
+            return []
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for name, profiler in self.profilers.items():
+            path = self.profile_dir / f"{name}.prof"
+            profiler.dump_stats(str(path))
+            paths.append(path)
+            if top:
+                print(f"\n[Profile: {name}] top {top} by cumulative time")
+                pstats.Stats(profiler).sort_stats('cumulative').print_stats(top)
+        return paths
+
+    def save_trace(self, path) -> Path:
+        """Write the stage intervals as a Chrome trace (chrome://tracing, Perfetto)"""
+        path = Path(path)
+        trace = {
+            'traceEvents': self.events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'stages': self.summary()}
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(trace, f)
+        return path
+
+    def close(self):
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def print_stage_table(summary: Dict[str, Dict[str, Any]]):
+    """Print per-stage metrics as a table"""
+    total = sum(stage['seconds'] for stage in summary.values()) or 1.0
+    print(f"  {'stage':<10}  {'seconds':>8}  {'share':>6}  {'peak RSS':>9}  {'traced':>8}  items")
+    for name, stage in summary.items():
+        counters = ", ".join(f"{key}={value:,}" for key, value in stage.items()
+                             if key not in ('seconds', 'calls') and not key.endswith('_mb'))
+        rss = f"{stage['peak_rss_mb']:.0f} MB" if 'peak_rss_mb' in stage else "-"
+        traced = f"{stage['peak_traced_mb']:.1f} MB" if 'peak_traced_mb' in stage else "-"
+        print(f"  {name:<10}  {stage['seconds']:>8.3f}  {stage['seconds'] / total:>6.1%}  {rss:>9}  {traced:>8}  {counters}")
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+NyayaSetu AI - Command line interface
+Subcommands to build the knowledge base, query, serve or upsert it and inspect its statistics;
+each subcommand imports only what it needs, so startup stays fast
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+DEFAULT_KB_DIR = PROJECT_ROOT / "knowledge_base"
+
+
+def parse_filters(pairs):
+    """FIELD=VALUE pairs as a filters dict; repeated fields match any of their values"""
+    filters = {}
+    for pair in pairs or []:
+        field, sep, value = pair.partition("=")
+        if not sep:
+            raise SystemExit(f"Invalid filter (expected FIELD=VALUE): {pair}")
+        filters.setdefault(field, []).append(value)
+    return filters or None
+
+
+def command_build(args):
+    if __package__:
+        from .rag_kb_setup import run_build
+    else:
+        from rag_kb_setup import run_build
+    return 0 if run_build(args) is not None else 1
+
+
+def command_serve(args):
+    if __package__:
+        from .retrieval_service import run_service
+    else:
+        from retrieval_service import run_service
+    return run_service(args)
+
+
+def command_upsert(args):
+    if __package__:
+        from .vector_export import run_upsert
+    else:
+        from vector_export import run_upsert
+    return 0 if run_upsert(args) is not None else 1
+
+
+def command_query(args):
+    if __package__:
+        from .test_rag_query import load_index, load_embedding_cache, load_model, search_many
+    else:
+        from test_rag_query import load_index, load_embedding_cache, load_model, search_many
+
+    if args.encoder == 'onnx' and not args.encoder_path:
+        raise SystemExit("--encoder onnx needs --encoder-path (export one with: python src/rag/encoders.py export)")
+
+    kb_dir = Path(args.kb_dir)
+    try:
+        kb = load_index(kb_dir, nprobe=args.nprobe, shards=args.shards, shard_by=args.shard_by,
+                        quantized=args.quantized)
+    except (FileNotFoundError, ValueError) as e:
+        # e.g. --quantized on a knowledge base built without --quantize (or with stale codes)
+        print(f"ERROR: {e}")
+        return 1
+    cache = load_embedding_cache(kb_dir, backend=args.encoder, model_path=args.encoder_path)
+
+    # Lexical queries never need the model; --no-model serves dense queries from the cache only
+    model = None if args.no_model or args.mode == 'lexical' else load_model(backend=args.encoder,
+                                                                            model_path=args.encoder_path)
+
+    try:
+        all_results = search_many(args.queries, kb, model, top_k=args.top_k, cache=cache, nprobe=args.nprobe,
+                                  filters=parse_filters(args.filter), mode=args.mode)
+    except ValueError as e:
+        # e.g. an unsupported filter field, or no BM25 index for lexical search
+        print(f"ERROR: {e}")
+        return 1
+    finally:
+        cache.close()
+        if hasattr(kb, 'close'):
+            kb.close()
+
+    if args.json:
+        json.dump([{'query': query, 'results': results} for query, results in zip(args.queries, all_results)],
+                  sys.stdout, indent=2, ensure_ascii=False)
+        print()
+        return 0
+
+    for query, results in zip(args.queries, all_results):
+        print(f"\n📝 Query: {query}")
+        print("-" * 70)
+        for i, result in enumerate(results, 1):
+            print(f"[Result {i}] Similarity: {result['similarity']:.4f}  "
+                  f"{result['metadata']['section']} ({result['metadata']['chapter']})")
+            print(f"  {result['text'][:200]}...")
+    return 0
+
+
+def command_stats(args):
+    kb_dir = Path(args.kb_dir)
+    stats_path = kb_dir / "stats.json"
+    if not stats_path.exists():
+        print(f"ERROR: {stats_path} not found (build the knowledge base first)")
+        return 1
+
+    with open(stats_path, 'r', encoding='utf-8') as f:
+        report = {'stats': json.load(f)}
+
+    manifest_path = kb_dir / "manifest.json"
+    if manifest_path.exists():
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        report['source'] = manifest.get('source')
+        report['config'] = manifest.get('config')
+
+    corpus_path = kb_dir / "corpus.json"
+    if corpus_path.exists():
+        with open(corpus_path, 'r', encoding='utf-8') as f:
+            report['shards'] = [
+                {'doc_id': shard['doc_id'], 'act': shard['act'], 'rows': shard['rows']}
+                for shard in json.load(f)['shards']
+            ]
+
+    report['files'] = {
+        path.name: path.stat().st_size
+        for path in sorted(kb_dir.iterdir()) if path.is_file()
+    }
+
+    json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+    print()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    # encoders needs only numpy, so sharing its options keeps startup fast
+    if __package__:
+        from .encoders import add_encoder_arguments
+    else:
+        from encoders import add_encoder_arguments
+
+    parser = argparse.ArgumentParser(prog="nyayasetu", description="NyayaSetu AI knowledge base tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    # Build, serve and upsert options (and --help) are parsed in main() by their modules' own
+    # argument sets, so those modules are only imported for their subcommand
+    build = subcommands.add_parser("build", help="Build the knowledge base from a PDF", add_help=False)
+    build.set_defaults(handler=command_build)
+
+    serve = subcommands.add_parser("serve", help="Run the micro-batching HTTP retrieval service", add_help=False)
+    serve.set_defaults(handler=command_serve)
+
+    upsert = subcommands.add_parser("upsert", help="Bulk-upsert the vectors into a vector store", add_help=False)
+    upsert.set_defaults(handler=command_upsert)
+
+    query = subcommands.add_parser("query", help="Search the knowledge base")
+    query.add_argument("queries", nargs="+", help="One or more questions")
+    query.add_argument("--kb-dir", default=str(DEFAULT_KB_DIR), help="Knowledge base directory")
+    query.add_argument("--top-k", type=int, default=3, help="Results per query")
+    query.add_argument("--mode", default="dense", choices=("dense", "lexical", "hybrid"), help="Search mode")
+    query.add_argument("--nprobe", type=int, default=None, help="Use the IVF index with this many lists")
+    query.add_argument("--shards", type=int, default=None, help="Search this many shards in worker processes (dense mode only)")
+    query.add_argument("--shard-by", default="rows", choices=("rows", "act"), help="Split shards by row range or by act")
+    query.add_argument("--quantized", action="store_true",
+                       help="Score on the int8/PQ codes of a --quantize build, reranking against the float store")
+    query.add_argument("--filter", action="append", metavar="FIELD=VALUE",
+                       help="Metadata filter (act, chapter, section, language); repeatable")
+    add_encoder_arguments(query)
+    query.add_argument("--no-model", action="store_true",
+                       help="Never load the model: cached query embeddings only, BM25 for the rest")
+    query.add_argument("--json", action="store_true", help="Print results as JSON")
+    query.set_defaults(handler=command_query)
+
+    stats = subcommands.add_parser("stats", help="Show knowledge base statistics")
+    stats.add_argument("--kb-dir", default=str(DEFAULT_KB_DIR), help="Knowledge base directory")
+    stats.set_defaults(handler=command_stats)
+
+    return parser
+
+
+def main():
+    """Run a subcommand"""
+    parser = build_parser()
+    args, extra = parser.parse_known_args()
+
+    if args.command == "build":
+        if __package__:
+            from .rag_kb_setup import add_build_arguments, check_build_arguments
+        else:
+            from rag_kb_setup import add_build_arguments, check_build_arguments
+        options = argparse.ArgumentParser(prog="nyayasetu build", description="Build the knowledge base from a PDF")
+        add_build_arguments(options)
+        args = options.parse_args(extra, namespace=args)
+        check_build_arguments(options, args)
+    elif args.command == "serve":
+        if __package__:
+            from .retrieval_service import add_serve_arguments
+        else:
+            from retrieval_service import add_serve_arguments
+        options = argparse.ArgumentParser(prog="nyayasetu serve", description="Run the HTTP retrieval service")
+        add_serve_arguments(options)
+        args = options.parse_args(extra, namespace=args)
+    elif args.command == "upsert":
+        if __package__:
+            from .vector_export import add_upsert_arguments
+        else:
+            from vector_export import add_upsert_arguments
+        options = argparse.ArgumentParser(prog="nyayasetu upsert", description="Bulk-upsert vectors into a vector store")
+        add_upsert_arguments(options)
+        args = options.parse_args(extra, namespace=args)
+    elif extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+
+    # Shard workers only run dense scans; --no-model would send uncached queries to BM25
+    if args.command == "query" and args.shards and args.shards > 1 and (args.no_model or args.mode != 'dense'):
+        parser.error("--shards supports dense search with the model only (not --no-model or --mode lexical/hybrid)")
+    if args.command == "query" and args.shards and args.shards > 1 and args.quantized:
+        parser.error("--quantized cannot be combined with --shards")
+
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+NyayaSetu AI - Multi-document corpus builder
+Builds one shard per Act with the CPAKnowledgeBaseBuilder stages, extracting
+documents concurrently in worker processes, and merges the shards into a single
+searchable knowledge base with globally unique chunk ids
+"""
+
+import contextlib
+import io
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional
+from pathlib import Path
+
+# Package-relative when imported as src.rag, sibling modules when run as a script
+if __package__:
+    from .rag_kb_setup import CPAKnowledgeBaseBuilder, load_embedding_model, EMBEDDING_MODEL_NAME
+    from .kb_store import (
+        merge_embedding_stores, load_embedding_matrix, iter_store_records, has_embedding_store, EMBEDDINGS_FILE
+    )
+    from .embedding_cache import EmbeddingCache
+    from .batch_encoder import BatchEncoder
+    from .ann_index import build_ann_index, print_recall_report, remove_ann_index
+    from .quantization import save_quantized_store, remove_quantized_store, QUANTIZATION_KINDS
+    from .near_dedup import DEDUP_MODES
+    from .encoders import encoder_id, add_encoder_arguments
+    from .lexical_index import LexicalIndex, remove_lexical_index
+    from .kb_manifest import file_hash, load_manifest, save_manifest, build_manifest
+else:
+    from rag_kb_setup import CPAKnowledgeBaseBuilder, load_embedding_model, EMBEDDING_MODEL_NAME
+    from kb_store import (
+        merge_embedding_stores, load_embedding_matrix, iter_store_records, has_embedding_store, EMBEDDINGS_FILE
+    )
+    from embedding_cache import EmbeddingCache
+    from batch_encoder import BatchEncoder
+    from ann_index import build_ann_index, print_recall_report, remove_ann_index
+    from quantization import save_quantized_store, remove_quantized_store, QUANTIZATION_KINDS
+    from near_dedup import DEDUP_MODES
+    from encoders import encoder_id, add_encoder_arguments
+    from lexical_index import LexicalIndex, remove_lexical_index
+    from kb_manifest import file_hash, load_manifest, save_manifest, build_manifest
+
+CORPUS_FILE = "corpus.json"
+SHARDS_DIR = "shards"
+CORPUS_VERSION = 1
+
+
+def document_id(name: str) -> str:
+    """Lowercase slug used as a document's chunk id prefix"""
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+
+def load_documents(source) -> List[Dict[str, Any]]:
+    """Documents to build, from a directory of PDFs or a JSON manifest
+
+    A manifest is a list (or {"documents": [...]}) of entries with a "path" and
+    optional "doc_id", "act" and "language"; relative paths are resolved against
+    the manifest's directory
+    """
+    source = Path(source)
+    if source.is_dir():
+        entries = [{'path': str(path)} for path in sorted(source.glob("*.pdf"))]
+        base_dir = source
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        if isinstance(entries, dict):
+            entries = entries['documents']
+        base_dir = source.parent
+
+    documents = []
+    for entry in entries:
+        path = Path(entry['path'])
+        if not path.is_absolute():
+            path = base_dir / path
+        documents.append({
+            'path': str(path),
+            'doc_id': entry.get('doc_id') or document_id(path.stem),
+            'act': entry.get('act') or path.stem.replace('_', ' '),
+            'language': entry.get('language', 'English')
+        })
+
+    seen = set()
+    for document in documents:
+        if document['doc_id'] in seen:
+            raise ValueError(f"Duplicate document id in corpus: {document['doc_id']}")
+        seen.add(document['doc_id'])
+
+    return documents
+
+
+def prepare_document(document: Dict[str, Any], shard_dir: str, chunk_settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker: extract, clean, structure and chunk one document (no embedding)"""
+    builder = CPAKnowledgeBaseBuilder(document['path'], shard_dir, act_name=document['act'],
+                                      doc_id=document['doc_id'], language=document['language'], load_model=False)
+    for name, value in chunk_settings.items():
+        setattr(builder, name, value)
+
+    # Per-stage progress of concurrent documents would interleave; the parent reports instead
+    with contextlib.redirect_stdout(io.StringIO()):
+        cleaned_text = builder.clean_text(builder.extract_text_from_pdf())
+        sections = builder.extract_structure(cleaned_text)
+        chunks = builder.create_chunks(sections) if sections else []
+
+    return {'sections': sections, 'chunks': chunks, 'chunking_report': builder.chunking_report}
+
+
+class CorpusBuilder:
+    """Build and merge per-Act knowledge base shards"""
+
+    def __init__(self, documents: List[Dict[str, Any]], output_dir: str = "knowledge_base",
+                 workers: Optional[int] = None, load_model: bool = True,
+                 encoder_backend: str = 'torch', encoder_path: Optional[str] = None):
+        self.documents = documents
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = workers or os.cpu_count() or 1
+
+        # Shard settings (passed to every per-document builder)
+        self.embedding_dtype = "float32"
+        self.chunk_settings = {}
+
+        # Corpus-level indexes over the merged store
+        self.build_ann = False
+        self.ann_lists = None
+        self.quantization = None
+        self.pq_subspaces = 48
+        self.build_lexical = True
+
+        # One model and embedding cache serve every shard
+        self.encoder_backend = encoder_backend
+        self.encoder_path = encoder_path
+        self.embedding_model = None
+        if load_model:
+            self.embedding_model = load_embedding_model(EMBEDDING_MODEL_NAME, encoder_backend, encoder_path)
+
+        self.embedding_cache = None
+        if self.embedding_model:
+            self.embedding_cache = EmbeddingCache(encoder_id(EMBEDDING_MODEL_NAME, encoder_backend, encoder_path),
+                                                  self.output_dir / "embedding_cache.sqlite")
+
+        # Encoder settings (see CPAKnowledgeBaseBuilder); the encoder is shared by all shards
+        self.encode_batch_size = 32
+        self.sort_by_length = True
+        self.torch_threads = None
+        self.encode_workers = 0
+        self.encoder = None
+
+    def get_encoder(self) -> BatchEncoder:
+        if self.encoder is None:
+            self.encoder = BatchEncoder(self.embedding_model, EMBEDDING_MODEL_NAME,
+                                        batch_size=self.encode_batch_size, sort_by_length=self.sort_by_length,
+                                        torch_threads=self.torch_threads, workers=self.encode_workers,
+                                        backend=self.encoder_backend, model_path=self.encoder_path)
+        return self.encoder
+
+    def close(self):
+        """Release the encoder worker pool, if one was started"""
+        if self.encoder is not None:
+            self.encoder.close()
+
+    def shard_dir(self, document: Dict[str, Any]) -> Path:
+        return self.output_dir / SHARDS_DIR / document['doc_id']
+
+    def shard_builder(self, document: Dict[str, Any]) -> CPAKnowledgeBaseBuilder:
+        """Builder that embeds and saves one shard with the shared model"""
+        builder = CPAKnowledgeBaseBuilder(document['path'], str(self.shard_dir(document)), act_name=document['act'],
+                                          doc_id=document['doc_id'], language=document['language'], load_model=False,
+                                          encoder_backend=self.encoder_backend, encoder_path=self.encoder_path)
+        builder.embedding_model = self.embedding_model
+        builder.embedding_cache = self.embedding_cache
+        builder.encoder = self.get_encoder() if self.embedding_model else None
+        builder.embedding_dtype = self.embedding_dtype
+        # ANN, quantized and BM25 indexes are built once over the merged corpus
+        builder.build_lexical = False
+        for name, value in self.chunk_settings.items():
+            setattr(builder, name, value)
+        return builder
+
+    def corpus_config(self) -> Dict[str, Any]:
+        """Settings of the merged indexes"""
+        return {
+            'build_ann': self.build_ann,
+            'ann_lists': self.ann_lists,
+            'quantization': self.quantization,
+            'pq_subspaces': self.pq_subspaces,
+            'build_lexical': self.build_lexical
+        }
+
+    def build_shard(self, builder: CPAKnowledgeBaseBuilder, prepared: Dict[str, Any],
+                    previous: Optional[Dict[str, Any]], source: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+        """Embed and save a prepared document as a shard"""
+        with contextlib.redirect_stdout(io.StringIO()):
+            builder.load_previous_vectors(previous, config)
+            builder.chunking_report = prepared['chunking_report']
+            chunks = builder.deduplicate_chunks(prepared['chunks']) if builder.dedup else prepared['chunks']
+            chunks = builder.generate_embeddings(chunks)
+            stats = builder.save_knowledge_base(chunks)
+            save_manifest(build_manifest(source, config, prepared['sections'], chunks), builder.output_dir)
+            builder.release_previous_vectors()
+        return stats
+
+    def build(self, force: bool = False) -> Dict[str, Any]:
+        """Build changed shards concurrently, then merge them into the corpus store"""
+        print("=" * 70)
+        print("NyayaSetu AI - Corpus Build")
+        print(f"Processing: {len(self.documents)} documents with {self.workers} workers")
+        print("=" * 70)
+
+        pending = {}
+        shards = {}
+        for document in self.documents:
+            builder = self.shard_builder(document)
+            previous = None if force else load_manifest(builder.output_dir)
+            source = {'path': document['path'], 'sha256': file_hash(document['path'])}
+            config = builder.build_config()
+
+            if builder.is_up_to_date(previous, source, config):
+                with open(builder.output_dir / "stats.json", 'r', encoding='utf-8') as f:
+                    shards[document['doc_id']] = json.load(f)
+                print(f"✓ {document['doc_id']}: unchanged")
+            else:
+                pending[document['doc_id']] = (builder, previous, source, config)
+
+        # Documents are extracted in parallel; each is embedded here as soon as it is ready
+        if pending:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(pending))) as executor:
+                futures = {
+                    executor.submit(prepare_document, document, str(self.shard_dir(document)), self.chunk_settings): document
+                    for document in self.documents if document['doc_id'] in pending
+                }
+                for future in as_completed(futures):
+                    document = futures[future]
+                    prepared = future.result()
+                    if not prepared['chunks']:
+                        print(f"⚠ {document['doc_id']}: no sections found, skipped")
+                        continue
+                    builder, previous, source, config = pending[document['doc_id']]
+                    stats = self.build_shard(builder, prepared, previous, source, config)
+                    shards[document['doc_id']] = stats
+                    print(f"✓ {document['doc_id']}: {stats['total_sections']} sections, {stats['total_chunks']} chunks")
+
+        return self.merge(shards, rebuilt=bool(pending) or force)
+
+    def merge(self, shards: Dict[str, Dict[str, Any]], rebuilt: bool = True) -> Dict[str, Any]:
+        """Concatenate shard stores in document order and build the corpus-level indexes"""
+        print("\n[Merge] Combining shards...")
+
+        entries = []
+        row_offset = 0
+        for document in self.documents:
+            shard_dir = self.shard_dir(document)
+            if document['doc_id'] not in shards or not has_embedding_store(shard_dir):
+                continue
+            rows = shards[document['doc_id']]['total_chunks']
+            entries.append({
+                'doc_id': document['doc_id'],
+                'act': document['act'],
+                'language': document['language'],
+                'path': document['path'],
+                'directory': str(shard_dir.relative_to(self.output_dir)),
+                'row_offset': row_offset,
+                'rows': rows
+            })
+            row_offset += rows
+
+        corpus = {'version': CORPUS_VERSION, 'config': self.corpus_config(), 'shards': entries}
+
+        corpus_path = self.output_dir / CORPUS_FILE
+        if not rebuilt and corpus_path.exists() and has_embedding_store(self.output_dir):
+            with open(corpus_path, 'r', encoding='utf-8') as f:
+                if json.load(f) == corpus:
+                    print(f"✓ Corpus unchanged: {self.output_dir}/")
+                    return corpus
+
+        if not entries:
+            print("⚠ No embedded shards to merge (model not available?)")
+            return corpus
+
+        total = merge_embedding_stores([self.output_dir / entry['directory'] for entry in entries], self.output_dir)
+        print(f"✓ Saved merged embedding store: {self.output_dir / EMBEDDINGS_FILE} ({total} rows)")
+
+        embeddings = load_embedding_matrix(self.output_dir)
+
+        # Corpus-wide BM25 so term statistics are shared across Acts; texts are
+        # streamed from the merged sidecar rather than loaded at once
+        if self.build_lexical:
+            LexicalIndex.build(record['text'] for record in iter_store_records(self.output_dir)).save(self.output_dir)
+            print("✓ Saved corpus BM25 lexical index")
+        else:
+            remove_lexical_index(self.output_dir)
+
+        if self.build_ann:
+            print_recall_report(build_ann_index(embeddings, self.output_dir, n_lists=self.ann_lists))
+        else:
+            remove_ann_index(self.output_dir)
+
+        if self.quantization:
+            save_quantized_store(embeddings, self.output_dir, self.quantization, pq_subspaces=self.pq_subspaces)
+            print(f"✓ Saved {self.quantization} codes")
+        else:
+            remove_quantized_store(self.output_dir)
+
+        with open(corpus_path, 'w', encoding='utf-8') as f:
+            json.dump(corpus, f, indent=2, ensure_ascii=False)
+
+        stats = {
+            'total_documents': len(entries),
+            'total_chunks': total,
+            'documents': {entry['doc_id']: shards[entry['doc_id']] for entry in entries}
+        }
+        with open(self.output_dir / "stats.json", 'w', encoding='utf-8') as f:
+            json.dump(stats, f, indent=2)
+
+        print(f"\n✓ Corpus of {len(entries)} documents ({total} chunks) saved to: {self.output_dir}/")
+        return corpus
+
+
+def main():
+    """Build a sharded knowledge base from a directory or manifest of Act PDFs"""
+    import argparse
+
+    project_root = Path(__file__).parent.parent.parent
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("source", help="Directory of PDFs or JSON manifest of documents")
+    parser.add_argument("--output-dir", default=str(project_root / "knowledge_base"), help="Corpus output directory")
+    parser.add_argument("--workers", type=int, default=None, help="Documents extracted concurrently (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Rebuild every shard")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"], help="Precision of the embedding stores")
+    parser.add_argument("--ann", action="store_true", help="Also build an IVF index over the merged corpus")
+    parser.add_argument("--ann-lists", type=int, default=None, help="Number of IVF lists (default: sqrt of chunk count)")
+    parser.add_argument("--quantize", default=None, choices=QUANTIZATION_KINDS, help="Also store int8 or product-quantized codes")
+    parser.add_argument("--no-lexical", action="store_true", help="Skip the corpus BM25 lexical index")
+    parser.add_argument("--encode-batch-size", type=int, default=32, help="Texts per forward pass")
+    parser.add_argument("--torch-threads", type=int, default=None, help="Torch intra-op threads (per encoder process)")
+    parser.add_argument("--encode-workers", type=int, default=0, help="Encode in this many processes (0 = in-process)")
+    add_encoder_arguments(parser)
+    parser.add_argument("--dedup", default=None, choices=DEDUP_MODES, help="Flag or collapse near-duplicate chunks within each Act")
+    parser.add_argument("--dedup-threshold", type=float, default=0.95, help="Shingle Jaccard similarity that counts as a near-duplicate")
+    args = parser.parse_args()
+
+    documents = load_documents(args.source)
+    if not documents:
+        print(f"ERROR: no PDF documents found in {args.source}")
+        return
+
+    corpus = CorpusBuilder(documents, args.output_dir, workers=args.workers,
+                           encoder_backend=args.encoder, encoder_path=args.encoder_path)
+    corpus.embedding_dtype = args.dtype
+    corpus.build_ann = args.ann
+    corpus.ann_lists = args.ann_lists
+    corpus.quantization = args.quantize
+    corpus.build_lexical = not args.no_lexical
+    corpus.encode_batch_size = args.encode_batch_size
+    corpus.torch_threads = args.torch_threads
+    corpus.encode_workers = args.encode_workers
+    if args.dedup:
+        corpus.chunk_settings.update(dedup=args.dedup, dedup_threshold=args.dedup_threshold)
+    try:
+        corpus.build(force=args.force)
+    finally:
+        corpus.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+NyayaSetu AI - Persistent embedding cache
+Caches embeddings by (model id, normalized-text hash) in an in-memory LRU backed
+by a SQLite file, so repeated chunks and popular questions skip the model
+"""
+
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of a text for cache lookups (NFC, collapsed whitespace)"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 hex digest of the normalized text"""
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Two-level embedding cache: bounded in-memory LRU in front of a SQLite store"""
+
+    def __init__(self, model_name: str, path=None, max_memory_items: int = 4096):
+        self.model_name = model_name
+        self.path = str(path) if path is not None else None
+        self.max_memory_items = max_memory_items
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.path:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL,"
+                " text_hash TEXT NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, text_hash))"
+            )
+            self._db.commit()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up cached vectors; missing entries are returned as None"""
+        keys = [text_hash(text) for text in texts]
+        vectors = [None] * len(keys)
+
+        with self._lock:
+            disk_lookup = {}
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    vectors[i] = vector
+                else:
+                    disk_lookup.setdefault(key, []).append(i)
+
+            if disk_lookup and self._db is not None:
+                pending = list(disk_lookup)
+                # Stay below SQLite's host parameter limit
+                for start in range(0, len(pending), 500):
+                    batch = pending[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._db.execute(
+                        f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                        [self.model_name, *batch]
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        self._remember(key, vector)
+                        for i in disk_lookup.pop(key):
+                            vectors[i] = vector
+                            self.disk_hits += 1
+
+            self.misses += sum(len(positions) for positions in disk_lookup.values())
+
+        return vectors
+
+    def put_many(self, texts: List[str], vectors):
+        """Store vectors for the given texts"""
+        entries = {}
+        for text, vector in zip(texts, vectors):
+            entries[text_hash(text)] = np.asarray(vector, dtype=np.float32)
+
+        with self._lock:
+            for key, vector in entries.items():
+                self._remember(key, vector)
+
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                    [(self.model_name, key, vector.tobytes()) for key, vector in entries.items()]
+                )
+                self._db.commit()
+
+    def encode(self, texts: List[str], model, **encode_kwargs) -> np.ndarray:
+        """Embed texts, running the model only on cache misses"""
+        texts = list(texts)
+        vectors = self.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+        if missing:
+            # Identical texts within one call are encoded once
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+            encoded = model.encode(unique_texts, **encode_kwargs)
+            self.put_many(unique_texts, encoded)
+            by_text = dict(zip(unique_texts, encoded))
+            for i in missing:
+                vectors[i] = np.asarray(by_text[texts[i]], dtype=np.float32)
+
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack(vectors)
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            'model': self.model_name,
+            'memory_items': len(self._memory),
+            'hits': self.hits,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        """Close the backing store"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+NyayaSetu AI - Encoder backends
+Interchangeable query/chunk encoders with the SentenceTransformer.encode
+interface: PyTorch, PyTorch with dynamically int8-quantized linear layers, and
+an exported ONNX model (fp32 or int8) run with ONNX Runtime, plus the export
+and a cosine-parity check between backends on the knowledge base chunks
+"""
+
+import hashlib
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Dict, Any, Optional
+from pathlib import Path
+
+import numpy as np
+
+# Package-relative when imported as src.rag, sibling modules when run as a script
+if __package__:
+    from .kb_index import normalize_rows
+else:
+    from kb_index import normalize_rows
+
+ENCODER_BACKENDS = ('torch', 'torch-int8', 'onnx')
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+ENCODER_CONFIG_FILE = "encoder_config.json"
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+
+def encoder_id(model_name: str, backend: str = 'torch', model_path=None) -> str:
+    """Identity of an encoder for embedding caches and build manifests
+
+    The default backend without a local model keeps the bare model name, so
+    existing caches and manifests stay valid; other backends produce slightly
+    different vectors and get their own namespace, and a local model (for any
+    backend) is told apart by a hash of its resolved path.
+    """
+    identity = model_name if backend == 'torch' else f"{model_name}#{backend}"
+    if model_path is not None:
+        resolved = str(Path(model_path).resolve())
+        identity += f":{hashlib.sha256(resolved.encode('utf-8')).hexdigest()[:16]}"
+    return identity
+
+
+class OnnxEncoder:
+    """Exported transformer run by ONNX Runtime, with mean pooling done in NumPy"""
+
+    def __init__(self, model_path, threads: Optional[int] = None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_path = Path(model_path)
+        model_dir = self.model_path.parent
+        with open(model_dir / ENCODER_CONFIG_FILE, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        self.model_name = config['model_name']
+        self.max_seq_length = config['max_seq_length']
+        self.normalize = config['normalize']
+        self.dimension = config['dimension']
+
+        # The tokenizer is saved next to the model by export_onnx, so loading never touches the network
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(self.model_path), options, providers=['CPUExecutionProvider'])
+        self.input_names = [item.name for item in self.session.get_inputs()]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False,
+               normalize_embeddings: bool = False, **encode_kwargs) -> np.ndarray:
+        """Embed texts in batches; rows come back in the order of texts"""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                    max_length=self.max_seq_length, return_tensors='np')
+            hidden = self.session.run(None, {name: tokens[name].astype(np.int64) for name in self.input_names})[0]
+
+            # Mean over real tokens, as the SentenceTransformer pooling layer does
+            mask = tokens['attention_mask'][..., None].astype(np.float32)
+            batches.append((hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9))
+
+        embeddings = np.vstack(batches).astype(np.float32)
+        if self.normalize or normalize_embeddings:
+            embeddings = normalize_rows(embeddings)
+        return embeddings
+
+
+def quantize_linear_layers(model):
+    """Dynamic int8 quantization of a PyTorch model's linear layers (weights int8, activations per batch)"""
+    import torch
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_encoder(backend: str = 'torch', model_name: str = DEFAULT_MODEL_NAME, model_path=None,
+                 threads: Optional[int] = None):
+    """Load an encoder; model_path is a local SentenceTransformer directory (torch
+    backends) or an exported .onnx file (onnx backend)"""
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend: {backend} (expected one of {ENCODER_BACKENDS})")
+
+    if backend == 'onnx':
+        if model_path is None:
+            raise ValueError("The onnx backend needs a model file (see: python src/rag/encoders.py export)")
+        return OnnxEncoder(model_path, threads=threads)
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(str(model_path) if model_path else model_name, device='cpu')
+    if backend == 'torch-int8':
+        model = quantize_linear_layers(model)
+    return model
+
+
+def export_onnx(model_name: str, output_dir, quantize: bool = True, opset: int = 14) -> Dict[str, Path]:
+    """Export a SentenceTransformer's transformer to ONNX (and a dynamically int8-quantized copy)"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer = model[0]
+    pooling = model[1]
+    if not getattr(pooling, 'pooling_mode_mean_tokens', False):
+        raise ValueError(f"Only mean-pooled models can be exported: {model_name}")
+
+    sample = transformer.tokenizer(["Consumer Protection Act, 2019"], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+
+    class HiddenStates(torch.nn.Module):
+        """Positional-argument wrapper that returns only the last hidden state"""
+
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, *inputs):
+            return self.auto_model(**dict(zip(input_names, inputs)))[0]
+
+    paths = {'onnx': output_dir / ONNX_MODEL_FILE}
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names + ['last_hidden_state']}
+    with torch.no_grad():
+        torch.onnx.export(HiddenStates(transformer.auto_model.eval()), tuple(sample[name] for name in input_names),
+                          str(paths['onnx']), input_names=input_names, output_names=['last_hidden_state'],
+                          dynamic_axes=dynamic_axes, opset_version=opset)
+
+    transformer.tokenizer.save_pretrained(str(output_dir))
+    config = {
+        'model_name': model_name,
+        'max_seq_length': model.max_seq_length,
+        'normalize': any(type(module).__name__ == 'Normalize' for module in model),
+        'dimension': model.get_sentence_embedding_dimension()
+    }
+    with open(output_dir / ENCODER_CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        paths['onnx-int8'] = output_dir / ONNX_INT8_FILE
+        quantize_dynamic(str(paths['onnx']), str(paths['onnx-int8']), weight_type=QuantType.QInt8)
+
+    return paths
+
+
+def parity_report(reference: np.ndarray, candidate: np.ndarray, threshold: float = 0.99) -> Dict[str, Any]:
+    """Row-wise cosine similarity between two backends' embeddings of the same texts"""
+    cosines = (normalize_rows(reference) * normalize_rows(candidate)).sum(axis=1)
+    worst = np.argsort(cosines)[:5]
+    return {
+        'texts': len(cosines),
+        'threshold': threshold,
+        'min_cosine': float(cosines.min()),
+        'p01_cosine': float(np.percentile(cosines, 1)),
+        'mean_cosine': float(cosines.mean()),
+        'below_threshold': int((cosines < threshold).sum()),
+        'worst': [{'row': int(row), 'cosine': float(cosines[row])} for row in worst],
+        'passed': bool(cosines.min() >= threshold)
+    }
+
+
+def kb_texts(kb_dir) -> List[str]:
+    """Chunk texts of a knowledge base, from the binary store or knowledge_base.json"""
+    if __package__:
+        from .kb_store import has_embedding_store, iter_store_records
+    else:
+        from kb_store import has_embedding_store, iter_store_records
+
+    kb_dir = Path(kb_dir)
+    if has_embedding_store(kb_dir):
+        return [record['text'] for record in iter_store_records(kb_dir)]
+    with open(kb_dir / "knowledge_base.json", 'r', encoding='utf-8') as f:
+        return [chunk['text'] for chunk in json.load(f)]
+
+
+def profile_backend(backend: str, model_name: str, model_path, texts: List[str], queries: List[str],
+                    embeddings_path, threads: Optional[int] = None, batch_size: int = 32) -> Dict[str, Any]:
+    """Load one backend, embed texts (saved to embeddings_path) and time single-query encodes"""
+    if __package__:
+        from .benchmark import latency_summary, time_calls
+        from .build_metrics import peak_rss_bytes
+    else:
+        from benchmark import latency_summary, time_calls
+        from build_metrics import peak_rss_bytes
+
+    start = time.perf_counter()
+    encoder = load_encoder(backend, model_name, model_path, threads=threads)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    embeddings = np.asarray(encoder.encode(texts, batch_size=batch_size), dtype=np.float32)
+    encode_seconds = time.perf_counter() - start
+    np.save(embeddings_path, embeddings)
+
+    rss = peak_rss_bytes()
+    return {
+        'backend': backend,
+        'model_path': str(model_path) if model_path else None,
+        'load_seconds': round(load_seconds, 3),
+        'chunks_per_second': round(len(texts) / encode_seconds, 1) if encode_seconds else None,
+        'query_ms': latency_summary(time_calls(lambda query: encoder.encode([query]), queries)),
+        'peak_rss_mb': round(rss / 2 ** 20, 1) if rss is not None else None
+    }
+
+
+def run_profile(args) -> Dict[str, Any]:
+    """Profile one backend in a fresh interpreter, so its load time and RSS are its own"""
+    command = [
+        sys.executable, str(Path(__file__).resolve()), "profile",
+        "--encoder", args.backend, "--model-name", args.model_name, "--kb-dir", args.kb_dir,
+        "--queries", args.queries, "--limit", str(args.limit), "--embeddings", args.embeddings
+    ]
+    if args.model_path:
+        command += ["--encoder-path", args.model_path]
+    if args.threads:
+        command += ["--threads", str(args.threads)]
+    completed = subprocess.run(command, cwd=Path(__file__).parent, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{args.backend} backend failed:\n{completed.stderr.strip()}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def load_texts(kb_dir, queries_path, limit: int):
+    if __package__:
+        from .benchmark import load_labelled_queries
+    else:
+        from benchmark import load_labelled_queries
+
+    texts = kb_texts(kb_dir)
+    return texts[:limit] if limit else texts, [item['query'] for item in load_labelled_queries(queries_path)]
+
+
+def command_profile(args):
+    texts, queries = load_texts(args.kb_dir, args.queries, args.limit)
+    report = profile_backend(args.encoder, args.model_name, args.encoder_path, texts, queries,
+                             args.embeddings, threads=args.threads)
+    print(json.dumps(report))
+    return 0
+
+
+def command_export(args):
+    paths = export_onnx(args.model_name, args.output_dir, quantize=not args.no_quantize, opset=args.opset)
+    for kind, path in paths.items():
+        print(f"✓ Exported {kind}: {path} ({path.stat().st_size / 2 ** 20:.1f} MB)")
+    return 0
+
+
+def command_parity(args):
+    """Compare a candidate backend with the reference on every KB chunk"""
+    import argparse
+
+    profiles = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for role, backend, model_path in (('reference', args.reference, args.reference_path),
+                                          ('candidate', args.encoder, args.encoder_path)):
+            options = argparse.Namespace(backend=backend, model_name=args.model_name, model_path=model_path,
+                                         kb_dir=args.kb_dir, queries=args.queries, limit=args.limit,
+                                         threads=args.threads, embeddings=str(Path(tmp) / f"{role}.npy"))
+            try:
+                profile = run_profile(options)
+            except RuntimeError as e:
+                print(f"ERROR: {e}")
+                return 1
+            profile['role'] = role
+            profiles.append(profile)
+        report = {
+            'backends': profiles,
+            'parity': parity_report(np.load(Path(tmp) / "reference.npy"), np.load(Path(tmp) / "candidate.npy"),
+                                    threshold=args.threshold)
+        }
+
+    print(f"  {'backend':<34}  {'load s':>7}  {'chunks/s':>9}  {'query p50':>10}  {'query p95':>10}  {'peak RSS':>9}")
+    for profile in profiles:
+        name = f"{profile['role']}: {profile['backend']}" + (f" ({Path(profile['model_path']).name})" if profile['model_path'] else "")
+        rss = f"{profile['peak_rss_mb']:.0f} MB" if profile['peak_rss_mb'] is not None else "-"
+        print(f"  {name:<34}  {profile['load_seconds']:>7.2f}  {profile['chunks_per_second'] or 0:>9.1f}  "
+              f"{profile['query_ms']['p50']:>8.2f}ms  {profile['query_ms']['p95']:>8.2f}ms  {rss:>9}")
+
+    parity = report['parity']
+    mark = "✓" if parity['passed'] else "⚠"
+    print(f"{mark} Cosine parity over {parity['texts']} chunks: min {parity['min_cosine']:.4f}, "
+          f"p1 {parity['p01_cosine']:.4f}, mean {parity['mean_cosine']:.4f} "
+          f"({parity['below_threshold']} below {parity['threshold']})")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Saved parity report: {args.output}")
+    return 0 if parity['passed'] else 1
+
+
+def add_encoder_arguments(parser):
+    """--encoder / --encoder-path, shared by the build, query, serve and benchmark commands"""
+    parser.add_argument("--encoder", default="torch", choices=ENCODER_BACKENDS, help="Embedding backend")
+    parser.add_argument("--encoder-path", default=None,
+                        help="Local model: exported .onnx file (onnx) or SentenceTransformer directory (torch)")
+
+
+def main():
+    """Export ONNX encoders and check their parity with the PyTorch model"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    export = subcommands.add_parser("export", help="Export the model to ONNX (fp32 and int8)")
+    export.add_argument("--model-name", default=DEFAULT_MODEL_NAME, help="SentenceTransformer to export")
+    export.add_argument("--output-dir", default=str(PROJECT_ROOT / "models" / "minilm-onnx"), help="Output directory")
+    export.add_argument("--no-quantize", action="store_true", help="Skip the int8 copy")
+    export.add_argument("--opset", type=int, default=14, help="ONNX opset version")
+    export.set_defaults(handler=command_export)
+
+    for name, help_text in (("parity", "Compare a backend with the reference on the KB chunks"),
+                            ("profile", "Time and embed with one backend (run by parity)")):
+        command = subcommands.add_parser(name, help=help_text)
+        add_encoder_arguments(command)
+        command.add_argument("--model-name", default=DEFAULT_MODEL_NAME, help="Model the backends were built from")
+        command.add_argument("--kb-dir", default=str(PROJECT_ROOT / "knowledge_base"), help="Knowledge base directory")
+        command.add_argument("--queries", default=str(PROJECT_ROOT / "data" / "eval" / "cpa2019_queries.json"),
+                             help="Queries for single-query latency")
+        command.add_argument("--limit", type=int, default=0, help="Compare only the first N chunks (0 = all)")
+        command.add_argument("--threads", type=int, default=None, help="Intra-op threads for the ONNX session")
+
+    parity = subcommands.choices["parity"]
+    parity.add_argument("--reference", default="torch", choices=ENCODER_BACKENDS, help="Reference backend")
+    parity.add_argument("--reference-path", default=None, help="Local model for the reference backend")
+    parity.add_argument("--threshold", type=float, default=0.99, help="Minimum cosine similarity per chunk")
+    parity.add_argument("--output", default=None, help="Write the JSON report here")
+    parity.set_defaults(handler=command_parity)
+
+    profile = subcommands.choices["profile"]
+    profile.add_argument("--embeddings", required=True, help="Where to save the chunk embeddings (.npy)")
+    profile.set_defaults(handler=command_profile)
+
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+NyayaSetu AI - In-memory retrieval index
+Holds knowledge base embeddings as one contiguous, pre-normalized matrix (float32,
+or a memory-mapped float16 store scored block by block)
+"""
+
+import re
+from typing import List, Dict, Any, Optional, Tuple
+from pathlib import Path
+
+import numpy as np
+
+# Metadata fields that can restrict a search
+FILTER_FIELDS = ('act', 'chapter', 'section', 'language')
+
+# GEMM scores can differ from the exact dot product in the last bits; rows within
+# this margin of the last place are re-scored before the final ranking
+SCORE_MARGIN = 1e-5
+
+# Rows converted to float32 per block when scoring a lower-precision store
+SCORE_BLOCK_ROWS = 8192
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row of a matrix (zero rows are left as zeros)"""
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def filter_value(field: str, value: str) -> str:
+    """Value under which a chunk is indexed for a metadata filter"""
+    if field == 'section':
+        # "Section 35 (Part 2)" is found by a filter on "Section 35"
+        return re.sub(r'\s*\(Part \d+\)$', '', value)
+    return value
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Return indices of the top_k highest scores, best first"""
+    top_k = min(top_k, len(scores))
+    if top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    if top_k < len(scores):
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        # Scores tied with the last place go to the lowest rows, and equal scores rank
+        # by row, so the ranking is deterministic (and shard rankings merge to it)
+        threshold = scores[candidates].min()
+        tied = np.flatnonzero(scores == threshold)
+        above = candidates[scores[candidates] > threshold]
+        candidates = np.sort(np.concatenate([above, tied[:top_k - len(above)]]))
+    else:
+        candidates = np.arange(len(scores))
+
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def exact_scores(embeddings: np.ndarray, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Row-by-row dot products: unlike a GEMM, a row's score does not depend on which rows are scored with it"""
+    return (np.asarray(embeddings[rows], dtype=np.float32) * query).sum(axis=1)
+
+
+def matrix_scores(embeddings: np.ndarray, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """GEMM scores of one query (or a matrix of queries) against the stored rows (all rows if None)"""
+    if embeddings.dtype == np.float32:
+        return queries @ (embeddings if rows is None else embeddings[rows]).T
+
+    # A float16 store is converted one block at a time, never as a whole
+    n = len(embeddings) if rows is None else len(rows)
+    scores = np.empty(queries.shape[:-1] + (n,), dtype=np.float32)
+    for start in range(0, n, SCORE_BLOCK_ROWS):
+        block_rows = slice(start, start + SCORE_BLOCK_ROWS)
+        block = embeddings[block_rows] if rows is None else embeddings[rows[block_rows]]
+        scores[..., start:start + len(block)] = queries @ block.astype(np.float32).T
+    return scores
+
+
+def rank_scores(embeddings: np.ndarray, query: np.ndarray, scores: np.ndarray, top_k: int,
+                rows: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+    """Best (row, similarity) pairs from approximate (GEMM) scores of rows (all rows if None)
+
+    The shortlist near the top_k is re-scored exactly, so the ranking and the scores
+    are the same whether rows are scored in one matrix, in a batch or per shard.
+    """
+    n = len(scores)
+    if top_k <= 0 or not n:
+        return []
+    if top_k < n:
+        last_place = np.partition(scores, n - top_k)[n - top_k]
+        positions = np.flatnonzero(scores >= last_place - SCORE_MARGIN)
+    else:
+        positions = np.arange(n)
+    candidates = np.sort(positions if rows is None else rows[positions])
+    exact = exact_scores(embeddings, candidates, query)
+    return [(int(candidates[i]), float(exact[i])) for i in top_k_indices(exact, top_k)]
+
+
+class KnowledgeBaseIndex:
+    """Exact cosine-similarity index over knowledge base chunks"""
+
+    def __init__(self, chunks: List[Dict[str, Any]], embeddings: Optional[np.ndarray] = None,
+                 ann=None, nprobe: Optional[int] = None,
+                 codes: Optional[np.ndarray] = None, quantizer=None, rerank_factor: int = 4,
+                 lexical=None):
+        if embeddings is None:
+            # Chunks without embeddings can never be retrieved, so they are not indexed
+            self.chunks = [chunk for chunk in chunks if 'embedding' in chunk]
+
+            if self.chunks:
+                matrix = np.array([chunk['embedding'] for chunk in self.chunks], dtype=np.float32)
+            else:
+                matrix = np.empty((0, 0), dtype=np.float32)
+
+            self.embeddings = normalize_rows(matrix)
+
+        else:
+            # Pre-normalized rows (e.g. a memory-mapped store) are used as-is and
+            # never copied, so worker processes share pages; float16 rows are
+            # converted block by block at scoring time
+            self.chunks = list(chunks)
+            self.embeddings = embeddings
+
+        # Optional IVF index; searches only use it when an nprobe is given
+        self.ann = ann
+        self.nprobe = nprobe
+
+        # Optional quantized codes; when present they are scored instead of the
+        # float rows, and the best top_k * rerank_factor are re-scored exactly
+        self.codes = codes
+        self.quantizer = quantizer
+        self.rerank_factor = rerank_factor
+
+        # Optional BM25 index over the same rows, for lexical and hybrid search
+        self.lexical = lexical
+
+        self.metadata_rows = self._build_metadata_index()
+
+    @classmethod
+    def from_store(cls, store_dir, mmap: bool = True, nprobe: Optional[int] = None,
+                   quantized: bool = False, rerank_factor: int = 4) -> "KnowledgeBaseIndex":
+        """Build an index from a binary embedding store (and its IVF, code and BM25 indexes, if built)"""
+        if __package__:
+            from .kb_store import load_embedding_store
+            from .ann_index import IVFIndex, ANN_INDEX_FILE
+            from .quantization import load_quantized_store
+            from .lexical_index import LexicalIndex
+        else:
+            from kb_store import load_embedding_store
+            from ann_index import IVFIndex, ANN_INDEX_FILE
+            from quantization import load_quantized_store
+            from lexical_index import LexicalIndex
+
+        embeddings, records = load_embedding_store(store_dir, mmap=mmap)
+
+        ann_path = Path(store_dir) / ANN_INDEX_FILE
+        ann = IVFIndex.load(ann_path) if ann_path.exists() else None
+        if ann is not None and ann.n_rows != len(embeddings):
+            # An index left over from a different build would return wrong rows
+            print(f"⚠ Ignoring stale IVF index in {store_dir} ({ann.n_rows} rows, store has {len(embeddings)})")
+            ann = None
+
+        codes, quantizer = load_quantized_store(store_dir, mmap=mmap, rows=len(embeddings)) if quantized else (None, None)
+        if quantized and quantizer is None:
+            raise FileNotFoundError(f"No quantized embeddings in {store_dir}; build with quantization enabled")
+
+        lexical = LexicalIndex.load(store_dir)
+        if lexical is not None and len(lexical) != len(embeddings):
+            print(f"⚠ Ignoring stale BM25 index in {store_dir} ({len(lexical)} documents, store has {len(embeddings)})")
+            lexical = None
+
+        return cls(records, embeddings=embeddings, ann=ann, nprobe=nprobe,
+                   codes=codes, quantizer=quantizer, rerank_factor=rerank_factor,
+                   lexical=lexical)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def dimension(self) -> int:
+        return self.embeddings.shape[1]
+
+    def result(self, row: int, similarity: float) -> Dict[str, Any]:
+        """Build a search result for a matrix row"""
+        chunk = self.chunks[row]
+        return {
+            'similarity': similarity,
+            'text': chunk['text'],
+            'metadata': chunk['metadata']
+        }
+
+    def _build_metadata_index(self) -> Dict[str, Dict[str, np.ndarray]]:
+        """Inverted indexes from each filterable metadata value to its row ids"""
+        postings = {field: {} for field in FILTER_FIELDS}
+        for row, chunk in enumerate(self.chunks):
+            metadata = chunk.get('metadata', {})
+            for field in FILTER_FIELDS:
+                if field in metadata:
+                    postings[field].setdefault(filter_value(field, metadata[field]), []).append(row)
+
+        return {
+            field: {value: np.array(rows, dtype=np.int64) for value, rows in values.items()}
+            for field, values in postings.items()
+        }
+
+    def filter_rows(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Sorted row ids matching all filters (a list value matches any of its items)"""
+        if not filters:
+            return None
+
+        rows = None
+        for field, wanted in filters.items():
+            if field not in self.metadata_rows:
+                raise ValueError(f"Cannot filter on '{field}' (supported: {', '.join(FILTER_FIELDS)})")
+
+            values = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+            matches = [self.metadata_rows[field].get(filter_value(field, value)) for value in values]
+            matches = [match for match in matches if match is not None]
+            field_rows = np.unique(np.concatenate(matches)) if matches else np.empty(0, dtype=np.int64)
+
+            rows = field_rows if rows is None else np.intersect1d(rows, field_rows, assume_unique=True)
+        return rows
+
+    def _candidates(self, query: np.ndarray, nprobe: Optional[int]) -> Optional[np.ndarray]:
+        """Rows to score for a normalized query, or None for an exact scan"""
+        nprobe = nprobe if nprobe is not None else self.nprobe
+        if self.ann is None or not nprobe:
+            return None
+        return self.ann.candidates(query, nprobe)
+
+    def _rank(self, query: np.ndarray, top_k: int, rows: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Best (row, similarity) pairs for a normalized query, over all rows or only the given ones"""
+        if self.quantizer is not None:
+            return self._rank_quantized(query, top_k, rows)
+
+        if rows is None:
+            return rank_scores(self.embeddings, query, matrix_scores(self.embeddings, query), top_k)
+
+        return rank_scores(self.embeddings, query, matrix_scores(self.embeddings, query, rows), top_k, rows)
+
+    def _rank_quantized(self, query: np.ndarray, top_k: int, rows: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Score on quantized codes, optionally re-scoring the best candidates exactly"""
+        if rows is None:
+            rows = np.arange(len(self))
+            codes = self.codes
+        else:
+            codes = self.codes[rows]
+        scores = self.quantizer.score(codes, query)
+
+        if not self.rerank_factor:
+            return [(int(rows[i]), float(scores[i])) for i in top_k_indices(scores, top_k)]
+
+        # Only the shortlisted float rows are read from the (memory-mapped) store
+        shortlist = np.sort(rows[top_k_indices(scores, top_k * self.rerank_factor)])
+        exact = exact_scores(self.embeddings, shortlist, query)
+        return [(int(shortlist[i]), float(exact[i])) for i in top_k_indices(exact, top_k)]
+
+    def search_vector(self, query_embedding, top_k: int = 3, nprobe: Optional[int] = None,
+                      filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Return the top_k chunks most similar to a query embedding"""
+        if not len(self):
+            return []
+
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32))
+
+        # A filtered search scores exactly the (usually small) candidate set
+        rows = self.filter_rows(filters)
+        if rows is None:
+            rows = self._candidates(query, nprobe)
+        elif not len(rows):
+            return []
+
+        return [self.result(row, score) for row, score in self._rank(query, top_k, rows)]
+
+    def search_matrix(self, query_embeddings, top_k: int = 3, nprobe: Optional[int] = None,
+                      filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """Return the top_k chunks for each row of a query embedding matrix"""
+        queries = normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        if not len(self):
+            return [[] for _ in range(len(queries))]
+
+        rows = self.filter_rows(filters)
+        if rows is not None and not len(rows):
+            return [[] for _ in range(len(queries))]
+
+        if self.quantizer is not None or (rows is None and self.ann is not None and (nprobe or self.nprobe)):
+            # Each query probes its own lists / code tables, so it is scored on its own
+            return [
+                [self.result(row, score) for row, score in
+                 self._rank(query, top_k, rows if rows is not None else self._candidates(query, nprobe))]
+                for query in queries
+            ]
+
+        # One GEMM scores every query against every chunk (or the filtered rows only)
+        scores = matrix_scores(self.embeddings, queries, rows)
+
+        return [
+            [self.result(row, score) for row, score in rank_scores(self.embeddings, query, query_scores, top_k, rows)]
+            for query, query_scores in zip(queries, scores)
+        ]
+
+    def search_lexical(self, query: str, top_k: int = 3,
+                       filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Return the top_k chunks by BM25 score (reported as 'similarity')"""
+        if self.lexical is None:
+            raise ValueError("Lexical search needs a BM25 index; rebuild the knowledge base")
+
+        rows = self.filter_rows(filters)
+        if rows is not None and not len(rows):
+            return []
+
+        return [self.result(row, score) for row, score in self.lexical.rank(query, top_k, rows)]
+
+    def search_hybrid(self, query: str, query_embedding, top_k: int = 3, nprobe: Optional[int] = None,
+                      filters: Optional[Dict[str, Any]] = None, candidates: int = 50,
+                      rrf_k: int = 60) -> List[Dict[str, Any]]:
+        """Fuse dense and BM25 rankings with reciprocal rank fusion"""
+        if __package__:
+            from .lexical_index import reciprocal_rank_fusion
+        else:
+            from lexical_index import reciprocal_rank_fusion
+
+        if self.lexical is None:
+            raise ValueError("Hybrid search needs a BM25 index; rebuild the knowledge base")
+        if not len(self):
+            return []
+
+        query_vector = normalize_rows(np.asarray(query_embedding, dtype=np.float32))
+        depth = max(candidates, top_k)
+
+        rows = self.filter_rows(filters)
+        if rows is not None and not len(rows):
+            return []
+
+        dense = self._rank(query_vector, depth, rows if rows is not None else self._candidates(query_vector, nprobe))
+        lexical = self.lexical.rank(query, depth, rows)
+        fused = reciprocal_rank_fusion([[row for row, _ in dense], [row for row, _ in lexical]], k=rrf_k)[:top_k]
+
+        # Report the cosine similarity of every fused row, plus both component scores
+        lexical_scores = dict(lexical)
+        fused_rows = np.sort(np.array([row for row, _ in fused], dtype=np.int64))
+        similarity_of = dict(zip(fused_rows.tolist(), exact_scores(self.embeddings, fused_rows, query_vector).tolist()))
+
+        results = []
+        for row, fusion_score in fused:
+            result = self.result(row, float(similarity_of[row]))
+            result['lexical_score'] = lexical_scores.get(row, 0.0)
+            result['fusion_score'] = fusion_score
+            results.append(result)
+        return results
@@ -0,0 +1,165 @@
+"""
+NyayaSetu AI - Build manifest
+Records content hashes of the source document, its sections and its chunks so
+that a rebuild only re-embeds chunks whose text actually changed
+"""
+
+import hashlib
+import json
+import tempfile
+from typing import List, Dict, Any, Optional
+from pathlib import Path
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 hex digest of a piece of text"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def file_hash(path, block_size: int = 1 << 20) -> str:
+    """SHA-256 hex digest of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def section_hash(section: Dict[str, Any]) -> str:
+    """Hash of a structured section (chapter, number, title and content)"""
+    return content_hash("\x1f".join([section['chapter'], section['section'], section['title'], section['content']]))
+
+
+def load_manifest(output_dir) -> Optional[Dict[str, Any]]:
+    """Load the manifest of a previous build, if any"""
+    manifest_path = Path(output_dir) / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(manifest: Dict[str, Any], output_dir) -> Path:
+    """Write a build manifest next to the knowledge base"""
+    manifest_path = Path(output_dir) / MANIFEST_FILE
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest_path
+
+
+def section_entry(section: Dict[str, Any]) -> Dict[str, Any]:
+    """Manifest entry of a section"""
+    return {'section': section['section'], 'chapter': section['chapter'], 'hash': section_hash(section)}
+
+
+def chunk_entry(index: int, chunk: Dict[str, Any], row: Optional[int]) -> Dict[str, Any]:
+    """Manifest entry of a chunk stored at a store row (None if not embedded)"""
+    return {'index': index, 'hash': content_hash(chunk['text']), 'row': row}
+
+
+def assemble_manifest(source: Dict[str, Any], config: Dict[str, Any],
+                      section_entries: List[Dict[str, Any]], chunk_entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Manifest from entries collected while the build streamed"""
+    return {
+        'version': MANIFEST_VERSION,
+        'source': source,
+        'config': config,
+        'sections': section_entries,
+        'chunks': chunk_entries
+    }
+
+
+def build_manifest(source: Dict[str, Any], config: Dict[str, Any],
+                   sections: List[Dict[str, Any]], chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Describe a finished build: source, settings, section hashes and chunk-to-row mapping"""
+    chunk_entries = []
+    row = 0
+    for i, chunk in enumerate(chunks):
+        has_embedding = 'embedding' in chunk
+        chunk_entries.append(chunk_entry(i, chunk, row if has_embedding else None))
+        if has_embedding:
+            row += 1
+
+    return assemble_manifest(source, config, [section_entry(s) for s in sections], chunk_entries)
+
+
+def changed_sections(previous: Optional[Dict[str, Any]], sections: List[Dict[str, Any]]) -> int:
+    """Count sections whose content is not present in a previous manifest"""
+    if not previous:
+        return len(sections)
+    known = {entry['hash'] for entry in previous.get('sections', [])}
+    return sum(section_hash(s) not in known for s in sections)
+
+
+def cached_rows(previous: Optional[Dict[str, Any]], n_rows: int) -> Dict[str, int]:
+    """Map chunk text hashes from a previous build to their rows in its embedding store"""
+    if not previous:
+        return {}
+
+    rows = {}
+    for entry in previous.get('chunks', []):
+        row = entry.get('row')
+        if row is not None and row < n_rows:
+            rows[entry['hash']] = row
+    return rows
+
+
+def _indented(value: Any, level: int) -> str:
+    """json.dumps(value, indent=2) as nested level deep in an indented document"""
+    return json.dumps(value, indent=2, ensure_ascii=False).replace("\n", "\n" + "  " * level)
+
+
+class ManifestWriter:
+    """Spool section and chunk entries to temporary files and write the manifest at the end
+
+    The file matches save_manifest(assemble_manifest(...)) byte for byte, without
+    holding one entry per section and chunk in memory.
+    """
+
+    def __init__(self, source: Dict[str, Any], config: Dict[str, Any]):
+        self.source = source
+        self.config = config
+        self.spools = {'sections': tempfile.TemporaryFile('w+', encoding='utf-8'),
+                       'chunks': tempfile.TemporaryFile('w+', encoding='utf-8')}
+        self.counts = {'sections': 0, 'chunks': 0}
+
+    def _add(self, name: str, entry: Dict[str, Any]):
+        self.spools[name].write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.counts[name] += 1
+
+    def add_section(self, entry: Dict[str, Any]):
+        self._add('sections', entry)
+
+    def add_chunk(self, entry: Dict[str, Any]):
+        self._add('chunks', entry)
+
+    def save(self, output_dir) -> Path:
+        """Write the manifest next to the knowledge base and discard the spools"""
+        manifest_path = Path(output_dir) / MANIFEST_FILE
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            f.write("{\n")
+            f.write(f'  "version": {MANIFEST_VERSION},\n')
+            f.write(f'  "source": {_indented(self.source, 1)},\n')
+            f.write(f'  "config": {_indented(self.config, 1)},\n')
+            for name, last in (('sections', False), ('chunks', True)):
+                spool = self.spools[name]
+                spool.seek(0)
+                f.write(f'  "{name}": [')
+                for i, line in enumerate(spool):
+                    f.write(("," if i else "") + "\n    " + _indented(json.loads(line), 2))
+                f.write(("\n  ]" if self.counts[name] else "]") + ("\n" if last else ",\n"))
+            f.write("}")
+        self.close()
+        return manifest_path
+
+    def close(self):
+        for spool in self.spools.values():
+            spool.close()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+NyayaSetu AI - Binary embedding store
+Stores chunk embeddings as a pre-normalized .npy matrix plus a JSON Lines sidecar
+with the text and metadata of each row, so the query side can memory-map vectors
+instead of parsing them from JSON
+"""
+
+import json
+import os
+from typing import List, Dict, Any, Iterator, Tuple
+from pathlib import Path
+
+import numpy as np
+
+# Package-relative when imported as src.rag, sibling modules when run as a script
+if __package__:
+    from .kb_index import normalize_rows
+else:
+    from kb_index import normalize_rows
+
+EMBEDDINGS_FILE = "embeddings.npy"
+CHUNKS_FILE = "chunks.jsonl"
+SUPPORTED_DTYPES = ("float32", "float16")
+
+# The matrix is written under this name and swapped in when complete, so a rebuild
+# can keep reading reused rows from a mapping of the previous store meanwhile
+PARTIAL_SUFFIX = ".partial"
+
+
+def chunk_id(index: int, doc_id: str = "cpa2019") -> str:
+    """Stable identifier for the chunk at a given position of a document"""
+    return f"{doc_id}_chunk_{index}"
+
+
+def has_embedding_store(store_dir) -> bool:
+    """Check whether a directory contains a binary embedding store"""
+    store_dir = Path(store_dir)
+    return (store_dir / EMBEDDINGS_FILE).exists() and (store_dir / CHUNKS_FILE).exists()
+
+
+def remove_embedding_store(store_dir):
+    """Delete the store of an earlier build, e.g. when a rebuild embedded nothing"""
+    for name in (EMBEDDINGS_FILE, CHUNKS_FILE):
+        path = Path(store_dir) / name
+        if path.exists():
+            path.unlink()
+
+
+def kb_fingerprint(kb_dir) -> tuple:
+    """Modification time and size of each knowledge base file, to detect rebuilds"""
+    kb_dir = Path(kb_dir)
+    fingerprint = []
+    for name in (EMBEDDINGS_FILE, CHUNKS_FILE, "knowledge_base.json", "manifest.json"):
+        path = kb_dir / name
+        if path.exists():
+            stat = path.stat()
+            fingerprint.append((name, stat.st_mtime_ns, stat.st_size))
+    return tuple(fingerprint)
+
+
+def save_embedding_store(chunks: List[Dict[str, Any]], store_dir, dtype: str = "float32",
+                         doc_id: str = "cpa2019") -> int:
+    """Write embedded chunks as an .npy matrix and a text/metadata sidecar"""
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype} (expected one of {SUPPORTED_DTYPES})")
+
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+
+    rows = [(i, chunk) for i, chunk in enumerate(chunks) if 'embedding' in chunk]
+    if not rows:
+        # Readers prefer the store, so a stale one would shadow this build
+        remove_embedding_store(store_dir)
+        return 0
+
+    # Vectors are normalized once here so readers can score straight off the mapping
+    matrix = normalize_rows(np.array([chunk['embedding'] for _, chunk in rows], dtype=np.float32))
+    partial_path = store_dir / (EMBEDDINGS_FILE + PARTIAL_SUFFIX)
+    with open(partial_path, 'wb') as f:
+        np.save(f, matrix.astype(dtype))
+    os.replace(partial_path, store_dir / EMBEDDINGS_FILE)
+
+    with open(store_dir / CHUNKS_FILE, 'w', encoding='utf-8') as f:
+        for i, chunk in rows:
+            record = {'id': chunk_id(i, doc_id), 'text': chunk['text'], 'metadata': chunk['metadata']}
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    return len(rows)
+
+
+class EmbeddingStoreWriter:
+    """Append embedded chunks to a store batch by batch, without holding the matrix"""
+
+    # Fixed .npy header size, so the final row count can be written in place on close
+    HEADER_SIZE = 128
+
+    def __init__(self, store_dir, dtype: str = "float32", doc_id: str = "cpa2019"):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype} (expected one of {SUPPORTED_DTYPES})")
+
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.dtype = np.dtype(dtype)
+        self.doc_id = doc_id
+        self.rows = 0
+        self.dimension = None
+
+        self._matrix_file = open(self.store_dir / (EMBEDDINGS_FILE + PARTIAL_SUFFIX), 'wb')
+        self._matrix_file.write(self._header())
+        self._records_file = open(self.store_dir / CHUNKS_FILE, 'w', encoding='utf-8')
+
+    def _header(self) -> bytes:
+        shape = (self.rows, self.dimension or 0)
+        header = repr({'descr': np.lib.format.dtype_to_descr(self.dtype), 'fortran_order': False, 'shape': shape})
+        # Magic (6) + version (2) + header length (2), then the padded dict ending in a newline
+        body = header.ljust(self.HEADER_SIZE - 10 - 1) + "\n"
+        return b"\x93NUMPY\x01\x00" + len(body).to_bytes(2, 'little') + body.encode('latin1')
+
+    def append(self, chunks: List[Dict[str, Any]], start_index: int):
+        """Write the embedded chunks of a batch whose first chunk has position start_index"""
+        rows = [(start_index + i, chunk) for i, chunk in enumerate(chunks) if 'embedding' in chunk]
+        if not rows:
+            return
+
+        matrix = normalize_rows(np.array([chunk['embedding'] for _, chunk in rows], dtype=np.float32))
+        if self.dimension is None:
+            self.dimension = matrix.shape[1]
+        self._matrix_file.write(matrix.astype(self.dtype).tobytes())
+
+        for i, chunk in rows:
+            record = {'id': chunk_id(i, self.doc_id), 'text': chunk['text'], 'metadata': chunk['metadata']}
+            self._records_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.rows += len(rows)
+
+    def close(self) -> int:
+        """Finalize the header with the row count; returns the number of rows written"""
+        self._matrix_file.seek(0)
+        self._matrix_file.write(self._header())
+        self._matrix_file.close()
+        self._records_file.close()
+        os.replace(self._matrix_file.name, self.store_dir / EMBEDDINGS_FILE)
+        return self.rows
+
+
+def load_embedding_matrix(store_dir, mmap: bool = True) -> np.ndarray:
+    """Open only the vectors of a store, without reading its sidecar records"""
+    return np.load(Path(store_dir) / EMBEDDINGS_FILE, mmap_mode='r' if mmap else None)
+
+
+def load_embedding_store(store_dir, mmap: bool = True) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """Open a binary embedding store, memory-mapping the matrix by default"""
+    store_dir = Path(store_dir)
+
+    embeddings = load_embedding_matrix(store_dir, mmap=mmap)
+
+    with open(store_dir / CHUNKS_FILE, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    if len(records) != len(embeddings):
+        raise ValueError(
+            f"Embedding store is inconsistent: {len(embeddings)} vectors but {len(records)} records"
+        )
+
+    return embeddings, records
+
+
+def merge_embedding_stores(store_dirs: List, output_dir) -> int:
+    """Concatenate several embedding stores, in order, into one store"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    matrices = []
+    with open(output_dir / CHUNKS_FILE, 'w', encoding='utf-8') as f:
+        for store_dir in store_dirs:
+            embeddings, records = load_embedding_store(store_dir)
+            matrices.append(embeddings)
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    # Shard rows are already normalized, so they are copied without rescaling
+    matrix = np.concatenate(matrices) if matrices else np.empty((0, 0), dtype=np.float32)
+    np.save(output_dir / EMBEDDINGS_FILE, matrix)
+    return len(matrix)
+
+
+def iter_store_records(store_dir) -> Iterator[Dict[str, Any]]:
+    """Stream the text/metadata records of a store without loading them all"""
+    with open(Path(store_dir) / CHUNKS_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main():
+    """Convert an existing knowledge_base.json into a binary embedding store"""
+    import argparse
+
+    project_root = Path(__file__).parent.parent.parent
+    default_dir = project_root / "knowledge_base"
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--kb-dir", default=str(default_dir), help="Knowledge base directory")
+    parser.add_argument("--dtype", default="float32", choices=SUPPORTED_DTYPES, help="On-disk vector precision")
+    args = parser.parse_args()
+
+    kb_dir = Path(args.kb_dir)
+    with open(kb_dir / "knowledge_base.json", 'r', encoding='utf-8') as f:
+        chunks = json.load(f)
+
+    count = save_embedding_store(chunks, kb_dir, dtype=args.dtype)
+    print(f"✓ Wrote {count} vectors ({args.dtype}) to {kb_dir / EMBEDDINGS_FILE}")
+    print(f"✓ Wrote chunk sidecar to {kb_dir / CHUNKS_FILE}")
+
+    # Same rows as the store, as in a full build, so lexical and hybrid search keep working
+    if count:
+        if __package__:
+            from .lexical_index import LexicalIndex, LEXICAL_INDEX_FILE
+        else:
+            from lexical_index import LexicalIndex, LEXICAL_INDEX_FILE
+        LexicalIndex.build(record['text'] for record in iter_store_records(kb_dir)).save(kb_dir)
+        print(f"✓ Wrote BM25 lexical index to {kb_dir / LEXICAL_INDEX_FILE}")
+
+
+if __name__ == "__main__":
+    main()
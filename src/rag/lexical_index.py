@@ -0,0 +1,170 @@
+"""
+NyayaSetu AI - Lexical (BM25) index
+Precomputed inverted index over chunk texts so exact legal terms and section
+numbers can be matched alongside dense retrieval
+"""
+
+import json
+import re
+from array import array
+from typing import List, Dict, Iterable, Optional, Tuple
+from pathlib import Path
+
+import numpy as np
+
+# Package-relative when imported as src.rag, sibling modules when run as a script
+if __package__:
+    from .kb_index import top_k_indices
+else:
+    from kb_index import top_k_indices
+
+LEXICAL_INDEX_FILE = "lexical_index.npz"
+LEXICAL_VOCAB_FILE = "lexical_vocab.json"
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Function words that carry no retrieval signal; legal terms such as
+# "under", "not" or "any" are deliberately kept
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were which with".split()
+)
+
+
+def tokenize(text: str, bigrams: bool = True) -> List[str]:
+    """Lowercased word tokens, plus adjacent-word bigrams for phrase matching"""
+    words = [word for word in TOKEN_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+    if not bigrams:
+        return words
+    return words + [f"{first}_{second}" for first, second in zip(words, words[1:])]
+
+
+class LexicalIndex:
+    """BM25 inverted index stored as CSR arrays of per-posting impact scores"""
+
+    def __init__(self, vocabulary: List[str], term_offsets: np.ndarray, doc_ids: np.ndarray,
+                 impacts: np.ndarray, idf: np.ndarray, doc_lengths: np.ndarray,
+                 k1: float = 1.5, b: float = 0.75, bigrams: bool = True):
+        self.vocabulary = vocabulary
+        self.term_ids = {term: i for i, term in enumerate(vocabulary)}
+        self.term_offsets = term_offsets
+        self.doc_ids = doc_ids
+        self.impacts = impacts
+        self.idf = idf
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.bigrams = bigrams
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    @classmethod
+    def build(cls, texts: Iterable[str], k1: float = 1.5, b: float = 0.75, bigrams: bool = True) -> "LexicalIndex":
+        """Tokenize texts once and precompute the BM25 contribution of every posting"""
+        term_ids = {}
+        # Postings (term id, doc id, term frequency) in compact typed columns,
+        # since texts may be streamed from a corpus too large to hold as tuples
+        terms, docs, tfs = array('q'), array('q'), array('q')
+        lengths = array('q')
+
+        # Texts may be a generator (e.g. streamed from the chunk sidecar)
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text, bigrams=bigrams)
+            lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                terms.append(term_ids.setdefault(token, len(term_ids)))
+                docs.append(doc_id)
+                tfs.append(tf)
+
+        doc_lengths = np.frombuffer(lengths, dtype=np.int64).astype(np.float32)
+        vocabulary = [None] * len(term_ids)
+        for term, i in term_ids.items():
+            vocabulary[i] = term
+
+        terms, docs, tfs = (np.frombuffer(column, dtype=np.int64) for column in (terms, docs, tfs))
+        order = np.lexsort((docs, terms))
+        terms, docs, tfs = terms[order], docs[order].astype(np.int32), tfs[order].astype(np.float32)
+
+        doc_freq = np.bincount(terms, minlength=len(vocabulary)).astype(np.float32)
+        term_offsets = np.concatenate([[0], np.cumsum(doc_freq)]).astype(np.int64)
+
+        n_docs = len(doc_lengths)
+        idf = np.log(1.0 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+        avg_length = doc_lengths.mean() if n_docs and doc_lengths.mean() > 0 else 1.0
+
+        norm = k1 * (1 - b + b * doc_lengths[docs] / avg_length)
+        impacts = (idf[terms] * tfs * (k1 + 1) / (tfs + norm)).astype(np.float32)
+
+        return cls(vocabulary, term_offsets, docs, impacts, idf, doc_lengths, k1=k1, b=b, bigrams=bigrams)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for a query"""
+        slices = []
+        for term in set(tokenize(query, bigrams=self.bigrams)):
+            term_id = self.term_ids.get(term)
+            if term_id is not None:
+                slices.append(slice(self.term_offsets[term_id], self.term_offsets[term_id + 1]))
+
+        if not slices:
+            return np.zeros(len(self), dtype=np.float32)
+
+        docs = np.concatenate([self.doc_ids[s] for s in slices])
+        impacts = np.concatenate([self.impacts[s] for s in slices])
+        return np.bincount(docs, weights=impacts, minlength=len(self)).astype(np.float32)
+
+    def rank(self, query: str, top_k: int, rows: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Best (row, score) pairs with a positive score, optionally among given rows"""
+        scores = self.scores(query)
+        if rows is not None:
+            scores = scores[rows]
+        else:
+            rows = np.arange(len(scores))
+
+        best = top_k_indices(scores, top_k)
+        return [(int(rows[i]), float(scores[i])) for i in best if scores[i] > 0]
+
+    def save(self, output_dir):
+        """Write the postings arrays and vocabulary next to the knowledge base"""
+        output_dir = Path(output_dir)
+        np.savez(
+            output_dir / LEXICAL_INDEX_FILE,
+            term_offsets=self.term_offsets, doc_ids=self.doc_ids, impacts=self.impacts,
+            idf=self.idf, doc_lengths=self.doc_lengths,
+            params=np.array([self.k1, self.b, float(self.bigrams)], dtype=np.float64)
+        )
+        with open(output_dir / LEXICAL_VOCAB_FILE, 'w', encoding='utf-8') as f:
+            json.dump(self.vocabulary, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, output_dir) -> Optional["LexicalIndex"]:
+        """Read an index written by save(), or None if there is none"""
+        output_dir = Path(output_dir)
+        if not (output_dir / LEXICAL_INDEX_FILE).exists() or not (output_dir / LEXICAL_VOCAB_FILE).exists():
+            return None
+
+        with open(output_dir / LEXICAL_VOCAB_FILE, 'r', encoding='utf-8') as f:
+            vocabulary = json.load(f)
+        with np.load(output_dir / LEXICAL_INDEX_FILE) as data:
+            k1, b, bigrams = data['params']
+            return cls(vocabulary, data['term_offsets'], data['doc_ids'], data['impacts'],
+                       data['idf'], data['doc_lengths'], k1=float(k1), b=float(b), bigrams=bool(bigrams))
+
+
+def remove_lexical_index(output_dir):
+    """Delete a stale BM25 index left by an earlier build"""
+    for name in (LEXICAL_INDEX_FILE, LEXICAL_VOCAB_FILE):
+        path = Path(output_dir) / name
+        if path.exists():
+            path.unlink()
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse ranked row lists: score(row) = sum over rankings of 1 / (k + rank)"""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, 1):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: (-item[1], item[0]))
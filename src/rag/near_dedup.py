@@ -0,0 +1,105 @@
+"""
+NyayaSetu AI - Near-duplicate chunk detection
+MinHash signatures over word shingles with locality-sensitive hashing (LSH)
+bands; candidate pairs are confirmed by their exact shingle Jaccard similarity
+"""
+
+import re
+import zlib
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+DEDUP_MODES = ('flag', 'collapse')
+DUPLICATES_FILE = "duplicates.json"
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# Universal hashing (a * x + b) mod p; a < 2^31 and x < 2^32 keep a * x inside uint64
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+
+
+def shingles(text: str, words: int = 5) -> np.ndarray:
+    """Sorted unique 32-bit hashes of the text's overlapping word n-grams"""
+    tokens = WORD_PATTERN.findall(text.lower())
+    if len(tokens) <= words:
+        grams = [" ".join(tokens)]
+    else:
+        grams = [" ".join(tokens[i:i + words]) for i in range(len(tokens) - words + 1)]
+    return np.unique(np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams), dtype=np.uint64, count=len(grams)))
+
+
+def jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    """Jaccard similarity of two sorted unique hash arrays"""
+    shared = len(np.intersect1d(a, b, assume_unique=True))
+    return shared / (len(a) + len(b) - shared)
+
+
+def lsh_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """(bands, rows per band) whose S-curve midpoint (1/b)^(1/r) is closest to the threshold"""
+    options = [(bands, num_perm // bands) for bands in range(1, num_perm + 1) if num_perm % bands == 0]
+    return min(options, key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - threshold))
+
+
+class MinHashDeduplicator:
+    """Online near-duplicate detector: each text is matched against the texts kept before it"""
+
+    def __init__(self, threshold: float = 0.95, num_perm: int = 128, shingle_words: int = 5, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        # Bands are placed a little below the threshold so true matches rarely miss a bucket
+        self.bands, self.rows_per_band = lsh_bands(max(0.0, threshold - 0.1), num_perm)
+
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 31, num_perm, dtype=np.uint64)
+
+        self.buckets: List[Dict[bytes, List[Any]]] = [{} for _ in range(self.bands)]
+        self.kept_shingles: Dict[Any, np.ndarray] = {}
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        """MinHash signature of a shingle hash set"""
+        return ((np.outer(self.a, hashes) + self.b[:, None]) % MERSENNE_PRIME).min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        r = self.rows_per_band
+        return [signature[band * r:(band + 1) * r].tobytes() for band in range(self.bands)]
+
+    def add(self, key: Any, text: str) -> Optional[Tuple[Any, float]]:
+        """Return (key of the kept text it duplicates, similarity), or keep the text and return None"""
+        hashes = shingles(text, self.shingle_words)
+        band_keys = self._band_keys(self.signature(hashes))
+
+        candidates = {kept for band, band_key in enumerate(band_keys) for kept in self.buckets[band].get(band_key, ())}
+        best = None
+        for kept in candidates:
+            similarity = jaccard(hashes, self.kept_shingles[kept])
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (kept, similarity)
+        if best is not None:
+            return best
+
+        # Only kept texts are indexed, so every duplicate points at a kept representative
+        self.kept_shingles[key] = hashes
+        for band, band_key in enumerate(band_keys):
+            self.buckets[band].setdefault(band_key, []).append(key)
+        return None
+
+
+def dedup_summary(mode: str, deduplicator: MinHashDeduplicator, chunks_in: int,
+                  duplicates: List[Dict[str, Any]], row_bytes: int = 0) -> Dict[str, Any]:
+    """Counts and savings of a dedup pass (savings are only realized when collapsing)"""
+    collapsed = mode == 'collapse'
+    return {
+        'mode': mode,
+        'threshold': deduplicator.threshold,
+        'num_perm': deduplicator.num_perm,
+        'bands': deduplicator.bands,
+        'chunks_in': chunks_in,
+        'duplicates': len(duplicates),
+        'chunks_out': chunks_in - len(duplicates) if collapsed else chunks_in,
+        'duplicate_chars': sum(entry['chars'] for entry in duplicates),
+        'encodes_saved': len(duplicates) if collapsed else 0,
+        'store_bytes_saved': len(duplicates) * row_bytes if collapsed else 0
+    }
@@ -0,0 +1,203 @@
+"""
+NyayaSetu AI - Quantized embeddings
+Scalar int8 and product quantization of pre-normalized chunk embeddings, with
+scoring performed directly on the codes
+"""
+
+from typing import Optional
+from pathlib import Path
+
+import numpy as np
+
+QUANTIZER_FILE = "quantizer.npz"
+CODES_FILE = "embedding_codes.npy"
+QUANTIZATION_KINDS = ("int8", "pq")
+
+# Rows scored per block, bounding the temporary float copy of the codes
+SCORE_BLOCK_ROWS = 8192
+
+
+class ScalarQuantizer:
+    """Symmetric int8 quantization with one scale per dimension"""
+
+    kind = "int8"
+
+    def __init__(self, scale: np.ndarray):
+        self.scale = scale.astype(np.float32)
+
+    @property
+    def code_width(self) -> int:
+        """Codes per row (one per dimension)"""
+        return len(self.scale)
+
+    @classmethod
+    def train(cls, embeddings: np.ndarray) -> "ScalarQuantizer":
+        """Fit per-dimension scales so each column spans [-127, 127]"""
+        scale = np.abs(np.asarray(embeddings, dtype=np.float32)).max(axis=0) / 127.0
+        scale[scale == 0] = 1.0
+        return cls(scale)
+
+    def encode(self, embeddings: np.ndarray) -> np.ndarray:
+        """Quantize rows to int8 codes"""
+        codes = np.rint(np.asarray(embeddings, dtype=np.float32) / self.scale)
+        return np.clip(codes, -127, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Approximate float rows from codes"""
+        return codes.astype(np.float32) * self.scale
+
+    def score(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Inner products between a float query and int8 codes"""
+        # q . (c * s) == (q * s) . c, so the scale is folded into the query once
+        scaled_query = query * self.scale
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = codes[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ scaled_query
+        return scores
+
+    def save(self, path):
+        np.savez(path, kind=self.kind, scale=self.scale)
+
+
+def _kmeans_l2(vectors: np.ndarray, n_clusters: int, iterations: int, rng) -> np.ndarray:
+    """Lloyd's k-means under Euclidean distance"""
+    n_clusters = min(n_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        # ||x - c||^2 up to a per-row constant
+        distances = (centroids ** 2).sum(axis=1) - 2 * vectors @ centroids.T
+        assignment = np.argmin(distances, axis=1)
+
+        counts = np.bincount(assignment, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+
+        filled = counts > 0
+        updated = centroids.copy()
+        updated[filled] = sums[filled] / counts[filled, None]
+        if np.allclose(updated, centroids):
+            break
+        centroids = updated
+
+    return centroids
+
+
+class ProductQuantizer:
+    """Product quantization: each subspace is coded by its nearest of up to 256 centroids"""
+
+    kind = "pq"
+
+    def __init__(self, codebooks: np.ndarray):
+        # codebooks: (subspaces, centroids, subspace dimension)
+        self.codebooks = codebooks.astype(np.float32)
+
+    @property
+    def subspaces(self) -> int:
+        return self.codebooks.shape[0]
+
+    @property
+    def code_width(self) -> int:
+        """Codes per row (one per subspace)"""
+        return self.subspaces
+
+    @classmethod
+    def train(cls, embeddings: np.ndarray, subspaces: int = 48, iterations: int = 25, seed: int = 0) -> "ProductQuantizer":
+        """Learn one codebook per subspace"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        dimension = embeddings.shape[1]
+        if dimension % subspaces:
+            raise ValueError(f"Embedding dimension {dimension} is not divisible into {subspaces} subspaces")
+
+        width = dimension // subspaces
+        n_centroids = min(256, len(embeddings))
+        rng = np.random.default_rng(seed)
+
+        codebooks = np.zeros((subspaces, n_centroids, width), dtype=np.float32)
+        for j in range(subspaces):
+            codebooks[j] = _kmeans_l2(embeddings[:, j * width:(j + 1) * width], n_centroids, iterations, rng)
+        return cls(codebooks)
+
+    def encode(self, embeddings: np.ndarray) -> np.ndarray:
+        """Quantize rows to one uint8 centroid id per subspace"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        width = self.codebooks.shape[2]
+        codes = np.empty((len(embeddings), self.subspaces), dtype=np.uint8)
+        for j, codebook in enumerate(self.codebooks):
+            sub = embeddings[:, j * width:(j + 1) * width]
+            distances = (codebook ** 2).sum(axis=1) - 2 * sub @ codebook.T
+            codes[:, j] = np.argmin(distances, axis=1)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Approximate float rows from codes"""
+        return np.concatenate([self.codebooks[j][codes[:, j]] for j in range(self.subspaces)], axis=1)
+
+    def score(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Asymmetric inner products: per-subspace lookup tables summed over codes"""
+        width = self.codebooks.shape[2]
+        tables = np.einsum('jcw,jw->jc', self.codebooks, query.reshape(self.subspaces, width))
+
+        scores = np.zeros(len(codes), dtype=np.float32)
+        for j in range(self.subspaces):
+            scores += tables[j][codes[:, j]]
+        return scores
+
+    def save(self, path):
+        np.savez(path, kind=self.kind, codebooks=self.codebooks)
+
+
+def train_quantizer(embeddings: np.ndarray, kind: str, pq_subspaces: int = 48):
+    """Fit a quantizer of the given kind"""
+    if kind == "int8":
+        return ScalarQuantizer.train(embeddings)
+    if kind == "pq":
+        return ProductQuantizer.train(embeddings, subspaces=pq_subspaces)
+    raise ValueError(f"Unsupported quantization: {kind} (expected one of {QUANTIZATION_KINDS})")
+
+
+def load_quantizer(path):
+    """Read a quantizer written by save()"""
+    with np.load(path) as data:
+        kind = str(data['kind'])
+        if kind == "int8":
+            return ScalarQuantizer(data['scale'])
+        if kind == "pq":
+            return ProductQuantizer(data['codebooks'])
+    raise ValueError(f"Unknown quantizer kind in {path}: {kind}")
+
+
+def save_quantized_store(embeddings: np.ndarray, store_dir, kind: str, pq_subspaces: int = 48) -> int:
+    """Quantize stored vectors and write the codes plus quantizer parameters"""
+    store_dir = Path(store_dir)
+    quantizer = train_quantizer(embeddings, kind, pq_subspaces=pq_subspaces)
+    codes = quantizer.encode(embeddings)
+
+    np.save(store_dir / CODES_FILE, codes)
+    quantizer.save(store_dir / QUANTIZER_FILE)
+    return codes.nbytes
+
+
+def load_quantized_store(store_dir, mmap: bool = True, rows: Optional[int] = None):
+    """Open quantized codes and their quantizer, or (None, None) if absent"""
+    store_dir = Path(store_dir)
+    if not (store_dir / CODES_FILE).exists() or not (store_dir / QUANTIZER_FILE).exists():
+        return None, None
+    codes = np.load(store_dir / CODES_FILE, mmap_mode='r' if mmap else None)
+    quantizer = load_quantizer(store_dir / QUANTIZER_FILE)
+
+    # Codes from a different build (or a different quantizer) would score the wrong rows
+    expected = (rows if rows is not None else len(codes), quantizer.code_width)
+    if codes.ndim != 2 or codes.shape != expected:
+        raise ValueError(f"Quantized codes in {store_dir} have shape {codes.shape}, expected {expected}; "
+                         f"rebuild the knowledge base")
+    return codes, quantizer
+
+
+def remove_quantized_store(store_dir):
+    """Delete stale codes and quantizer parameters left by an earlier build"""
+    for name in (CODES_FILE, QUANTIZER_FILE):
+        path = Path(store_dir) / name
+        if path.exists():
+            path.unlink()
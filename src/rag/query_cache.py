@@ -0,0 +1,149 @@
+"""
+NyayaSetu AI - Query result cache
+Serves repeated questions, and close paraphrases of recently answered ones,
+without re-encoding or re-scoring
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+# Package-relative when imported as src.rag, sibling modules when run as a script
+if __package__:
+    from .kb_index import normalize_rows
+    from .embedding_cache import normalize_text
+    from .kb_store import kb_fingerprint
+else:
+    from kb_index import normalize_rows
+    from embedding_cache import normalize_text
+    from kb_store import kb_fingerprint
+
+
+class QueryResultCache:
+    """Bounded TTL cache of search results with semantic near-duplicate lookup"""
+
+    def __init__(self, max_size: int = 256, ttl: float = 300.0, similarity_threshold: float = 0.95,
+                 kb_dir=None, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.kb_dir = kb_dir
+        self.clock = clock
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._matrix_keys = []
+        self._fingerprint = kb_fingerprint(kb_dir) if kb_dir is not None else None
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(query: str, top_k: int, scope=None):
+        """Cache key for a query (scope distinguishes e.g. filtered searches)"""
+        return (normalize_text(query).casefold(), top_k, scope)
+
+    def invalidate(self):
+        """Drop every cached result"""
+        with self._lock:
+            self._clear()
+            self.invalidations += 1
+
+    def _clear(self):
+        self._entries.clear()
+        self._matrix = None
+        self._matrix_keys = []
+
+    def _check_fresh(self):
+        # Results from a knowledge base that has since been rebuilt are discarded
+        if self.kb_dir is not None:
+            fingerprint = kb_fingerprint(self.kb_dir)
+            if fingerprint != self._fingerprint:
+                self._fingerprint = fingerprint
+                self._clear()
+                self.invalidations += 1
+
+        if self.ttl is not None:
+            now = self.clock()
+            expired = [key for key, entry in self._entries.items() if now - entry['created'] > self.ttl]
+            for key in expired:
+                del self._entries[key]
+            if expired:
+                self._matrix = None
+
+    def get(self, query: str, top_k: int, scope=None) -> Optional[List[Dict[str, Any]]]:
+        """Return cached results for exactly this query, if any"""
+        key = self.key(query, top_k, scope)
+        with self._lock:
+            self._check_fresh()
+            entry = self._entries.get(key)
+            if entry is None:
+                # Expired and invalidated entries were dropped above, so they count here too
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return list(entry['results'])
+
+    def get_similar(self, query_embedding, top_k: int, scope=None) -> Optional[List[Dict[str, Any]]]:
+        """Return cached results of a recent query whose embedding is close enough"""
+        with self._lock:
+            self._check_fresh()
+            if self._matrix is None:
+                # Lexical-only entries have no embedding and are only found by exact lookup
+                self._matrix_keys = [key for key, entry in self._entries.items() if entry['embedding'] is not None]
+                if self._matrix_keys:
+                    self._matrix = np.vstack([self._entries[key]['embedding'] for key in self._matrix_keys])
+                else:
+                    self._matrix = np.empty((0, 0), dtype=np.float32)
+
+            if not self._matrix_keys:
+                self.misses += 1
+                return None
+
+            query = normalize_rows(np.asarray(query_embedding, dtype=np.float32))
+            scores = self._matrix @ query
+
+            # Only entries answering the same top_k/scope are interchangeable
+            for row in np.argsort(-scores):
+                if scores[row] < self.similarity_threshold:
+                    break
+                key = self._matrix_keys[row]
+                if key[1:] == (top_k, scope):
+                    self._entries.move_to_end(key)
+                    self.semantic_hits += 1
+                    return list(self._entries[key]['results'])
+
+            self.misses += 1
+            return None
+
+    def put(self, query: str, query_embedding, top_k: int, results: List[Dict[str, Any]], scope=None):
+        """Remember the results of a query"""
+        key = self.key(query, top_k, scope)
+        embedding = None
+        if query_embedding is not None:
+            embedding = normalize_rows(np.asarray(query_embedding, dtype=np.float32))
+        with self._lock:
+            self._entries[key] = {'results': list(results), 'embedding': embedding, 'created': self.clock()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters (an exact and a semantic lookup of one query each count)"""
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'exact_hits': self.exact_hits,
+            'semantic_hits': self.semantic_hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0
+        }
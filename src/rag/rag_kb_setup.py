@@ -4,84 +4,304 @@ NyayaSetu AI - RAG Knowledge Base Foundation Setup
 Day 0: Process Consumer Protection Act, 2019 PDF into structured, embedded knowledge base
 """
 
+import bisect
 import json
 import re
 import os
-from typing import List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from pathlib import Path
 
-# PDF extraction
-try:
-    import PyPDF2
-    PDF_LIBRARY = "PyPDF2"
-except ImportError:
+import numpy as np
+
+# Package-relative when imported as src.rag, sibling modules when run as a script
+if __package__:
+    from .kb_store import (
+        save_embedding_store, load_embedding_matrix, has_embedding_store, chunk_id,
+        EMBEDDINGS_FILE, EmbeddingStoreWriter, iter_store_records, remove_embedding_store
+    )
+    from .embedding_cache import EmbeddingCache
+    from .ann_index import build_ann_index, print_recall_report, remove_ann_index, ANN_INDEX_FILE
+    from .quantization import save_quantized_store, remove_quantized_store, QUANTIZATION_KINDS, CODES_FILE
+    from .lexical_index import LexicalIndex, remove_lexical_index, LEXICAL_INDEX_FILE
+    from .token_chunker import TokenChunker
+    from .batch_encoder import BatchEncoder
+    from .build_metrics import BuildMetrics, print_stage_table
+    from .near_dedup import MinHashDeduplicator, dedup_summary, DEDUP_MODES, DUPLICATES_FILE
+    from .encoders import load_encoder, encoder_id, add_encoder_arguments
+    from .vector_export import NdjsonWriter, EXPORT_FILE
+    from .kb_manifest import (
+        MANIFEST_FILE, content_hash, file_hash, load_manifest, save_manifest,
+        build_manifest, changed_sections, cached_rows, section_entry, chunk_entry, ManifestWriter
+    )
+else:
+    from kb_store import (
+        save_embedding_store, load_embedding_matrix, has_embedding_store, chunk_id,
+        EMBEDDINGS_FILE, EmbeddingStoreWriter, iter_store_records, remove_embedding_store
+    )
+    from embedding_cache import EmbeddingCache
+    from ann_index import build_ann_index, print_recall_report, remove_ann_index, ANN_INDEX_FILE
+    from quantization import save_quantized_store, remove_quantized_store, QUANTIZATION_KINDS, CODES_FILE
+    from lexical_index import LexicalIndex, remove_lexical_index, LEXICAL_INDEX_FILE
+    from token_chunker import TokenChunker
+    from batch_encoder import BatchEncoder
+    from build_metrics import BuildMetrics, print_stage_table
+    from near_dedup import MinHashDeduplicator, dedup_summary, DEDUP_MODES, DUPLICATES_FILE
+    from encoders import load_encoder, encoder_id, add_encoder_arguments
+    from vector_export import NdjsonWriter, EXPORT_FILE
+    from kb_manifest import (
+        MANIFEST_FILE, content_hash, file_hash, load_manifest, save_manifest,
+        build_manifest, changed_sections, cached_rows, section_entry, chunk_entry, ManifestWriter
+    )
+
+# The single-document build (main) processes this Act
+DEFAULT_ACT_NAME = "Consumer Protection Act, 2019"
+DEFAULT_DOC_ID = "cpa2019"
+
+# Structural markers; only uppercase "CHAPTER" is a header ("Chapter" is a reference)
+CHAPTER_PATTERN = re.compile(r'CHAPTER\s+([IVXLC]+)')
+SECTION_BOUNDARY_PATTERN = re.compile(r'(?=\n\s*Section\s+\d+\.)')
+SECTION_HEADER_PATTERN = re.compile(r'Section\s+(\d+)\.')
+
+# Heavy dependencies (PDF parser, sentence-transformers/torch) are imported on
+# first use, so importing this module stays cheap for query-only processes
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+_pdf_library = None
+
+
+def pdf_library() -> str:
+    """Name of the available PDF library ("PyPDF2" or "pdfplumber"), detected on first call"""
+    global _pdf_library
+    if _pdf_library is None:
+        try:
+            import PyPDF2  # noqa: F401
+            _pdf_library = "PyPDF2"
+        except ImportError:
+            try:
+                import pdfplumber  # noqa: F401
+                _pdf_library = "pdfplumber"
+            except ImportError:
+                raise ImportError("No PDF library found. Install with: pip install PyPDF2 or pip install pdfplumber")
+    return _pdf_library
+
+
+def load_embedding_model(model_name: str = EMBEDDING_MODEL_NAME, backend: str = 'torch', model_path=None):
+    """Load an encoder backend, or return None (with a warning) if it is unavailable"""
     try:
-        import pdfplumber
-        PDF_LIBRARY = "pdfplumber"
+        model = load_encoder(backend, model_name, model_path)
     except ImportError:
-        print("ERROR: No PDF library found. Install with: pip install PyPDF2 or pip install pdfplumber")
-        exit(1)
+        if backend == 'onnx':
+            print("WARNING: onnxruntime or transformers not found. Install with: pip install onnxruntime transformers")
+        else:
+            print("WARNING: sentence-transformers not found. Install with: pip install sentence-transformers")
+        print("Proceeding without embeddings generation...")
+        return None
+    except Exception as e:
+        print(f"WARNING: Could not load embedding model: {e}")
+        return None
+    
+    print(f"✓ Embedding model loaded: {encoder_id(model_name, backend, model_path)}")
+    return model
+
+
+def iter_pdf_pages(pdf_path, start: int = 0, end: int = None) -> Iterator[Tuple[int, str]]:
+    """Yield (page number, text) for pages [start, end) of a PDF, one page at a time"""
+    if pdf_library() == "pdfplumber":
+        import pdfplumber
+        with pdfplumber.open(pdf_path) as pdf:
+            for page_num in range(start, len(pdf.pages) if end is None else end):
+                yield page_num + 1, pdf.pages[page_num].extract_text() or ""
+    
+    else:  # PyPDF2
+        import PyPDF2
+        with open(pdf_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            for page_num in range(start, len(pdf_reader.pages) if end is None else end):
+                yield page_num + 1, pdf_reader.pages[page_num].extract_text() or ""
+
+
+def read_pdf_pages(pdf_path, start: int = 0, end: int = None) -> List[Tuple[int, str]]:
+    """Extract (page number, text) for pages [start, end) of a PDF"""
+    return list(iter_pdf_pages(pdf_path, start, end))
+
+
+def count_pdf_pages(pdf_path) -> int:
+    """Number of pages in a PDF"""
+    if pdf_library() == "pdfplumber":
+        import pdfplumber
+        with pdfplumber.open(pdf_path) as pdf:
+            return len(pdf.pages)
+    
+    import PyPDF2
+    with open(pdf_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def clean_fragment(text: str) -> str:
+    """Apply the cleaning passes to extracted text (without the final strip)"""
+    # Remove page numbers (standalone numbers)
+    text = re.sub(r'\n\s*\d+\s*\n', '\n', text)
+    
+    # Remove excessive whitespace
+    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
+    text = re.sub(r' +', ' ', text)
+    
+    # Remove common header/footer patterns
+    text = re.sub(r'THE GAZETTE OF INDIA.*?\n', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'EXTRAORDINARY.*?\n', '', text, flags=re.IGNORECASE)
+    
+    # Preserve section numbering and structure
+    # Ensure section numbers are properly formatted
+    text = re.sub(r'\n(\d+)\.\s+', r'\n\nSection \1. ', text)
+    
+    # Clean up but preserve chapter markers
+    # Only normalize uppercase CHAPTER markers (actual headers), not lowercase references
+    text = re.sub(r'CHAPTER\s+([IVX]+)', r'\n\nCHAPTER \1', text)
+    
+    return text
+
+
+def clean_page(page_text: str) -> str:
+    """Clean one page as it would be cleaned inside the whole document"""
+    if not page_text:
+        return ""
+    # In the joined document every page follows a newline; cleaning with that
+    # newline in place and dropping it again keeps line-start rules identical
+    return clean_fragment("\n" + page_text + "\n")[1:]
+
 
-# Embeddings
-try:
-    from sentence_transformers import SentenceTransformer
-    EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
-    print(f"Using sentence-transformers for embeddings: {EMBEDDING_MODEL}")
-except ImportError:
-    print("WARNING: sentence-transformers not found. Install with: pip install sentence-transformers")
-    print("Proceeding without embeddings generation...")
-    EMBEDDING_MODEL = None
+def extract_page_range(pdf_path: str, start: int, end: int) -> List[Tuple[int, str, str]]:
+    """Worker: extract and clean pages [start, end) as (page number, raw, cleaned)"""
+    return [
+        (page_num, text + "\n" if text else "", clean_page(text))
+        for page_num, text in read_pdf_pages(pdf_path, start, end)
+    ]
+
+
+class JsonArrayWriter:
+    """Write a JSON array element by element, formatted like json.dump(..., indent=2)"""
+    
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.count = 0
+        self.file.write("[")
+    
+    def write(self, item):
+        text = json.dumps(item, indent=2, ensure_ascii=False)
+        self.file.write(("," if self.count else "") + "\n  " + text.replace("\n", "\n  "))
+        self.count += 1
+    
+    def close(self):
+        self.file.write("\n]" if self.count else "]")
+        self.file.close()
 
 
 class CPAKnowledgeBaseBuilder:
     """Build structured knowledge base from Consumer Protection Act, 2019 PDF"""
     
-    def __init__(self, pdf_path: str, output_dir: str = "knowledge_base"):
+    def __init__(self, pdf_path: str, output_dir: str = "knowledge_base", act_name: str = DEFAULT_ACT_NAME,
+                 doc_id: str = DEFAULT_DOC_ID, language: str = "English", load_model: bool = True,
+                 encoder_backend: str = 'torch', encoder_path: Optional[str] = None):
         self.pdf_path = pdf_path
         self.output_dir = Path(output_dir)
-        self.output_dir.mkdir(exist_ok=True)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Act-level metadata; doc_id prefixes chunk ids so they stay unique across a corpus
+        self.act_name = act_name
+        self.doc_id = doc_id
+        self.language = language
         
         # Chunking configuration
         self.target_chunk_size = 850  # tokens (700-1000 range, targeting middle)
         self.chunk_overlap = 125  # tokens (100-150 range)
         self.avg_chars_per_token = 4  # Approximation for English text
         
-        # Initialize embedding model if available
+        # Token-accurate chunking with the embedding model's tokenizer: chunks fit
+        # max_seq_tokens (None = the model's limit) and overlap by overlap_tokens
+        self.token_chunking = False
+        self.max_seq_tokens = None
+        self.overlap_tokens = 32
+        self.token_chunker = None
+        self.chunking_report = None
+        
+        # Near-duplicate chunks (MinHash LSH, shingle Jaccard >= dedup_threshold) are
+        # marked with 'duplicate_of' ("flag") or dropped before embedding ("collapse")
+        self.dedup = None
+        self.dedup_threshold = 0.95
+        self.deduplicator = None
+        self.duplicates = []
+        self.dedup_seen = 0
+        
+        # On-disk precision of the binary embedding store ("float32" or "float16")
+        self.embedding_dtype = "float32"
+        
+        # Optional IVF approximate-nearest-neighbour index (None lists = sqrt of chunk count)
+        self.build_ann = False
+        self.ann_lists = None
+        
+        # Optional quantized copy of the embeddings ("int8" or "pq") for memory-bounded search
+        self.quantization = None
+        self.pq_subspaces = 48
+        
+        # BM25 index over the chunk texts for lexical and hybrid search
+        self.build_lexical = True
+        
+        # Initialize embedding model if available; the backend (PyTorch, int8 PyTorch or
+        # an exported ONNX file) is part of the encoder id that keys caches and manifests
+        self.encoder_backend = encoder_backend
+        self.encoder_path = encoder_path
+        self.encoder_id = encoder_id(EMBEDDING_MODEL_NAME, encoder_backend, encoder_path)
         self.embedding_model = None
-        if EMBEDDING_MODEL:
-            try:
-                self.embedding_model = SentenceTransformer(EMBEDDING_MODEL)
-                print(f"✓ Embedding model loaded: {EMBEDDING_MODEL}")
-            except Exception as e:
-                print(f"WARNING: Could not load embedding model: {e}")
+        if load_model:
+            self.embedding_model = load_embedding_model(EMBEDDING_MODEL_NAME, encoder_backend, encoder_path)
+        
+        # Persistent embedding cache shared with the query side
+        self.embedding_cache = None
+        if self.embedding_model:
+            self.embedding_cache = EmbeddingCache(self.encoder_id, self.output_dir / "embedding_cache.sqlite")
+        
+        # Encode throughput: batch size, length-sorted batches, torch threads and
+        # encoder processes (0 = encode in this process)
+        self.encode_batch_size = 32
+        self.sort_by_length = True
+        self.torch_threads = None
+        self.encode_workers = 0
+        self.encoder = None
+        
+        # Page-parallel extraction (0 = serial); pages keeps page-number provenance
+        self.parallel_workers = 0
+        self.pages = []
         
         self.chunks = []
         self.raw_text = ""
         self.cleaned_text = ""
+        
+        # Store rows of the previous build, keyed by chunk text hash; reused
+        # vectors are read from its memory-mapped matrix only when needed
+        self.previous_rows = {}
+        self.previous_embeddings = None
+        
+        # Streaming mode: sections, chunks and embedding batches flow through generators,
+        # so peak memory follows the batch size rather than the document size
+        self.streaming = False
+        self.stream_batch_size = 256
+        
+        # Per-stage timing, memory and item counts (stats.json "stages"); tracemalloc
+        # peaks, per-stage cProfile dumps and a Chrome trace file are opt-in
+        self.trace_memory = False
+        self.profile_dir = None
+        self.trace_path = None
+        self.metrics = BuildMetrics()
     
     def extract_text_from_pdf(self) -> str:
         """Extract text from PDF preserving structure"""
         print(f"\n[Step 1] Extracting text from {self.pdf_path}...")
         
-        text = ""
-        
-        if PDF_LIBRARY == "pdfplumber":
-            import pdfplumber
-            with pdfplumber.open(self.pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages, 1):
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-                print(f"✓ Extracted {len(pdf.pages)} pages using pdfplumber")
-        
-        else:  # PyPDF2
-            with open(self.pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page_num, page in enumerate(pdf_reader.pages, 1):
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-                print(f"✓ Extracted {len(pdf_reader.pages)} pages using PyPDF2")
+        page_texts = [text for _, text in read_pdf_pages(self.pdf_path)]
+        text = "".join(page_text + "\n" for page_text in page_texts if page_text)
+        print(f"✓ Extracted {len(page_texts)} pages using {pdf_library()}")
+        self.metrics.count('extract', pages=len(page_texts), chars=len(text))
         
         self.raw_text = text
         print(f"✓ Total characters extracted: {len(text):,}")
@@ -91,46 +311,172 @@ class CPAKnowledgeBaseBuilder:
         """Clean extracted text while preserving legal structure"""
         print("\n[Step 2] Cleaning extracted content...")
         
-        # Remove page numbers (standalone numbers)
-        text = re.sub(r'\n\s*\d+\s*\n', '\n', text)
+        self.cleaned_text = clean_fragment(text).strip()
+        print(f"✓ Cleaned text: {len(self.cleaned_text):,} characters")
+        print(f"✓ Reduction: {len(self.raw_text) - len(self.cleaned_text):,} characters removed")
+        self.metrics.count('clean', chars=len(self.cleaned_text))
+        
+        return self.cleaned_text
+    
+    def extract_and_clean_parallel(self, workers: int = None) -> str:
+        """Extract and clean pages in a process pool, keeping page order and provenance"""
+        print(f"\n[Step 1-2] Extracting and cleaning {self.pdf_path} in parallel...")
+        
+        page_count = count_pdf_pages(self.pdf_path)
+        workers = workers or os.cpu_count() or 1
+        
+        # A few page ranges per worker keeps the pool busy when pages differ in cost
+        range_size = max(1, -(-page_count // (workers * 4)))
+        ranges = [(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)]
         
-        # Remove excessive whitespace
-        text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
-        text = re.sub(r' +', ' ', text)
+        pages = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(extract_page_range, str(self.pdf_path), start, end) for start, end in ranges]
+            for future in futures:
+                pages.extend(future.result())
         
-        # Remove common header/footer patterns
-        text = re.sub(r'THE GAZETTE OF INDIA.*?\n', '', text, flags=re.IGNORECASE)
-        text = re.sub(r'EXTRAORDINARY.*?\n', '', text, flags=re.IGNORECASE)
+        # Record where each page starts in the raw and cleaned text
+        self.pages = []
+        raw_parts = []
+        cleaned_parts = []
+        raw_offset = cleaned_offset = 0
+        for page_num, raw, cleaned in pages:
+            self.pages.append({'page': page_num, 'raw_offset': raw_offset, 'cleaned_offset': cleaned_offset})
+            raw_parts.append(raw)
+            cleaned_parts.append(cleaned)
+            raw_offset += len(raw)
+            cleaned_offset += len(cleaned)
         
-        # Preserve section numbering and structure
-        # Ensure section numbers are properly formatted
-        text = re.sub(r'\n(\d+)\.\s+', r'\n\nSection \1. ', text)
+        self.raw_text = "".join(raw_parts)
+        cleaned = "".join(cleaned_parts)
         
-        # Clean up but preserve chapter markers
-        # Only normalize uppercase CHAPTER markers (actual headers), not lowercase references
-        text = re.sub(r'CHAPTER\s+([IVX]+)', r'\n\nCHAPTER \1', text)
+        # Offsets in the final text shift by the leading whitespace removed by strip()
+        leading = len(cleaned) - len(cleaned.lstrip())
+        for page in self.pages:
+            page['cleaned_offset'] = max(0, page['cleaned_offset'] - leading)
+        self.cleaned_text = cleaned.strip()
         
-        self.cleaned_text = text.strip()
+        print(f"✓ Extracted {page_count} pages using {pdf_library()} with {workers} workers")
+        print(f"✓ Total characters extracted: {len(self.raw_text):,}")
         print(f"✓ Cleaned text: {len(self.cleaned_text):,} characters")
-        print(f"✓ Reduction: {len(self.raw_text) - len(self.cleaned_text):,} characters removed")
+        self.metrics.count('extract', pages=page_count, chars=len(self.raw_text), cleaned_chars=len(self.cleaned_text))
         
         return self.cleaned_text
     
+    def page_at(self, offset: int) -> int:
+        """Page number containing an offset of the cleaned text (parallel extraction only)"""
+        starts = [page['cleaned_offset'] for page in self.pages]
+        index = bisect.bisect_right(starts, offset) - 1
+        return self.pages[max(index, 0)]['page'] if self.pages else None
+    
+    def _chapter_title(self, chapter_text: str, chapter_num: str) -> str:
+        """Parse a chapter title from the text following its CHAPTER marker"""
+        # Extract chapter title (next non-empty lines after CHAPTER marker)
+        # Stop at Section marker or excessive whitespace
+        lines = chapter_text.split('\n')
+        title_parts = []
+        
+        for line in lines:
+            line = line.strip()
+            if not line:
+                # Allow one empty line, but stop at multiple
+                if title_parts:
+                    break
+                continue
+            
+            # Stop if we hit a section marker
+            if re.match(r'Section\s+\d+', line, re.IGNORECASE):
+                break
+            
+            # Stop if we hit another structural marker
+            if re.match(r'CHAPTER\s+[IVXLC]+', line, re.IGNORECASE):
+                break
+            
+            # Skip lines that look like section content (start with numbers or lowercase)
+            if re.match(r'^\d+\.', line) or (line and line[0].islower()):
+                break
+            
+            # Skip lines that are too long (likely section content)
+            if len(line) > 100:
+                break
+            
+            # Add to title
+            title_parts.append(line)
+            
+            # Stop after collecting reasonable title (usually 1-2 lines for chapter titles)
+            if len(title_parts) >= 2:
+                break
+        
+        # Join title parts and clean up
+        chapter_title = ' '.join(title_parts).strip()
+        
+        # Remove common artifacts
+        chapter_title = re.sub(r'\s+', ' ', chapter_title)  # Normalize whitespace
+        chapter_title = re.sub(r'^[:\-\s]+', '', chapter_title)  # Remove leading punctuation
+        chapter_title = re.sub(r'[:\-\s]+$', '', chapter_title)  # Remove trailing punctuation
+        
+        # Fix PDF extraction spacing issues
+        # Pattern: "C ONSUMER" -> "CONSUMER" (remove space between single capital and following capitals)
+        while re.search(r'([A-Z])\s+([A-Z])', chapter_title):
+            chapter_title = re.sub(r'([A-Z])\s+([A-Z])', r'\1\2', chapter_title)
+        
+        # Now we have something like "CONSUMERPROTECTIONCOUNCILS"
+        # We need to split it into words. Use a simple heuristic:
+        # Common legal/administrative words to help split
+        common_words = [
+            'CONSUMER', 'PROTECTION', 'COUNCILS', 'CENTRAL', 'AUTHORITY',
+            'DISPUTES', 'REDRESSAL', 'COMMISSION', 'MEDIATION', 'PRODUCT',
+            'LIABILITY', 'OFFENCES', 'PENALTIES', 'MISCELLANEOUS',
+            'PRELIMINARY', 'AND', 'THE', 'OF'
+        ]
+        
+        # Try to split by known words
+        temp_title = chapter_title
+        for word in sorted(common_words, key=len, reverse=True):  # Longest first
+            # Add space before the word if it's not at the start
+            temp_title = re.sub(f'(?<!^)({word})', r' \1', temp_title)
+        
+        # If we successfully split some words, use it
+        if ' ' in temp_title and temp_title != chapter_title:
+            chapter_title = temp_title
+        
+        # Clean up multiple spaces
+        chapter_title = re.sub(r'\s+', ' ', chapter_title).strip()
+        
+        # Title case for better readability
+        if chapter_title:
+            # Capitalize first letter of each word
+            chapter_title = ' '.join(word.capitalize() for word in chapter_title.split())
+        
+        # Validate title - if it looks corrupted, use generic name
+        # Check for: too short, no letters, starts with punctuation, or contains too much punctuation
+        is_valid = (
+            chapter_title and 
+            len(chapter_title) >= 3 and 
+            any(c.isalpha() for c in chapter_title) and
+            not chapter_title[0] in '.,;:()[]{}' and
+            sum(c in '.,;:()[]{}' for c in chapter_title) < len(chapter_title) / 3
+        )
+        
+        if not is_valid:
+            chapter_title = f"Chapter {chapter_num}"
+        
+        return chapter_title
+    
     def extract_structure(self, text: str) -> List[Dict[str, Any]]:
         """Extract hierarchical structure from legal document"""
         print("\n[Step 3] Extracting document structure...")
         
         sections = []
-        current_chapter = "Preliminary"
         
         # Improved chapter detection with multi-line title support
         # First, find all chapter markers and their positions
         # IMPORTANT: Only match uppercase "CHAPTER" (actual headers), not lowercase "Chapter" (references)
-        chapter_pattern = r'CHAPTER\s+([IVXLC]+)'
-        chapter_matches = list(re.finditer(chapter_pattern, text))
+        chapter_matches = list(CHAPTER_PATTERN.finditer(text))
         
-        # Build a map of chapter positions to full chapter info
-        chapter_map = {}
+        # Chapter start offsets (ascending) and their full names, for bisect lookups
+        chapter_starts = []
+        chapter_names = []
         for i, match in enumerate(chapter_matches):
             chapter_num = match.group(1)
             start_pos = match.end()
@@ -142,141 +488,23 @@ class CPAKnowledgeBaseBuilder:
                 end_pos = len(text)
             
             # Extract text after "CHAPTER X" until next section or chapter
-            chapter_text = text[start_pos:min(start_pos + 500, end_pos)]
-            
-            # Extract chapter title (next non-empty lines after CHAPTER marker)
-            # Stop at Section marker or excessive whitespace
-            lines = chapter_text.split('\n')
-            title_parts = []
-            
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    # Allow one empty line, but stop at multiple
-                    if title_parts:
-                        break
-                    continue
-                
-                # Stop if we hit a section marker
-                if re.match(r'Section\s+\d+', line, re.IGNORECASE):
-                    break
-                
-                # Stop if we hit another structural marker
-                if re.match(r'CHAPTER\s+[IVXLC]+', line, re.IGNORECASE):
-                    break
-                
-                # Skip lines that look like section content (start with numbers or lowercase)
-                if re.match(r'^\d+\.', line) or (line and line[0].islower()):
-                    break
-                
-                # Skip lines that are too long (likely section content)
-                if len(line) > 100:
-                    break
-                
-                # Add to title
-                title_parts.append(line)
-                
-                # Stop after collecting reasonable title (usually 1-2 lines for chapter titles)
-                if len(title_parts) >= 2:
-                    break
-            
-            # Join title parts and clean up
-            chapter_title = ' '.join(title_parts).strip()
-            
-            # Remove common artifacts
-            chapter_title = re.sub(r'\s+', ' ', chapter_title)  # Normalize whitespace
-            chapter_title = re.sub(r'^[:\-\s]+', '', chapter_title)  # Remove leading punctuation
-            chapter_title = re.sub(r'[:\-\s]+$', '', chapter_title)  # Remove trailing punctuation
-            
-            # Fix PDF extraction spacing issues
-            # Pattern: "C ONSUMER" -> "CONSUMER" (remove space between single capital and following capitals)
-            while re.search(r'([A-Z])\s+([A-Z])', chapter_title):
-                chapter_title = re.sub(r'([A-Z])\s+([A-Z])', r'\1\2', chapter_title)
-            
-            # Now we have something like "CONSUMERPROTECTIONCOUNCILS"
-            # We need to split it into words. Use a simple heuristic:
-            # Common legal/administrative words to help split
-            common_words = [
-                'CONSUMER', 'PROTECTION', 'COUNCILS', 'CENTRAL', 'AUTHORITY',
-                'DISPUTES', 'REDRESSAL', 'COMMISSION', 'MEDIATION', 'PRODUCT',
-                'LIABILITY', 'OFFENCES', 'PENALTIES', 'MISCELLANEOUS',
-                'PRELIMINARY', 'AND', 'THE', 'OF'
-            ]
-            
-            # Try to split by known words
-            temp_title = chapter_title
-            for word in sorted(common_words, key=len, reverse=True):  # Longest first
-                # Add space before the word if it's not at the start
-                temp_title = re.sub(f'(?<!^)({word})', r' \1', temp_title)
-            
-            # If we successfully split some words, use it
-            if ' ' in temp_title and temp_title != chapter_title:
-                chapter_title = temp_title
-            
-            # Clean up multiple spaces
-            chapter_title = re.sub(r'\s+', ' ', chapter_title).strip()
+            chapter_title = self._chapter_title(text[start_pos:min(start_pos + 500, end_pos)], chapter_num)
             
-            # Title case for better readability
-            if chapter_title:
-                # Capitalize first letter of each word
-                chapter_title = ' '.join(word.capitalize() for word in chapter_title.split())
-            
-            # Validate title - if it looks corrupted, use generic name
-            # Check for: too short, no letters, starts with punctuation, or contains too much punctuation
-            is_valid = (
-                chapter_title and 
-                len(chapter_title) >= 3 and 
-                any(c.isalpha() for c in chapter_title) and
-                not chapter_title[0] in '.,;:()[]{}' and
-                sum(c in '.,;:()[]{}' for c in chapter_title) < len(chapter_title) / 3
-            )
-            
-            if not is_valid:
-                chapter_title = f"Chapter {chapter_num}"
-            
-            # Store in map
-            chapter_map[match.start()] = {
-                'number': chapter_num,
-                'title': chapter_title,
-                'full_name': f"Chapter {chapter_num}: {chapter_title}"
-            }
+            chapter_starts.append(match.start())
+            chapter_names.append(f"Chapter {chapter_num}: {chapter_title}")
         
-        # Split by sections
-        section_pattern = r'(?=\n\s*Section\s+\d+\.)'
-        parts = re.split(section_pattern, text)
+        # Section boundaries are the offsets where a new "Section N." line starts;
+        # each part runs from one boundary to the next, so no offset is searched for
+        boundaries = [0] + [m.start() for m in SECTION_BOUNDARY_PATTERN.finditer(text) if m.start() > 0]
+        boundaries.append(len(text))
         
-        for part in parts:
-            if not part.strip():
-                continue
-            
-            # Find which chapter this section belongs to
-            # Look for the most recent chapter marker before this section
-            part_start = text.find(part)
-            
-            for chapter_pos in sorted(chapter_map.keys(), reverse=True):
-                if chapter_pos < part_start:
-                    current_chapter = chapter_map[chapter_pos]['full_name']
-                    break
-            
-            # Extract section number and content
-            section_match = re.search(r'Section\s+(\d+)\.\s*(.+?)(?=\n\s*Section\s+\d+\.|$)', part, re.DOTALL)
-            
-            if section_match:
-                section_num = section_match.group(1)
-                section_content = section_match.group(2).strip()
-                
-                # Extract section title (usually first line or bold text)
-                title_match = re.search(r'^(.+?)(?:\.|—|\n)', section_content)
-                section_title = title_match.group(1).strip() if title_match else f"Section {section_num}"
-                
-                sections.append({
-                    'chapter': current_chapter,
-                    'section': f"Section {section_num}",
-                    'title': section_title,
-                    'content': section_content
-                })
+        for part_start, part_end in zip(boundaries, boundaries[1:]):
+            section = self._parse_section(text, part_start, part_end, chapter_starts, chapter_names)
+            if section:
+                sections.append(section)
         
         print(f"✓ Extracted {len(sections)} sections")
+        self.metrics.count('structure', sections=len(sections))
         
         # Print chapter summary for verification
         unique_chapters = sorted(set(s['chapter'] for s in sections))
@@ -286,75 +514,239 @@ class CPAKnowledgeBaseBuilder:
         
         return sections
     
-    def create_chunks(self, sections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Create chunks with metadata following the specified strategy"""
-        print("\n[Step 4] Creating chunks with metadata...")
+    def _parse_section(self, text: str, part_start: int, part_end: int,
+                       chapter_starts: List[int], chapter_names: List[str]) -> Dict[str, Any]:
+        """Build the section record for text[part_start:part_end], or None if it has no section"""
+        # Extract section number and content
+        section_match = SECTION_HEADER_PATTERN.search(text, part_start, part_end)
+        if not section_match or section_match.end() == part_end:
+            return None
         
-        chunks = []
+        # The most recent chapter marker before this part owns the section
+        chapter_index = bisect.bisect_left(chapter_starts, part_start) - 1
+        chapter = chapter_names[chapter_index] if chapter_index >= 0 else "Preliminary"
+        
+        section_num = section_match.group(1)
+        section_content = text[section_match.end():part_end].strip()
+        
+        # Extract section title (usually first line or bold text)
+        title_match = re.search(r'^(.+?)(?:\.|—|\n)', section_content)
+        section_title = title_match.group(1).strip() if title_match else f"Section {section_num}"
+        
+        return {
+            'chapter': chapter,
+            'section': f"Section {section_num}",
+            'title': section_title,
+            'content': section_content
+        }
+    
+    def split_by_characters(self, content: str) -> List[str]:
+        """Piece texts of a section under the character-estimated token scheme"""
+        # Calculate size in approximate tokens
+        content_length = len(content)
+        estimated_tokens = content_length // self.avg_chars_per_token
+        
+        target_chars = self.target_chunk_size * self.avg_chars_per_token
+        overlap_chars = self.chunk_overlap * self.avg_chars_per_token
         
-        for section in sections:
-            content = section['content']
+        # If section fits in one chunk, keep it whole
+        if estimated_tokens <= self.target_chunk_size:
+            return [content]
+        
+        # Split large sections into overlapping chunks
+        pieces = []
+        start = 0
+        
+        while start < content_length:
+            end = start + target_chars
             
-            # Calculate size in approximate tokens
-            content_length = len(content)
-            estimated_tokens = content_length // self.avg_chars_per_token
+            # Try to break at sentence boundary
+            if end < content_length:
+                # Look for sentence end within next 200 chars
+                sentence_end = content.find('. ', end, end + 200)
+                if sentence_end != -1:
+                    end = sentence_end + 1
             
-            target_chars = self.target_chunk_size * self.avg_chars_per_token
-            overlap_chars = self.chunk_overlap * self.avg_chars_per_token
+            pieces.append(content[start:end].strip())
             
-            # If section fits in one chunk, keep it whole
-            if estimated_tokens <= self.target_chunk_size:
-                chunk = {
-                    'text': content,
+            # Move start position with overlap
+            start = end - overlap_chars
+        
+        return pieces
+    
+    def get_token_chunker(self) -> Optional[TokenChunker]:
+        """Tokenizer-based chunker when token chunking is enabled"""
+        if self.token_chunking and self.token_chunker is None:
+            self.token_chunker = TokenChunker.for_model(
+                EMBEDDING_MODEL_NAME, self.embedding_model,
+                max_seq_length=self.max_seq_tokens, overlap_tokens=self.overlap_tokens
+            )
+        return self.token_chunker
+    
+    def chunk_sections(self, sections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Chunks (with metadata) of a batch of sections"""
+        contents = [section['content'] for section in sections]
+        
+        chunker = self.get_token_chunker()
+        if chunker:
+            # One batched tokenizer call per group of sections
+            split = chunker.split_many(contents)
+            char_split = [self.split_by_characters(content) for content in contents]
+            self.record_truncation(chunker.truncation_report(
+                [piece for pieces in char_split for piece in pieces],
+                [piece for pieces in split for piece in pieces]
+            ))
+        else:
+            split = [self.split_by_characters(content) for content in contents]
+        
+        chunks = []
+        for section, pieces in zip(sections, split):
+            for chunk_num, piece in enumerate(pieces, 1):
+                chunks.append({
+                    'text': piece,
                     'metadata': {
-                        'act': 'Consumer Protection Act, 2019',
+                        'act': self.act_name,
                         'chapter': section['chapter'],
-                        'section': section['section'],
+                        # Sections split into several chunks are numbered "(Part N)"
+                        'section': section['section'] if len(pieces) == 1 else f"{section['section']} (Part {chunk_num})",
                         'title': section['title'],
-                        'language': 'English'
-                    }
-                }
-                chunks.append(chunk)
-            
-            else:
-                # Split large sections into overlapping chunks
-                start = 0
-                chunk_num = 1
-                
-                while start < content_length:
-                    end = start + target_chars
-                    
-                    # Try to break at sentence boundary
-                    if end < content_length:
-                        # Look for sentence end within next 200 chars
-                        sentence_end = content.find('. ', end, end + 200)
-                        if sentence_end != -1:
-                            end = sentence_end + 1
-                    
-                    chunk_text = content[start:end].strip()
-                    
-                    chunk = {
-                        'text': chunk_text,
-                        'metadata': {
-                            'act': 'Consumer Protection Act, 2019',
-                            'chapter': section['chapter'],
-                            'section': f"{section['section']} (Part {chunk_num})",
-                            'title': section['title'],
-                            'language': 'English'
-                        }
+                        'language': self.language
                     }
-                    chunks.append(chunk)
-                    
-                    # Move start position with overlap
-                    start = end - overlap_chars
-                    chunk_num += 1
+                })
+        
+        return chunks
+    
+    def section_chunks(self, section: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Chunks (with metadata) of one section"""
+        return self.chunk_sections([section])
+    
+    def record_truncation(self, report: Dict[str, Any]):
+        """Accumulate a truncation report across section batches"""
+        if not self.chunking_report:
+            self.chunking_report = dict(report)
+            return
+        for key in ('chunks', 'char_scheme_chunks', 'char_scheme_truncated', 'char_scheme_tokens_lost'):
+            self.chunking_report[key] += report[key]
+        self.chunking_report['max_chunk_tokens'] = max(self.chunking_report['max_chunk_tokens'], report['max_chunk_tokens'])
+    
+    def create_chunks(self, sections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Create chunks with metadata following the specified strategy"""
+        print("\n[Step 4] Creating chunks with metadata...")
+        
+        chunks = self.chunk_sections(sections)
         
         self.chunks = chunks
+        self.metrics.count('chunk', chunks=len(chunks))
         print(f"✓ Created {len(chunks)} chunks")
         print(f"✓ Average chunk size: {sum(len(c['text']) for c in chunks) // len(chunks):,} characters")
+        self.print_truncation_report()
         
         return chunks
     
+    def print_truncation_report(self):
+        report = self.chunking_report
+        if report:
+            print(f"✓ Token chunking: {report['chunks']} chunks of at most {report['max_chunk_tokens']} tokens "
+                  f"(model limit {report['max_seq_length']}, overlap {report['overlap_tokens']})")
+            print(f"✓ Character scheme would truncate {report['char_scheme_truncated']} of "
+                  f"{report['char_scheme_chunks']} chunks ({report['char_scheme_tokens_lost']:,} tokens never embedded)")
+    
+    def dedup_chunks(self, chunks: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Flag or drop chunks that nearly duplicate an earlier kept chunk, recording provenance"""
+        if self.deduplicator is None:
+            self.deduplicator = MinHashDeduplicator(threshold=self.dedup_threshold)
+        
+        seen, duplicates = self.dedup_seen, len(self.duplicates)
+        position = seen - duplicates if self.dedup == 'collapse' else seen
+        for chunk in chunks:
+            match = self.deduplicator.add(position, chunk['text'])
+            if match is not None:
+                kept, similarity = match
+                self.duplicates.append({
+                    'chunk': self.dedup_seen,
+                    'section': chunk['metadata']['section'],
+                    'chapter': chunk['metadata']['chapter'],
+                    'chars': len(chunk['text']),
+                    'duplicate_of': chunk_id(kept, self.doc_id),
+                    'similarity': round(similarity, 4)
+                })
+            self.dedup_seen += 1
+            
+            if match is not None and self.dedup == 'collapse':
+                continue
+            if match is not None:
+                chunk['metadata']['duplicate_of'] = chunk_id(match[0], self.doc_id)
+            position += 1
+            yield chunk
+        
+        self.metrics.count('dedup', chunks=self.dedup_seen - seen, duplicates=len(self.duplicates) - duplicates)
+    
+    def deduplicate_chunks(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Near-duplicate detection between chunking and embedding"""
+        print(f"\n[Step 4b] Detecting near-duplicate chunks (MinHash LSH, Jaccard >= {self.dedup_threshold})...")
+        
+        kept = list(self.dedup_chunks(chunks))
+        verb = "Collapsed" if self.dedup == 'collapse' else "Flagged"
+        print(f"✓ {verb} {len(self.duplicates)} near-duplicate chunks ({len(kept)} chunks to embed)")
+        
+        return kept
+    
+    def remove_legacy_export(self):
+        """Remove pinecone_ready.json left by older builds (superseded by vectors.ndjson)"""
+        legacy = self.output_dir / "pinecone_ready.json"
+        if legacy.exists():
+            legacy.unlink()
+    
+    def save_duplicates(self):
+        """Write the provenance of every near-duplicate chunk (or remove a stale file)"""
+        path = self.output_dir / DUPLICATES_FILE
+        if not self.dedup:
+            if path.exists():
+                path.unlink()
+            return
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.duplicates, f, indent=2, ensure_ascii=False)
+        print(f"✓ Saved duplicate provenance: {path} ({len(self.duplicates)} chunks)")
+    
+    def get_encoder(self) -> BatchEncoder:
+        """Batched encoder around the embedding model, created on first use"""
+        if self.encoder is None:
+            self.encoder = BatchEncoder(self.embedding_model, EMBEDDING_MODEL_NAME, batch_size=self.encode_batch_size,
+                                        sort_by_length=self.sort_by_length, torch_threads=self.torch_threads,
+                                        workers=self.encode_workers, backend=self.encoder_backend,
+                                        model_path=self.encoder_path)
+        return self.encoder
+    
+    def embed_texts(self, texts: List[str], verbose: bool = True) -> Tuple[list, int]:
+        """Vectors for texts, reusing previous-build vectors and the embedding cache; returns (vectors, newly encoded)"""
+        hashes = [content_hash(text) for text in texts]
+        
+        # Reuse vectors of chunks whose text is unchanged since the last build
+        rows = [self.previous_rows.get(h) for h in hashes]
+        embeddings = [None if row is None else np.array(self.previous_embeddings[row], dtype=np.float32) for row in rows]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        
+        if verbose and len(missing) < len(texts):
+            print(f"✓ Reusing {len(texts) - len(missing)} embeddings from previous build")
+        
+        if missing:
+            if verbose:
+                print(f"Generating embeddings for {len(missing)} chunks...")
+            missing_texts = [texts[i] for i in missing]
+            encoder = self.get_encoder()
+            if self.embedding_cache:
+                new_embeddings = self.embedding_cache.encode(missing_texts, encoder, show_progress_bar=verbose)
+                if verbose:
+                    cache_stats = self.embedding_cache.stats()
+                    print(f"✓ Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+            else:
+                new_embeddings = encoder.encode(missing_texts, show_progress_bar=verbose)
+            for i, embedding in zip(missing, new_embeddings):
+                embeddings[i] = embedding
+        
+        self.metrics.count('embed', chunks=len(texts), encoded=len(missing))
+        return embeddings, len(missing)
+    
     def generate_embeddings(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Generate embeddings for each chunk"""
         print("\n[Step 5] Generating embeddings...")
@@ -364,19 +756,102 @@ class CPAKnowledgeBaseBuilder:
             return chunks
         
         texts = [chunk['text'] for chunk in chunks]
-        
-        print(f"Generating embeddings for {len(texts)} chunks...")
-        embeddings = self.embedding_model.encode(texts, show_progress_bar=True)
+        embeddings, missing = self.embed_texts(texts)
         
         # Add embeddings to chunks
         for i, chunk in enumerate(chunks):
             chunk['embedding'] = embeddings[i].tolist()
         
-        print(f"✓ Generated {len(embeddings)} embeddings")
+        print(f"✓ Generated {missing} new embeddings ({len(embeddings)} total)")
         print(f"✓ Embedding dimension: {len(embeddings[0])}")
         
         return chunks
     
+    def metadata_entry(self, chunk: Dict[str, Any]) -> Dict[str, Any]:
+        """metadata_index.json entry of a chunk"""
+        return {'metadata': chunk['metadata'], 'text_preview': chunk['text'][:200] + '...'}
+    
+    def vector_entry(self, index: int, chunk: Dict[str, Any]) -> Dict[str, Any]:
+        """vectors.ndjson record (Pinecone upsert format) of the chunk at a position"""
+        return {
+            'id': chunk_id(index, self.doc_id),
+            'values': chunk['embedding'],
+            'metadata': {
+                **chunk['metadata'],
+                'text': chunk['text']
+            }
+        }
+    
+    def summary_stats(self, total_chunks: int, sections: set, chapters: set, total_chars: int,
+                      has_embeddings: bool, dimension: int) -> Dict[str, Any]:
+        """stats.json contents"""
+        stats = {
+            'total_chunks': total_chunks,
+            'total_sections': len(sections),
+            'total_chapters': len(chapters),
+            'avg_chunk_size_chars': total_chars // total_chunks if total_chunks else 0,
+            'has_embeddings': has_embeddings,
+            'embedding_dimension': dimension
+        }
+        if self.chunking_report:
+            stats['token_chunking'] = self.chunking_report
+        if self.deduplicator is not None:
+            row_bytes = dimension * (2 if self.embedding_dtype == "float16" else 4)
+            stats['dedup'] = dedup_summary(self.dedup, self.deduplicator, self.dedup_seen, self.duplicates, row_bytes)
+        return stats
+    
+    def save_stats(self, stats: Dict[str, Any], verbose: bool = True):
+        stats_path = self.output_dir / "stats.json"
+        with open(stats_path, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, indent=2)
+        if verbose:
+            print(f"✓ Saved statistics: {stats_path}")
+    
+    def record_stage_metrics(self, stats: Dict[str, Any]):
+        """Add per-stage metrics to stats.json, then write the optional trace and profiles"""
+        stats['stages'] = self.metrics.summary()
+        self.save_stats(stats, verbose=False)
+        
+        print("\n[Build stages]")
+        print_stage_table(stats['stages'])
+        if self.trace_path:
+            print(f"✓ Saved build trace: {self.metrics.save_trace(self.trace_path)}")
+        for path in self.metrics.save_profiles():
+            print(f"✓ Saved profile: {path}")
+        self.metrics.close()
+    
+    def build_indexes(self, stored: int, texts: Iterable[str]):
+        """Build the BM25, ANN and quantized indexes over the stored rows"""
+        # Indexes that are disabled (or have no rows) must not outlive an earlier build
+        if not (stored and self.build_ann):
+            remove_ann_index(self.output_dir)
+        if not (stored and self.quantization):
+            remove_quantized_store(self.output_dir)
+        if not (stored and self.build_lexical):
+            remove_lexical_index(self.output_dir)
+        
+        # BM25 postings cover the same rows as the embedding store
+        if stored and self.build_lexical:
+            lexical = LexicalIndex.build(texts)
+            lexical.save(self.output_dir)
+            print(f"✓ Saved BM25 lexical index: {self.output_dir / LEXICAL_INDEX_FILE} "
+                  f"({len(lexical.vocabulary):,} terms, {len(lexical.doc_ids):,} postings)")
+        
+        # Derived indexes are built from the stored (normalized, memory-mapped) vectors;
+        # the sidecar records are not needed for them
+        if stored and (self.build_ann or self.quantization):
+            embeddings = load_embedding_matrix(self.output_dir)
+            
+            if self.build_ann:
+                report = build_ann_index(embeddings, self.output_dir, n_lists=self.ann_lists)
+                print(f"✓ Saved IVF index: {self.output_dir / ANN_INDEX_FILE}")
+                print_recall_report(report)
+            
+            if self.quantization:
+                code_bytes = save_quantized_store(embeddings, self.output_dir, self.quantization, pq_subspaces=self.pq_subspaces)
+                print(f"✓ Saved {self.quantization} codes: {self.output_dir / CODES_FILE} "
+                      f"({code_bytes:,} bytes vs {embeddings.nbytes:,} bytes float)")
+    
     def save_knowledge_base(self, chunks: List[Dict[str, Any]]):
         """Save knowledge base in structured format"""
         print("\n[Step 6] Saving knowledge base...")
@@ -387,72 +862,349 @@ class CPAKnowledgeBaseBuilder:
             json.dump(chunks, f, indent=2, ensure_ascii=False)
         print(f"✓ Saved full knowledge base: {kb_path}")
         
+        # Save binary embedding store (memory-mapped by the query side)
+        stored = save_embedding_store(chunks, self.output_dir, dtype=self.embedding_dtype, doc_id=self.doc_id)
+        if stored:
+            print(f"✓ Saved binary embedding store: {self.output_dir / EMBEDDINGS_FILE} ({stored} x {self.embedding_dtype})")
+        
+        self.build_indexes(stored, [c['text'] for c in chunks if 'embedding' in c])
+        
         # Save metadata only (for quick inspection)
-        metadata_only = [{'metadata': c['metadata'], 'text_preview': c['text'][:200] + '...'} for c in chunks]
         metadata_path = self.output_dir / "metadata_index.json"
         with open(metadata_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata_only, f, indent=2, ensure_ascii=False)
+            json.dump([self.metadata_entry(c) for c in chunks], f, indent=2, ensure_ascii=False)
         print(f"✓ Saved metadata index: {metadata_path}")
+        self.metrics.count('save', rows=stored)
         
-        # Save Pinecone-ready format
-        pinecone_format = []
-        for i, chunk in enumerate(chunks):
-            entry = {
-                'id': f"cpa2019_chunk_{i}",
-                'values': chunk.get('embedding', []),
-                'metadata': {
-                    **chunk['metadata'],
-                    'text': chunk['text']
-                }
-            }
-            pinecone_format.append(entry)
+        # Save the vector export, one record per line, for bulk upserts (vector_export.py)
+        export_writer = NdjsonWriter(self.output_dir / EXPORT_FILE)
+        try:
+            for i, chunk in enumerate(chunks):
+                if 'embedding' in chunk:
+                    export_writer.write(self.vector_entry(i, chunk))
+        finally:
+            export_writer.close()
+        self.remove_legacy_export()
+        print(f"✓ Saved vector export: {self.output_dir / EXPORT_FILE} ({export_writer.count} records)")
         
-        pinecone_path = self.output_dir / "pinecone_ready.json"
-        with open(pinecone_path, 'w', encoding='utf-8') as f:
-            json.dump(pinecone_format, f, indent=2, ensure_ascii=False)
-        print(f"✓ Saved Pinecone-ready format: {pinecone_path}")
+        self.save_duplicates()
         
         # Save summary statistics
-        stats = {
-            'total_chunks': len(chunks),
-            'total_sections': len(set(c['metadata']['section'] for c in chunks)),
-            'total_chapters': len(set(c['metadata']['chapter'] for c in chunks)),
-            'avg_chunk_size_chars': sum(len(c['text']) for c in chunks) // len(chunks),
-            'has_embeddings': 'embedding' in chunks[0] if chunks else False,
-            'embedding_dimension': len(chunks[0]['embedding']) if chunks and 'embedding' in chunks[0] else 0
-        }
+        stats = self.summary_stats(
+            len(chunks),
+            set(c['metadata']['section'] for c in chunks),
+            set(c['metadata']['chapter'] for c in chunks),
+            sum(len(c['text']) for c in chunks),
+            'embedding' in chunks[0] if chunks else False,
+            len(chunks[0]['embedding']) if chunks and 'embedding' in chunks[0] else 0
+        )
+        self.save_stats(stats)
         
-        stats_path = self.output_dir / "stats.json"
-        with open(stats_path, 'w', encoding='utf-8') as f:
-            json.dump(stats, f, indent=2)
-        print(f"✓ Saved statistics: {stats_path}")
+        return stats
+    
+    # Streaming pipeline: pages -> sections -> chunks -> embedding batches -> output files
+    
+    def iter_cleaned_pages(self) -> Iterator[str]:
+        """Yield cleaned page texts that concatenate to the cleaned document"""
+        leading = True
+        for _, page_text in self.metrics.iterate('extract', iter_pdf_pages(self.pdf_path)):
+            self.metrics.count('extract', pages=1, chars=len(page_text))
+            with self.metrics.stage('clean'):
+                cleaned = clean_page(page_text)
+            self.metrics.count('clean', chars=len(cleaned))
+            # The whole-document build strips leading whitespace from the cleaned text
+            if leading:
+                cleaned = cleaned.lstrip()
+                if not cleaned:
+                    continue
+                leading = False
+            yield cleaned
+    
+    def iter_sections(self, pages: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """Yield the sections extract_structure would find, holding only the current section's text"""
+        chapter_starts = []  # absolute offsets in the cleaned document
+        chapter_names = []
+        buffer = ""
+        buffer_start = 0  # absolute offset of buffer[0], always a section boundary
+        
+        def parts(text: str, final: bool) -> Iterator[Tuple[int, int]]:
+            boundaries = [0] + [m.start() for m in SECTION_BOUNDARY_PATTERN.finditer(text) if m.start() > 0]
+            if final:
+                boundaries.append(len(text))
+            return zip(boundaries, boundaries[1:])
+        
+        def parse(text: str, part_start: int, part_end: int):
+            # Chapters are located relative to the buffer; their markers inside this part
+            # only own later sections, so they are registered after it is parsed
+            section = self._parse_section(text, part_start, part_end,
+                                          [start - buffer_start for start in chapter_starts], chapter_names)
+            for match in CHAPTER_PATTERN.finditer(text, part_start, part_end):
+                next_chapter = CHAPTER_PATTERN.search(text, match.end())
+                end_pos = next_chapter.start() if next_chapter else len(text)
+                title = self._chapter_title(text[match.end():min(match.end() + 500, end_pos)], match.group(1))
+                chapter_starts.append(buffer_start + match.start())
+                chapter_names.append(f"Chapter {match.group(1)}: {title}")
+            return section
+        
+        for page in pages:
+            buffer += page
+            consumed = 0
+            # A boundary found in the buffer cannot move as more text arrives
+            for part_start, part_end in parts(buffer, final=False):
+                section = parse(buffer, part_start, part_end)
+                if section:
+                    yield section
+                consumed = part_end
+            buffer = buffer[consumed:]
+            buffer_start += consumed
+        
+        for part_start, part_end in parts(buffer, final=True):
+            section = parse(buffer, part_start, part_end)
+            if section:
+                yield section
+    
+    def iter_embedded_batches(self, chunks: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """Group chunks into batches and embed each; yields (index of first chunk, batch)"""
+        batch = []
+        start = 0
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) == batch_size:
+                yield start, self.embed_batch(batch)
+                start += len(batch)
+                batch = []
+        if batch:
+            yield start, self.embed_batch(batch)
+    
+    def embed_batch(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self.embedding_model:
+            with self.metrics.stage('embed'):
+                embeddings, _ = self.embed_texts([chunk['text'] for chunk in batch], verbose=False)
+                for chunk, embedding in zip(batch, embeddings):
+                    chunk['embedding'] = embedding.tolist()
+        return batch
+    
+    def build_streaming(self, previous: Dict[str, Any], source: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+        """Steps 1-6 as a pipeline of generators, appending each embedded batch to the outputs"""
+        print(f"\n[Step 1-6] Streaming {self.pdf_path} in batches of {self.stream_batch_size} chunks...")
+        
+        # Manifest entries are spooled to disk rather than collected in lists
+        manifest_writer = ManifestWriter(source, config)
+        known_sections = {entry['hash'] for entry in previous.get('sections', [])} if previous else set()
+        changed = 0
+        
+        def sections_with_entries():
+            nonlocal changed
+            for section in self.metrics.iterate('structure', self.iter_sections(self.iter_cleaned_pages())):
+                entry = section_entry(section)
+                manifest_writer.add_section(entry)
+                changed += entry['hash'] not in known_sections
+                self.metrics.count('structure', sections=1)
+                yield section
+        
+        def chunks_of(sections):
+            for section in sections:
+                with self.metrics.stage('chunk'):
+                    chunks = self.section_chunks(section)
+                self.metrics.count('chunk', chunks=len(chunks))
+                yield from chunks
+        
+        chunk_stream = chunks_of(sections_with_entries())
+        if self.dedup:
+            chunk_stream = self.metrics.iterate('dedup', self.dedup_chunks(chunk_stream))
+        
+        kb_writer = JsonArrayWriter(self.output_dir / "knowledge_base.json")
+        metadata_writer = JsonArrayWriter(self.output_dir / "metadata_index.json")
+        export_writer = NdjsonWriter(self.output_dir / EXPORT_FILE)
+        store_writer = EmbeddingStoreWriter(self.output_dir, dtype=self.embedding_dtype, doc_id=self.doc_id) if self.embedding_model else None
+        
+        section_names, chapter_names = set(), set()
+        total_chars = 0
+        row = 0
+        try:
+            for start, batch in self.iter_embedded_batches(chunk_stream, self.stream_batch_size):
+                for i, chunk in enumerate(batch, start):
+                    kb_writer.write(chunk)
+                    metadata_writer.write(self.metadata_entry(chunk))
+                    has_embedding = 'embedding' in chunk
+                    if has_embedding:
+                        export_writer.write(self.vector_entry(i, chunk))
+                    manifest_writer.add_chunk(chunk_entry(i, chunk, row if has_embedding else None))
+                    row += has_embedding
+                    section_names.add(chunk['metadata']['section'])
+                    chapter_names.add(chunk['metadata']['chapter'])
+                    total_chars += len(chunk['text'])
+                if store_writer:
+                    store_writer.append(batch, start)
+        finally:
+            for writer in (kb_writer, metadata_writer, export_writer):
+                writer.close()
+            stored = store_writer.close() if store_writer else 0
+        if not stored:
+            remove_embedding_store(self.output_dir)
+        self.metrics.count('save', rows=stored)
+        
+        total_sections, total_chunks = manifest_writer.counts['sections'], manifest_writer.counts['chunks']
+        print(f"✓ Extracted {total_sections} sections")
+        if previous:
+            print(f"✓ {changed} of {total_sections} sections changed since last build")
+        print(f"✓ Created {total_chunks} chunks")
+        self.print_truncation_report()
+        if self.dedup:
+            verb = "Collapsed" if self.dedup == 'collapse' else "Flagged"
+            print(f"✓ {verb} {len(self.duplicates)} near-duplicate chunks")
+        print(f"✓ Saved full knowledge base: {self.output_dir / 'knowledge_base.json'}")
+        print(f"✓ Saved vector export: {self.output_dir / EXPORT_FILE} ({export_writer.count} records)")
+        if stored:
+            print(f"✓ Saved binary embedding store: {self.output_dir / EMBEDDINGS_FILE} ({stored} x {self.embedding_dtype})")
+        
+        self.build_indexes(stored, (record['text'] for record in iter_store_records(self.output_dir)) if stored else [])
+        self.remove_legacy_export()
+        self.save_duplicates()
         
+        stats = self.summary_stats(total_chunks, section_names, chapter_names, total_chars,
+                                   bool(stored), store_writer.dimension if stored else 0)
+        self.save_stats(stats)
+        
+        manifest_path = manifest_writer.save(self.output_dir)
+        print(f"✓ Saved build manifest: {manifest_path}")
         return stats
     
-    def build(self):
+    def build_config(self) -> Dict[str, Any]:
+        """Settings that affect the build output"""
+        return {
+            'act_name': self.act_name,
+            'doc_id': self.doc_id,
+            'language': self.language,
+            'embedding_model': self.encoder_id if self.embedding_model else None,
+            'embedding_dtype': self.embedding_dtype,
+            'build_ann': self.build_ann,
+            'ann_lists': self.ann_lists,
+            'quantization': self.quantization,
+            'pq_subspaces': self.pq_subspaces,
+            'build_lexical': self.build_lexical,
+            'target_chunk_size': self.target_chunk_size,
+            'chunk_overlap': self.chunk_overlap,
+            'avg_chars_per_token': self.avg_chars_per_token,
+            'token_chunking': self.token_chunking,
+            'max_seq_tokens': self.max_seq_tokens,
+            'overlap_tokens': self.overlap_tokens,
+            'dedup': self.dedup,
+            'dedup_threshold': self.dedup_threshold if self.dedup else None
+        }
+    
+    def is_up_to_date(self, previous: Dict[str, Any], source: Dict[str, Any], config: Dict[str, Any]) -> bool:
+        """Check whether a previous build used the same source and settings"""
+        if not previous:
+            return False
+        outputs = ["knowledge_base.json", "stats.json", MANIFEST_FILE]
+        return (
+            previous.get('source', {}).get('sha256') == source['sha256'] and
+            previous.get('config') == config and
+            all((self.output_dir / name).exists() for name in outputs)
+        )
+    
+    def load_previous_vectors(self, previous: Dict[str, Any], config: Dict[str, Any]):
+        """Map reusable chunks to rows of the previous build's (memory-mapped) embedding store"""
+        self.previous_rows = {}
+        self.previous_embeddings = None
+        if not previous or previous.get('config', {}).get('embedding_model') != config['embedding_model']:
+            return
+        if not has_embedding_store(self.output_dir):
+            return
+        
+        # The new store is written to a fresh file, so this mapping stays valid
+        # until the build has read every row it reuses
+        embeddings = load_embedding_matrix(self.output_dir)
+        self.previous_rows = cached_rows(previous, len(embeddings))
+        self.previous_embeddings = embeddings
+    
+    def release_previous_vectors(self):
+        """Drop the previous build's mapping once the new store is written"""
+        self.previous_rows = {}
+        self.previous_embeddings = None
+    
+    def close(self):
+        """Release the encoder worker pool, if one was started"""
+        if self.encoder is not None:
+            self.encoder.close()
+    
+    def build(self, force: bool = False):
         """Execute full knowledge base building pipeline"""
         print("=" * 70)
         print("NyayaSetu AI - RAG Knowledge Base Foundation Setup")
-        print("Processing: Consumer Protection Act, 2019")
+        print(f"Processing: {self.act_name}")
         print("=" * 70)
         
-        # Step 1: Extract
-        raw_text = self.extract_text_from_pdf()
+        # Compare against the previous build unless a full rebuild is forced
+        previous = None if force else load_manifest(self.output_dir)
+        source = {'path': str(self.pdf_path), 'sha256': file_hash(self.pdf_path)}
+        config = self.build_config()
         
-        # Step 2: Clean
-        cleaned_text = self.clean_text(raw_text)
+        if self.is_up_to_date(previous, source, config):
+            print(f"\n✓ Source and settings unchanged since last build: {self.output_dir}/")
+            with open(self.output_dir / "stats.json", 'r', encoding='utf-8') as f:
+                return json.load(f)
+        
+        self.metrics = BuildMetrics(trace_memory=self.trace_memory, profile_dir=self.profile_dir,
+                                    trace=bool(self.trace_path))
+        self.load_previous_vectors(previous, config)
+        self.chunking_report = None
+        self.deduplicator = None
+        self.duplicates = []
+        self.dedup_seen = 0
+        
+        if self.streaming:
+            # Stages pulled through the streaming generators are charged separately,
+            # so what remains (writing rows, indexes and the manifest) is the save stage
+            with self.metrics.stage('save'):
+                stats = self.build_streaming(previous, source, config)
+            self.release_previous_vectors()
+            self.record_stage_metrics(stats)
+            print(f"\n✓ Knowledge base saved to: {self.output_dir}/")
+            return stats
+        
+        if self.parallel_workers:
+            # Steps 1-2: Extract and clean page ranges in worker processes (cleaning
+            # happens inside the same workers, so both are charged to extract)
+            with self.metrics.stage('extract'):
+                cleaned_text = self.extract_and_clean_parallel(self.parallel_workers)
+        
+        else:
+            # Step 1: Extract
+            with self.metrics.stage('extract'):
+                raw_text = self.extract_text_from_pdf()
+            
+            # Step 2: Clean
+            with self.metrics.stage('clean'):
+                cleaned_text = self.clean_text(raw_text)
         
         # Step 3: Structure
-        sections = self.extract_structure(cleaned_text)
+        with self.metrics.stage('structure'):
+            sections = self.extract_structure(cleaned_text)
+        if previous:
+            print(f"✓ {changed_sections(previous, sections)} of {len(sections)} sections changed since last build")
         
         # Step 4: Chunk
-        chunks = self.create_chunks(sections)
+        with self.metrics.stage('chunk'):
+            chunks = self.create_chunks(sections)
+        
+        # Step 4b: Near-duplicate detection (optional)
+        if self.dedup:
+            with self.metrics.stage('dedup'):
+                chunks = self.deduplicate_chunks(chunks)
         
         # Step 5: Embed
-        chunks_with_embeddings = self.generate_embeddings(chunks)
+        with self.metrics.stage('embed'):
+            chunks_with_embeddings = self.generate_embeddings(chunks)
         
         # Step 6: Save
-        stats = self.save_knowledge_base(chunks_with_embeddings)
+        with self.metrics.stage('save'):
+            stats = self.save_knowledge_base(chunks_with_embeddings)
+            manifest_path = save_manifest(build_manifest(source, config, sections, chunks_with_embeddings), self.output_dir)
+        self.release_previous_vectors()
+        print(f"✓ Saved build manifest: {manifest_path}")
+        self.record_stage_metrics(stats)
         
         # Print summary
         print("\n" + "=" * 70)
@@ -482,22 +1234,100 @@ class CPAKnowledgeBaseBuilder:
         return stats
 
 
-def main():
-    """Main execution"""
+def add_build_arguments(parser):
+    """Build options, shared by this script and the `build` subcommand of cli.py"""
     # Get the project root directory (two levels up from this script)
-    script_dir = Path(__file__).parent
-    project_root = script_dir.parent.parent
-    
-    pdf_path = project_root / "data" / "raw" / "CPA2019.pdf"
-    output_dir = project_root / "knowledge_base"
+    project_root = Path(__file__).parent.parent.parent
     
+    parser.add_argument("--pdf", default=str(project_root / "data" / "raw" / "CPA2019.pdf"), help="Source PDF")
+    parser.add_argument("--output-dir", default=str(project_root / "knowledge_base"), help="Knowledge base directory")
+    parser.add_argument("--act", default=DEFAULT_ACT_NAME, help="Act name recorded in chunk metadata")
+    parser.add_argument("--doc-id", default=DEFAULT_DOC_ID, help="Chunk id prefix")
+    parser.add_argument("--no-model", action="store_true", help="Skip loading the embedding model (chunks only, no embeddings)")
+    parser.add_argument("--force", action="store_true", help="Rebuild everything, ignoring the previous build")
+    parser.add_argument("--ann", action="store_true", help="Also build an IVF approximate-nearest-neighbour index")
+    parser.add_argument("--ann-lists", type=int, default=None, help="Number of IVF lists (default: sqrt of chunk count)")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"], help="Precision of the binary embedding store")
+    parser.add_argument("--quantize", default=None, choices=QUANTIZATION_KINDS, help="Also store int8 or product-quantized codes")
+    parser.add_argument("--workers", type=int, default=0, help="Extract and clean PDF pages in this many processes (0 = serial)")
+    parser.add_argument("--no-lexical", action="store_true", help="Skip the BM25 lexical index")
+    parser.add_argument("--token-chunks", action="store_true", help="Size chunks with the embedding model's tokenizer")
+    parser.add_argument("--max-seq-tokens", type=int, default=None, help="Token budget per chunk (default: the model's limit)")
+    parser.add_argument("--overlap-tokens", type=int, default=32, help="Token overlap between chunks of a section")
+    parser.add_argument("--encode-batch-size", type=int, default=32, help="Texts per forward pass")
+    parser.add_argument("--no-length-sort", action="store_true", help="Encode in chunk order instead of sorting by token length")
+    parser.add_argument("--torch-threads", type=int, default=None, help="Torch intra-op threads (per encoder process)")
+    parser.add_argument("--encode-workers", type=int, default=0, help="Encode in this many processes (0 = in-process)")
+    add_encoder_arguments(parser)
+    parser.add_argument("--stream", action="store_true", help="Stream pages, sections, chunks and embedding batches to disk")
+    parser.add_argument("--batch-size", type=int, default=256, help="Chunks per embedding batch in streaming mode")
+    parser.add_argument("--pq-subspaces", type=int, default=48, help="Product quantization subspaces (must divide the dimension)")
+    parser.add_argument("--dedup", default=None, choices=DEDUP_MODES, help="Flag or collapse near-duplicate chunks before embedding")
+    parser.add_argument("--dedup-threshold", type=float, default=0.95, help="Shingle Jaccard similarity that counts as a near-duplicate")
+    parser.add_argument("--trace", default=None, help="Write a per-stage Chrome trace (JSON) to this file")
+    parser.add_argument("--trace-memory", action="store_true", help="Record per-stage peak Python allocations with tracemalloc")
+    parser.add_argument("--profile-dir", default=None, help="Write a cProfile dump per stage to this directory")
+
+
+def check_build_arguments(parser, args):
+    """Reject option combinations the build would otherwise silently ignore"""
+    if args.stream and args.workers:
+        parser.error("--workers does not apply to --stream builds, which read and clean pages one at a time")
+
+
+def run_build(args):
+    """Build a knowledge base from parsed build options"""
+    pdf_path = Path(args.pdf)
     if not pdf_path.exists():
         print(f"ERROR: {pdf_path} not found")
         print(f"Expected location: data/raw/CPA2019.pdf")
-        return
+        return None
+    
+    try:
+        pdf_library()
+    except ImportError as e:
+        print(f"ERROR: {e}")
+        return None
+    
+    builder = CPAKnowledgeBaseBuilder(str(pdf_path), args.output_dir, act_name=args.act, doc_id=args.doc_id,
+                                      load_model=not args.no_model, encoder_backend=args.encoder,
+                                      encoder_path=args.encoder_path)
+    builder.build_ann = args.ann
+    builder.ann_lists = args.ann_lists
+    builder.embedding_dtype = args.dtype
+    builder.quantization = args.quantize
+    builder.pq_subspaces = args.pq_subspaces
+    builder.build_lexical = not args.no_lexical
+    builder.parallel_workers = args.workers
+    builder.token_chunking = args.token_chunks
+    builder.max_seq_tokens = args.max_seq_tokens
+    builder.overlap_tokens = args.overlap_tokens
+    builder.encode_batch_size = args.encode_batch_size
+    builder.sort_by_length = not args.no_length_sort
+    builder.torch_threads = args.torch_threads
+    builder.encode_workers = args.encode_workers
+    builder.streaming = args.stream
+    builder.stream_batch_size = args.batch_size
+    builder.dedup = args.dedup
+    builder.dedup_threshold = args.dedup_threshold
+    builder.trace_path = args.trace
+    builder.trace_memory = args.trace_memory
+    builder.profile_dir = args.profile_dir
+    try:
+        return builder.build(force=args.force)
+    finally:
+        builder.close()
+
+
+def main():
+    """Main execution"""
+    import argparse
     
-    builder = CPAKnowledgeBaseBuilder(str(pdf_path), str(output_dir))
-    builder.build()
+    parser = argparse.ArgumentParser(description="Build the NyayaSetu AI knowledge base")
+    add_build_arguments(parser)
+    args = parser.parse_args()
+    check_build_arguments(parser, args)
+    run_build(args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+NyayaSetu AI - Retrieval service
+Long-lived asyncio HTTP service that keeps the model and index resident,
+coalesces concurrent queries into micro-batches (one encode call per batch)
+and runs the CPU work in an executor so the event loop stays responsive
+"""
+
+import asyncio
+import json
+import math
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+
+# Package-relative when imported as src.rag, sibling modules when run as a script
+if __package__:
+    from .encoders import add_encoder_arguments
+    from .test_rag_query import (
+        load_index, load_embedding_cache, load_model, search_many, search_scope, default_kb_dir, SEARCH_MODES
+    )
+    from .query_cache import QueryResultCache
+    from .kb_store import kb_fingerprint
+else:
+    from encoders import add_encoder_arguments
+    from test_rag_query import (
+        load_index, load_embedding_cache, load_model, search_many, search_scope, default_kb_dir, SEARCH_MODES
+    )
+    from query_cache import QueryResultCache
+    from kb_store import kb_fingerprint
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+def positive_int(value, name: str) -> int:
+    """A request parameter as a positive integer (query-string values arrive as text)"""
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError(f"'{name}' must be a positive integer")
+    return value
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of a list of values (0 if empty)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+class MicroBatcher:
+    """Collects queries arriving within a short window and searches them together"""
+
+    def __init__(self, search_batch, executor, window_ms: float = 3.0, max_batch: int = 32):
+        self.search_batch = search_batch
+        self.executor = executor
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.queue: Optional[asyncio.Queue] = None
+        self._task = None
+        self.batch_sizes = deque(maxlen=1000)
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, query: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a query and wait for its results and timing"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((query, options, time.perf_counter(), future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Queries with the same options share one search call (and one encode);
+            # an item whose options cannot be grouped fails alone
+            groups: Dict[Any, list] = {}
+            for item in batch:
+                options = item[1]
+                try:
+                    key = search_scope(top_k=options['top_k'], mode=options['mode'], nprobe=options['nprobe'],
+                                       filters=options['filters'])
+                    hash(key)
+                except Exception as e:
+                    if not item[3].done():
+                        item[3].set_exception(e)
+                    continue
+                groups.setdefault(key, []).append(item)
+
+            self.batch_sizes.append(len(batch))
+            for items in groups.values():
+                loop.create_task(self._search(items, len(batch)))
+
+    async def _search(self, items: list, batch_size: int):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            all_results = await loop.run_in_executor(
+                self.executor, self.search_batch, [query for query, _, _, _ in items], items[0][1]
+            )
+        except Exception as e:
+            for _, _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        finished = time.perf_counter()
+        for (query, _, queued, future), results in zip(items, all_results):
+            if not future.done():
+                future.set_result({
+                    'results': results,
+                    'timing': {
+                        'queue_ms': (started - queued) * 1000,
+                        'search_ms': (finished - started) * 1000,
+                        'batch_size': batch_size
+                    }
+                })
+
+
+class RetrievalService:
+    """Resident model, index and caches behind a micro-batching HTTP endpoint"""
+
+    def __init__(self, kb_dir=None, use_model: bool = True, nprobe: Optional[int] = None,
+                 window_ms: float = 3.0, max_batch: int = 32, workers: int = 1, default_top_k: int = 3,
+                 encoder: str = 'torch', encoder_path: Optional[str] = None, quantized: bool = False):
+        self.kb_dir = Path(kb_dir) if kb_dir is not None else default_kb_dir()
+        self.nprobe = nprobe
+        self.quantized = quantized
+        self.default_top_k = default_top_k
+
+        print(f"Loading knowledge base from {self.kb_dir}...")
+        self.fingerprint = kb_fingerprint(self.kb_dir)
+        self.index = load_index(self.kb_dir, nprobe=nprobe, quantized=quantized)
+        self.reloads = 0
+        self._reload_lock = threading.Lock()
+        self.cache = load_embedding_cache(self.kb_dir, backend=encoder, model_path=encoder_path)
+        self.result_cache = QueryResultCache(kb_dir=self.kb_dir)
+        self.model = load_model(backend=encoder, model_path=encoder_path) if use_model else None
+        print(f"✓ Ready: {len(self.index)} chunks, model {'loaded' if self.model else 'disabled'}")
+
+        # One worker keeps model calls serialized; numpy and torch release the GIL meanwhile
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="retrieval")
+        self.batcher = MicroBatcher(self.search_batch, self.executor, window_ms=window_ms, max_batch=max_batch)
+        self.latencies = deque(maxlen=10000)
+        self.requests = 0
+        self.errors = 0
+
+    def current_index(self):
+        """The resident index, reloaded first if the knowledge base was rebuilt since it was loaded"""
+        fingerprint = kb_fingerprint(self.kb_dir)
+        if fingerprint == self.fingerprint:
+            return self.index
+
+        with self._reload_lock:
+            if fingerprint != self.fingerprint:
+                try:
+                    index = load_index(self.kb_dir, nprobe=self.nprobe, quantized=self.quantized)
+                except Exception as e:
+                    # A build still writing its outputs; keep serving the old index and retry later
+                    print(f"⚠ Knowledge base changed but could not be reloaded yet: {e}")
+                    return self.index
+                self.index, self.fingerprint = index, fingerprint
+                self.reloads += 1
+                print(f"✓ Reloaded knowledge base: {len(index)} chunks")
+        return self.index
+
+    def search_batch(self, queries: List[str], options: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+        """Executor job: one search_many call for a group of queries"""
+        return search_many(queries, self.current_index(), self.model, top_k=options['top_k'], cache=self.cache,
+                           result_cache=self.result_cache, nprobe=options['nprobe'],
+                           filters=options['filters'], mode=options['mode'])
+
+    def parse_request(self, params: Dict[str, Any]) -> tuple:
+        """Validate a search request; returns (query, options)"""
+        query = params.get('query') or params.get('q')
+        if not isinstance(query, str) or not query.strip():
+            raise ValueError("Missing 'query'")
+        mode = params.get('mode', 'dense')
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode} (expected one of {SEARCH_MODES})")
+        filters = params.get('filters')
+        if filters is not None and not isinstance(filters, dict):
+            raise ValueError("'filters' must be an object")
+        for field, wanted in (filters or {}).items():
+            values = wanted if isinstance(wanted, list) else [wanted]
+            if not all(isinstance(value, (str, int, float, bool)) for value in values):
+                raise ValueError(f"Filter '{field}' must be a value or a list of values")
+        nprobe = params.get('nprobe', self.nprobe)
+        options = {
+            'top_k': positive_int(params.get('top_k', self.default_top_k), 'top_k'),
+            'mode': mode,
+            'nprobe': positive_int(nprobe, 'nprobe') if nprobe is not None else None,
+            'filters': filters
+        }
+        return query, options
+
+    async def search(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer one search request through the micro-batcher"""
+        started = time.perf_counter()
+        query, options = self.parse_request(params)
+        response = await self.batcher.submit(query, options)
+        latency_ms = (time.perf_counter() - started) * 1000
+        self.latencies.append(latency_ms)
+        response['timing']['latency_ms'] = latency_ms
+        return {'query': query, **response}
+
+    def stats(self) -> Dict[str, Any]:
+        """Request counters, latency percentiles and batch sizes"""
+        latencies = list(self.latencies)
+        batch_sizes = list(self.batcher.batch_sizes)
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'chunks': len(self.index),
+            'index_reloads': self.reloads,
+            'model_loaded': self.model is not None,
+            'latency_ms': {
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': max(latencies, default=0.0)
+            },
+            'avg_batch_size': sum(batch_sizes) / len(batch_sizes) if batch_sizes else 0.0,
+            'embedding_cache': self.cache.stats(),
+            'result_cache': self.result_cache.stats()
+        }
+
+    # HTTP/1.1 handling (stdlib only; one JSON request/response at a time per connection)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY_BYTES:
+                    await self.respond(writer, 413, {'error': 'Request body too large'})
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, payload = await self.route(method, target, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method: str, target: str, body: bytes) -> tuple:
+        url = urlsplit(target)
+        if url.path == '/health':
+            return 200, {'status': 'ok'}
+        if url.path == '/stats':
+            return 200, self.stats()
+        if url.path != '/search':
+            return 404, {'error': f"Not found: {url.path}"}
+
+        self.requests += 1
+        try:
+            if method == 'POST':
+                params = json.loads(body or b'{}')
+                if not isinstance(params, dict):
+                    raise ValueError("Request body must be a JSON object")
+            else:
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            return 200, await self.search(params)
+        except (ValueError, TypeError) as e:
+            self.errors += 1
+            return 400, {'error': str(e)}
+        except Exception as e:
+            self.errors += 1
+            return 500, {'error': str(e)}
+
+    async def respond(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any], keep_alive: bool = False):
+        reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (
+            f"HTTP/1.1 {status} {reasons.get(status, 'OK')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin1') + body)
+        await writer.drain()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765):
+        """Run the HTTP service until cancelled"""
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"✓ Listening on http://{host}:{port} (POST /search, GET /search?q=..., GET /stats)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+            self.executor.shutdown()
+            self.cache.close()
+
+
+def add_serve_arguments(parser):
+    """Service options, shared by this script and the `serve` subcommand of cli.py"""
+    parser.add_argument("--kb-dir", default=str(default_kb_dir()), help="Knowledge base directory")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--window-ms", type=float, default=3.0, help="Micro-batching window in milliseconds")
+    parser.add_argument("--max-batch", type=int, default=32, help="Largest micro-batch")
+    parser.add_argument("--workers", type=int, default=1, help="Executor threads running searches")
+    parser.add_argument("--nprobe", type=int, default=None, help="Default IVF nprobe")
+    parser.add_argument("--no-model", action="store_true", help="Serve cached and lexical queries only")
+    parser.add_argument("--quantized", action="store_true", help="Score on the int8/PQ codes of a --quantize build")
+    add_encoder_arguments(parser)
+
+
+def run_service(args):
+    """Start the service from parsed options; returns the exit status"""
+    try:
+        service = RetrievalService(args.kb_dir, use_model=not args.no_model, nprobe=args.nprobe,
+                                   window_ms=args.window_ms, max_batch=args.max_batch, workers=args.workers,
+                                   encoder=args.encoder, encoder_path=args.encoder_path, quantized=args.quantized)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"ERROR: {e}")
+        return 1
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n✓ Service stopped")
+    return 0
+
+
+def main():
+    """Serve knowledge base retrieval over HTTP"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    add_serve_arguments(parser)
+    sys.exit(run_service(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+NyayaSetu AI - Sharded retrieval index
+Splits the embedding store into shards (by act or by row range), each held by
+its own worker process; queries fan out to every shard and the local top-k
+lists are merged with a heap into the same ranking as a single-process scan
+"""
+
+import heapq
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+from pathlib import Path
+
+import numpy as np
+
+# Package-relative when imported as src.rag, sibling modules when run as a script
+if __package__:
+    from .kb_index import KnowledgeBaseIndex, normalize_rows, matrix_scores, rank_scores, filter_value
+    from .kb_store import EMBEDDINGS_FILE, has_embedding_store, iter_store_records
+else:
+    from kb_index import KnowledgeBaseIndex, normalize_rows, matrix_scores, rank_scores, filter_value
+    from kb_store import EMBEDDINGS_FILE, has_embedding_store, iter_store_records
+
+SHARD_STRATEGIES = ('rows', 'act')
+
+# Per-process shard used by worker processes: its index and the global row of each local row
+_shard_index = None
+_shard_rows = None
+
+
+def contiguous_slice(rows: np.ndarray) -> Optional[slice]:
+    """rows as a slice when they form one contiguous range"""
+    if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+        return slice(int(rows[0]), int(rows[-1]) + 1)
+    return None
+
+
+def plan_shards(store_dir, n_shards: Optional[int] = None, by: str = 'rows') -> List[Dict[str, Any]]:
+    """Assign store rows to shards: equal row ranges, or whole acts packed into n_shards"""
+    if by not in SHARD_STRATEGIES:
+        raise ValueError(f"Unknown shard strategy: {by} (expected one of {SHARD_STRATEGIES})")
+
+    if by == 'rows':
+        n_rows = len(np.load(Path(store_dir) / EMBEDDINGS_FILE, mmap_mode='r'))
+        n_shards = max(1, min(n_shards or 1, n_rows))
+        return [
+            {'name': f"rows {rows[0]}-{rows[-1]}", 'acts': None, 'rows': rows}
+            for rows in np.array_split(np.arange(n_rows, dtype=np.int64), n_shards)
+        ]
+
+    act_rows: Dict[str, List[int]] = {}
+    for row, record in enumerate(iter_store_records(store_dir)):
+        act_rows.setdefault(record['metadata'].get('act', ''), []).append(row)
+
+    # One shard per act, or the acts packed largest first into the emptiest of n_shards
+    n_shards = min(n_shards or len(act_rows), len(act_rows))
+    bins = [{'acts': [], 'rows': []} for _ in range(n_shards)]
+    for act, rows in sorted(act_rows.items(), key=lambda item: -len(item[1])):
+        emptiest = min(bins, key=lambda shard: len(shard['rows']))
+        emptiest['acts'].append(act)
+        emptiest['rows'].extend(rows)
+    return [
+        {'name': " + ".join(shard['acts']), 'acts': shard['acts'], 'rows': np.array(sorted(shard['rows']), dtype=np.int64)}
+        for shard in bins
+    ]
+
+
+def _init_shard(store_dir: str, rows: np.ndarray):
+    """Pool initializer: memory-map this shard's rows and index them"""
+    global _shard_index, _shard_rows
+    embeddings = np.load(Path(store_dir) / EMBEDDINGS_FILE, mmap_mode='r')
+
+    # A contiguous shard is a view of the memory-mapped store; others are copied once
+    span = contiguous_slice(rows)
+    if span is not None:
+        shard_embeddings = embeddings[span]
+        records = list(itertools.islice(iter_store_records(store_dir), span.start, span.stop))
+    else:
+        shard_embeddings = np.ascontiguousarray(embeddings[rows])
+        wanted = set(rows.tolist())
+        records = [record for row, record in enumerate(iter_store_records(store_dir)) if row in wanted]
+
+    _shard_index = KnowledgeBaseIndex(records, embeddings=shard_embeddings)
+    _shard_rows = rows
+
+
+def _shard_size() -> int:
+    return len(_shard_index)
+
+
+def _search_shard(queries: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]]) -> List[List[Tuple[float, int, Dict[str, Any]]]]:
+    """Worker: local top_k (score, global row, result) lists, best first, for normalized queries"""
+    index = _shard_index
+    rows = index.filter_rows(filters)
+    if rows is not None and not len(rows):
+        return [[] for _ in range(len(queries))]
+
+    # Same scoring as KnowledgeBaseIndex.search_matrix; rank_scores re-scores the
+    # shortlist exactly, so the similarities match the single-process scan bit for bit
+    scores = matrix_scores(index.embeddings, queries, rows)
+    return [
+        [(score, int(_shard_rows[row]), index.result(row, score))
+         for row, score in rank_scores(index.embeddings, query, query_scores, top_k, rows)]
+        for query, query_scores in zip(queries, scores)
+    ]
+
+
+class ShardedIndex:
+    """Exact dense search over shards held by worker processes (scatter-gather)"""
+
+    def __init__(self, store_dir, n_shards: Optional[int] = None, by: str = 'rows'):
+        if not has_embedding_store(store_dir):
+            raise FileNotFoundError(f"Sharded search needs a binary embedding store in {store_dir}")
+
+        self.store_dir = Path(store_dir)
+        self.shards = plan_shards(store_dir, n_shards, by)
+        context = multiprocessing.get_context("spawn")
+        self.pools = [
+            ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_init_shard,
+                                initargs=(str(self.store_dir), shard['rows']))
+            for shard in self.shards
+        ]
+
+        # Start every worker now so the first query does not pay for loading
+        for shard, size in zip(self.shards, [pool.submit(_shard_size) for pool in self.pools]):
+            shard['size'] = size.result()
+
+    def __len__(self) -> int:
+        return sum(shard['size'] for shard in self.shards)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def shards_for(self, filters: Optional[Dict[str, Any]]) -> List[int]:
+        """Shards that can hold matches: act shards outside an act filter are skipped"""
+        acts = (filters or {}).get('act')
+        if acts is None:
+            return list(range(len(self.shards)))
+        wanted = {filter_value('act', act) for act in (acts if isinstance(acts, (list, tuple, set)) else [acts])}
+        return [
+            i for i, shard in enumerate(self.shards)
+            if shard['acts'] is None or wanted.intersection(shard['acts'])
+        ]
+
+    def search_matrix(self, query_embeddings, top_k: int = 3, nprobe: Optional[int] = None,
+                      filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """Return the top_k chunks for each row of a query embedding matrix"""
+        if nprobe:
+            raise ValueError("Sharded search is exact; nprobe is not supported")
+        queries = normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+
+        # Scatter: every shard ranks all queries locally, in parallel
+        futures = [self.pools[i].submit(_search_shard, queries, top_k, filters) for i in self.shards_for(filters)]
+        shard_hits = [future.result() for future in futures]
+
+        # Gather: merge the sorted local lists; ties go to the lower global row, as in one scan
+        all_results = []
+        for q in range(len(queries)):
+            merged = heapq.merge(*(hits[q] for hits in shard_hits), key=lambda hit: (-hit[0], hit[1]))
+            all_results.append([result for _, _, result in itertools.islice(merged, top_k)])
+        return all_results
+
+    def search_vector(self, query_embedding, top_k: int = 3, nprobe: Optional[int] = None,
+                      filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Return the top_k chunks most similar to a query embedding"""
+        return self.search_matrix(query_embedding, top_k=top_k, nprobe=nprobe, filters=filters)[0]
+
+    def search_lexical(self, query: str, top_k: int = 3, filters: Optional[Dict[str, Any]] = None):
+        # BM25 statistics are corpus-wide, so per-shard scores would not merge exactly
+        raise ValueError("Sharded search supports dense mode only")
+
+    def search_hybrid(self, query: str, query_embedding, top_k: int = 3, nprobe: Optional[int] = None,
+                      filters: Optional[Dict[str, Any]] = None, **kwargs):
+        raise ValueError("Sharded search supports dense mode only")
+
+    def close(self):
+        """Stop the shard workers"""
+        for pool in self.pools:
+            pool.shutdown()
+        self.pools = []
@@ -6,45 +6,201 @@ Test script to demonstrate RAG knowledge base querying
 import json
 import numpy as np
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
+
+# Package-relative when imported as src.rag, sibling modules when run as a script
+if __package__:
+    from .kb_index import KnowledgeBaseIndex
+    from .kb_store import has_embedding_store
+    from .embedding_cache import EmbeddingCache
+    from .lexical_index import LexicalIndex
+    from .encoders import load_encoder, encoder_id
+else:
+    from kb_index import KnowledgeBaseIndex
+    from kb_store import has_embedding_store
+    from embedding_cache import EmbeddingCache
+    from lexical_index import LexicalIndex
+    from encoders import load_encoder, encoder_id
+
+EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
+def load_model(model_name=EMBEDDING_MODEL, backend='torch', model_path=None):
+    """Load the embedding model (torch or onnxruntime is imported here, on first use)"""
+    return load_encoder(backend, model_name, model_path)
+
+def default_kb_dir():
+    """Knowledge base directory at the project root"""
+    # Get project root (two levels up from this script)
+    script_dir = Path(__file__).parent
+    project_root = script_dir.parent.parent
+    return project_root / "knowledge_base"
 
 def load_knowledge_base(kb_path=None):
     """Load the knowledge base"""
     if kb_path is None:
-        # Get project root (two levels up from this script)
-        script_dir = Path(__file__).parent
-        project_root = script_dir.parent.parent
-        kb_path = project_root / "knowledge_base" / "knowledge_base.json"
+        kb_path = default_kb_dir() / "knowledge_base.json"
     
     with open(kb_path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
+def load_index(kb_dir=None, nprobe=None, shards=None, shard_by='rows', quantized=False):
+    """Load a search index, preferring the memory-mapped binary store
+    
+    quantized=True scores on the int8/PQ codes written by a --quantize build
+    (reranking the best candidates against the float store).
+    """
+    kb_dir = Path(kb_dir) if kb_dir is not None else default_kb_dir()
+    if quantized and shards and shards > 1:
+        raise ValueError("Quantized search is not supported on shards")
+    if quantized and not has_embedding_store(kb_dir):
+        raise FileNotFoundError(f"No embedding store in {kb_dir}; build with --quantize int8|pq for quantized search")
+    
+    # shards > 1 spreads dense search over that many worker processes
+    if shards and shards > 1:
+        if __package__:
+            from .sharded_index import ShardedIndex
+        else:
+            from sharded_index import ShardedIndex
+        return ShardedIndex(kb_dir, n_shards=shards, by=shard_by)
+    
+    # nprobe selects approximate IVF search when the builder emitted an IVF index
+    if has_embedding_store(kb_dir):
+        index = KnowledgeBaseIndex.from_store(kb_dir, nprobe=nprobe, quantized=quantized)
+        if index.lexical is None:
+            # Stores converted from an older JSON build have no BM25 files
+            index.lexical = LexicalIndex.build([chunk['text'] for chunk in index.chunks])
+        return index
+    
+    # Fall back to the JSON knowledge base from older builds; its BM25 index is
+    # built once here rather than per query
+    index = KnowledgeBaseIndex(load_knowledge_base(kb_dir / "knowledge_base.json"))
+    index.lexical = LexicalIndex.build([chunk['text'] for chunk in index.chunks])
+    return index
+
 def cosine_similarity(vec1, vec2):
     """Calculate cosine similarity between two vectors"""
     vec1 = np.array(vec1)
     vec2 = np.array(vec2)
     return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
 
-def search_knowledge_base(query, kb, model, top_k=3):
-    """Search knowledge base using semantic similarity"""
-    # Generate query embedding
-    query_embedding = model.encode([query])[0]
+def load_embedding_cache(kb_dir=None, model_name=EMBEDDING_MODEL, backend='torch', model_path=None):
+    """Open the persistent embedding cache shared with the knowledge base builder"""
+    kb_dir = Path(kb_dir) if kb_dir is not None else default_kb_dir()
+    # Each backend has its own namespace, so cached vectors always match the encoder
+    return EmbeddingCache(encoder_id(model_name, backend, model_path), kb_dir / "embedding_cache.sqlite")
+
+def encode_queries(queries, model, cache=None):
+    """Embed queries, skipping the model for texts already in the cache"""
+    if model is None:
+        # No model: only cached embeddings are available (None for the rest)
+        return cache.get_many(list(queries)) if cache is not None else [None] * len(queries)
+    if cache is None:
+        return model.encode(list(queries))
+    return cache.encode(list(queries), model)
+
+def search_scope(**options):
+    """Result cache scope for the search options that change the ranking"""
+    scope = []
+    for name, value in sorted(options.items()):
+        if not value:
+            continue
+        if isinstance(value, dict):
+            # Filters become hashable: ((field, (values...)), ...)
+            value = tuple(sorted(
+                (field, tuple(sorted(wanted)) if isinstance(wanted, (list, tuple, set)) else (wanted,))
+                for field, wanted in value.items()
+            ))
+        scope.append((name, value))
+    return tuple(scope) or None
+
+SEARCH_MODES = ('dense', 'lexical', 'hybrid')
+
+def rank_embeddings(index, queries, query_embeddings, top_k, nprobe=None, filters=None, mode='dense'):
+    """Rank already-embedded queries with the index in the given search mode"""
+    if mode == 'hybrid':
+        return [
+            index.search_hybrid(query, embedding, top_k=top_k, nprobe=nprobe, filters=filters)
+            for query, embedding in zip(queries, query_embeddings)
+        ]
+    return index.search_matrix(query_embeddings, top_k=top_k, nprobe=nprobe, filters=filters)
+
+def search_knowledge_base(query, kb, model, top_k=3, cache=None, result_cache=None, nprobe=None,
+                          filters=None, mode='dense'):
+    """Search knowledge base using semantic similarity
+    
+    filters restricts the search by metadata, e.g. {'chapter': 'Chapter IV: ...'}
+    or {'section': ['Section 35', 'Section 36']}. mode selects 'dense' (embeddings),
+    'lexical' (BM25 only, no model needed) or 'hybrid' (reciprocal rank fusion of both).
+    model may be None: queries found in the embedding cache are still searched in the
+    requested mode and the rest fall back to BM25.
+    """
+    return search_many([query], kb, model, top_k=top_k, cache=cache, result_cache=result_cache,
+                       nprobe=nprobe, filters=filters, mode=mode)[0]
+
+def search_many(queries, kb, model, top_k=3, cache=None, result_cache=None, nprobe=None,
+                filters=None, mode='dense'):
+    """Search knowledge base for a batch of queries at once"""
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {mode} (expected one of {SEARCH_MODES})")
     
-    # Calculate similarities
-    results = []
-    for chunk in kb:
-        if 'embedding' in chunk:
-            similarity = cosine_similarity(query_embedding, chunk['embedding'])
-            results.append({
-                'similarity': similarity,
-                'text': chunk['text'],
-                'metadata': chunk['metadata']
-            })
+    # Accept a raw chunk list for convenience; callers issuing many queries
+    # should build the KnowledgeBaseIndex (or ShardedIndex) once and reuse it
+    index = KnowledgeBaseIndex(kb) if isinstance(kb, list) else kb
+    scope = search_scope(nprobe=nprobe, filters=filters, mode=mode if mode != 'dense' else None)
     
-    # Sort by similarity
-    results.sort(key=lambda x: x['similarity'], reverse=True)
+    queries = list(queries)
+    if not queries:
+        return []
     
-    return results[:top_k]
+    all_results = [None] * len(queries)
+    if result_cache is not None:
+        all_results = [result_cache.get(query, top_k, scope) for query in queries]
+    pending = [i for i, results in enumerate(all_results) if results is None]
+    if not pending:
+        return all_results
+    
+    if mode == 'lexical':
+        # BM25 needs no query embedding
+        for i in pending:
+            all_results[i] = index.search_lexical(queries[i], top_k=top_k, filters=filters)
+            if result_cache is not None:
+                result_cache.put(queries[i], None, top_k, all_results[i], scope)
+        return all_results
+    
+    # Encode the whole batch in one forward pass
+    query_embeddings = encode_queries([queries[i] for i in pending], model, cache)
+    
+    if model is None:
+        # Queries without a cached embedding are answered lexically (and not
+        # cached under the dense scope)
+        embedded = []
+        for i, embedding in zip(pending, query_embeddings):
+            if embedding is None:
+                all_results[i] = index.search_lexical(queries[i], top_k=top_k, filters=filters)
+            else:
+                embedded.append((i, embedding))
+        if not embedded:
+            return all_results
+        pending = [i for i, _ in embedded]
+        query_embeddings = np.vstack([embedding for _, embedding in embedded])
+    
+    # Hybrid results depend on the query's exact terms, so a paraphrase with a
+    # similar embedding is no stand-in; only dense searches reuse neighbours
+    if result_cache is not None and mode == 'dense':
+        for i, embedding in zip(pending, query_embeddings):
+            all_results[i] = result_cache.get_similar(embedding, top_k, scope)
+    
+    to_score = [j for j, i in enumerate(pending) if all_results[i] is None]
+    if to_score:
+        scored = rank_embeddings(index, [queries[pending[j]] for j in to_score], query_embeddings[to_score],
+                                 top_k, nprobe=nprobe, filters=filters, mode=mode)
+        for j, results in zip(to_score, scored):
+            all_results[pending[j]] = results
+    
+    if result_cache is not None:
+        for i, embedding in zip(pending, query_embeddings):
+            result_cache.put(queries[i], embedding, top_k, all_results[i], scope)
+    
+    return all_results
 
 def main():
     """Test RAG query functionality"""
@@ -52,16 +208,17 @@ def main():
     print("NyayaSetu AI - RAG Knowledge Base Query Test")
     print("=" * 70)
     
+    # Load knowledge base (before the model, so a missing KB fails fast)
+    print("\nLoading knowledge base...")
+    kb = load_index()
+    print(f"✓ Loaded {len(kb)} chunks")
+    cache = load_embedding_cache()
+    
     # Load model
     print("\nLoading embedding model...")
-    model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+    model = load_model()
     print("✓ Model loaded")
     
-    # Load knowledge base
-    print("\nLoading knowledge base...")
-    kb = load_knowledge_base()
-    print(f"✓ Loaded {len(kb)} chunks")
-    
     # Test queries
     test_queries = [
         "What are consumer rights?",
@@ -75,12 +232,12 @@ def main():
     print("TEST QUERIES")
     print("=" * 70)
     
-    for query in test_queries:
+    all_results = search_many(test_queries, kb, model, top_k=3, cache=cache)
+    
+    for query, results in zip(test_queries, all_results):
         print(f"\n📝 Query: {query}")
         print("-" * 70)
         
-        results = search_knowledge_base(query, kb, model, top_k=3)
-        
         for i, result in enumerate(results, 1):
             print(f"\n[Result {i}] Similarity: {result['similarity']:.4f}")
             print(f"Section: {result['metadata']['section']}")
@@ -88,6 +245,11 @@ def main():
             print(f"Text preview: {result['text'][:200]}...")
             print()
     
+    cache_stats = cache.stats()
+    print(f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+          f"(hit rate {cache_stats['hit_rate']:.0%})")
+    cache.close()
+    
     print("=" * 70)
     print("✓ Query test complete")
     print("=" * 70)
@@ -0,0 +1,123 @@
+"""
+NyayaSetu AI - Token-accurate chunking
+Splits section text by the embedding model's own tokenizer so every chunk fits
+the model's maximum sequence length, preferring sentence and clause boundaries
+"""
+
+import bisect
+import re
+from typing import List, Dict, Any, Optional
+
+# Places a chunk may end, by preference: sentence ends, clause ends, line breaks, word starts
+BOUNDARY_PATTERNS = (
+    (3, re.compile(r'[.?!](?=\s)')),
+    (2, re.compile(r'[;:](?=\s)|—')),
+    (1, re.compile(r'\n')),
+    (0, re.compile(r'\s(?=\S)')),
+)
+
+# [CLS] and [SEP] added by the encoder count against its sequence length
+SPECIAL_TOKENS = 2
+
+
+def load_tokenizer(model_name: str):
+    """Fast (Rust) tokenizer of a Hugging Face model, without loading its weights"""
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(model_name, use_fast=True)
+
+
+class TokenChunker:
+    """Greedy boundary-aware splitter with a token budget and token overlap"""
+
+    def __init__(self, tokenizer, max_seq_length: int = 256, overlap_tokens: int = 32):
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+        self.budget = max_seq_length - SPECIAL_TOKENS
+        # Overlap must leave room for the next chunk to make progress
+        self.overlap_tokens = max(0, min(overlap_tokens, self.budget // 2 - 1))
+
+    @classmethod
+    def for_model(cls, model_name: str, embedding_model=None, max_seq_length: Optional[int] = None,
+                  overlap_tokens: int = 32) -> "TokenChunker":
+        """Chunker using a loaded SentenceTransformer's tokenizer, or the model's tokenizer alone"""
+        if embedding_model is not None and getattr(embedding_model, 'tokenizer', None) is not None:
+            tokenizer = embedding_model.tokenizer
+            max_seq_length = max_seq_length or embedding_model.max_seq_length
+        else:
+            tokenizer = load_tokenizer(model_name)
+        return cls(tokenizer, max_seq_length=max_seq_length or 256, overlap_tokens=overlap_tokens)
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Encoder sequence lengths (special tokens included) of texts, in one batched call"""
+        if not texts:
+            return []
+        encoded = self.tokenizer(texts, add_special_tokens=True, truncation=False)
+        return [len(ids) for ids in encoded['input_ids']]
+
+    def split_many(self, texts: List[str]) -> List[List[str]]:
+        """Split each text into pieces that fit the token budget"""
+        if not texts:
+            return []
+        encoded = self.tokenizer(texts, add_special_tokens=False, truncation=False, return_offsets_mapping=True)
+        return [self._split(text, offsets) for text, offsets in zip(texts, encoded['offset_mapping'])]
+
+    def split(self, text: str) -> List[str]:
+        return self.split_many([text])[0]
+
+    def _split(self, text: str, offsets: List[tuple]) -> List[str]:
+        n_tokens = len(offsets)
+        if n_tokens <= self.budget:
+            return [text]
+
+        # Token index at which a chunk may end (and the next one start), with its priority
+        token_starts = [start for start, _ in offsets]
+        breaks: Dict[int, int] = {}
+        for priority, pattern in BOUNDARY_PATTERNS:
+            for match in pattern.finditer(text):
+                token = bisect.bisect_left(token_starts, match.end())
+                if 0 < token < n_tokens and breaks.get(token, -1) < priority:
+                    breaks[token] = priority
+
+        pieces = []
+        start = 0
+        while True:
+            end = min(start + self.budget, n_tokens)
+            if end < n_tokens:
+                # Best boundary in the back half of the window, latest first
+                end = self._best_break(breaks, range(end, start + self.budget // 2, -1)) or end
+
+            pieces.append(text[offsets[start][0]:offsets[end - 1][1]].strip())
+            if end == n_tokens:
+                return pieces
+
+            if not self.overlap_tokens:
+                start = end
+                continue
+
+            # The next chunk starts at the best boundary inside the overlap, earliest first
+            overlap_start = max(end - self.overlap_tokens, start + 1)
+            start = self._best_break(breaks, range(overlap_start, end)) or overlap_start
+
+    @staticmethod
+    def _best_break(breaks: Dict[int, int], candidates: range) -> Optional[int]:
+        best, best_priority = None, -1
+        for token in candidates:
+            priority = breaks.get(token, -1)
+            if priority > best_priority:
+                best, best_priority = token, priority
+        return best
+
+    def truncation_report(self, char_chunks: List[str], token_chunks: List[str]) -> Dict[str, Any]:
+        """Compare character-estimated chunks with token chunks against the sequence limit"""
+        char_lengths = self.count_tokens(char_chunks)
+        token_lengths = self.count_tokens(token_chunks)
+        truncated = [length for length in char_lengths if length > self.max_seq_length]
+        return {
+            'max_seq_length': self.max_seq_length,
+            'overlap_tokens': self.overlap_tokens,
+            'chunks': len(token_chunks),
+            'max_chunk_tokens': max(token_lengths, default=0),
+            'char_scheme_chunks': len(char_chunks),
+            'char_scheme_truncated': len(truncated),
+            'char_scheme_tokens_lost': sum(length - self.max_seq_length for length in truncated)
+        }
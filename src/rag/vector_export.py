@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+NyayaSetu AI - Vector export and bulk upsert
+Streams chunk vectors as NDJSON (one {id, values, metadata} record per line) and
+upserts them into a pluggable vector store in batches, with bounded concurrency,
+retries and a checkpoint that lets an interrupted ingest resume where it stopped
+"""
+
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Callable
+from pathlib import Path
+
+import numpy as np
+
+# Package-relative when imported as src.rag, sibling modules when run as a script
+if __package__:
+    from .kb_store import EMBEDDINGS_FILE, has_embedding_store, iter_store_records, kb_fingerprint
+else:
+    from kb_store import EMBEDDINGS_FILE, has_embedding_store, iter_store_records, kb_fingerprint
+
+EXPORT_FILE = "vectors.ndjson"
+CHECKPOINT_FILE = "upsert_checkpoint.json"
+
+
+class NdjsonWriter:
+    """Write records one compact JSON object per line"""
+
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.count = 0
+
+    def write(self, record: Dict[str, Any]):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+
+def iter_ndjson(path) -> Iterator[Dict[str, Any]]:
+    """Read an NDJSON file record by record"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_store_vectors(kb_dir) -> Iterator[Dict[str, Any]]:
+    """Vector records straight from a binary embedding store (memory-mapped, row by row)"""
+    embeddings = np.load(Path(kb_dir) / EMBEDDINGS_FILE, mmap_mode='r')
+    for row, record in enumerate(iter_store_records(kb_dir)):
+        yield {
+            'id': record['id'],
+            'values': np.asarray(embeddings[row], dtype=np.float32).tolist(),
+            'metadata': {**record['metadata'], 'text': record['text']}
+        }
+
+
+def iter_vector_records(source) -> Iterator[Dict[str, Any]]:
+    """Records of an NDJSON file, or of a knowledge base directory (store first, then its export)"""
+    source = Path(source)
+    if source.is_file():
+        return iter_ndjson(source)
+    if has_embedding_store(source):
+        return iter_store_vectors(source)
+    if (source / EXPORT_FILE).exists():
+        return iter_ndjson(source / EXPORT_FILE)
+    raise FileNotFoundError(f"No embedding store or {EXPORT_FILE} in {source}")
+
+
+def export_ndjson(kb_dir, path=None) -> int:
+    """Write a knowledge base's store as NDJSON (e.g. for a merged corpus); returns the record count"""
+    path = Path(path) if path else Path(kb_dir) / EXPORT_FILE
+    writer = NdjsonWriter(path)
+    try:
+        for record in iter_store_vectors(kb_dir):
+            writer.write(record)
+    finally:
+        writer.close()
+    return writer.count
+
+
+def source_fingerprint(source) -> list:
+    """Identity of an upsert source, so a checkpoint is only resumed against unchanged data"""
+    source = Path(source)
+    if source.is_file():
+        stat = source.stat()
+        fingerprint = [(source.name, stat.st_mtime_ns, stat.st_size)]
+    else:
+        fingerprint = list(kb_fingerprint(source))
+        export = source / EXPORT_FILE
+        if not has_embedding_store(source) and export.exists():
+            fingerprint.append((EXPORT_FILE, export.stat().st_mtime_ns, export.stat().st_size))
+    # Round-trip through JSON so it compares equal to the stored copy
+    return json.loads(json.dumps(fingerprint))
+
+
+class VectorStoreBackend:
+    """Upsert target; upserts are keyed by record id, so replaying a batch is harmless"""
+
+    name = "backend"
+    # Whether upserts outlive the process (only then can an ingest resume from a checkpoint)
+    persistent = True
+
+    def upsert(self, records: List[Dict[str, Any]]) -> int:
+        """Insert or replace records ({id, values, metadata}); returns the number written"""
+        raise NotImplementedError
+
+    def fetch(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Stored records by id (missing ids are left out)"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryVectorStore(VectorStoreBackend):
+    """In-process stand-in for a vector database"""
+
+    name = "memory"
+    persistent = False
+
+    def __init__(self):
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def upsert(self, records: List[Dict[str, Any]]) -> int:
+        with self._lock:
+            for record in records:
+                self.records[record['id']] = {
+                    'id': record['id'],
+                    'values': np.asarray(record['values'], dtype=np.float32),
+                    'metadata': record.get('metadata', {})
+                }
+        return len(records)
+
+    def fetch(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {i: self.records[i] for i in ids if i in self.records}
+
+    def count(self) -> int:
+        return len(self.records)
+
+
+class SqliteVectorStore(VectorStoreBackend):
+    """SQLite-backed stand-in: float32 vector blobs and JSON metadata keyed by id"""
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            " id TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " metadata TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+    def upsert(self, records: List[Dict[str, Any]]) -> int:
+        rows = [
+            (record['id'], np.asarray(record['values'], dtype=np.float32).tobytes(),
+             json.dumps(record.get('metadata', {}), ensure_ascii=False))
+            for record in records
+        ]
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO vectors (id, vector, metadata) VALUES (?, ?, ?)", rows)
+            self._db.commit()
+        return len(rows)
+
+    def fetch(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._db.execute(f"SELECT id, vector, metadata FROM vectors WHERE id IN ({placeholders})",
+                                    list(ids)).fetchall()
+        return {
+            i: {'id': i, 'values': np.frombuffer(vector, dtype=np.float32), 'metadata': json.loads(metadata)}
+            for i, vector, metadata in rows
+        }
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class PineconeVectorStore(VectorStoreBackend):
+    """Adapter for a Pinecone index object (pinecone client 3+)"""
+
+    name = "pinecone"
+
+    def __init__(self, index, namespace: str = ""):
+        self.index = index
+        self.namespace = namespace
+
+    def upsert(self, records: List[Dict[str, Any]]) -> int:
+        vectors = [
+            {'id': record['id'], 'values': list(record['values']),
+             # Pinecone metadata values cannot be null
+             'metadata': {key: value for key, value in record.get('metadata', {}).items() if value is not None}}
+            for record in records
+        ]
+        self.index.upsert(vectors=vectors, namespace=self.namespace)
+        return len(vectors)
+
+    def fetch(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        vectors = self.index.fetch(ids=list(ids), namespace=self.namespace).vectors
+        return {i: {'id': i, 'values': vector.values, 'metadata': vector.metadata} for i, vector in vectors.items()}
+
+    def count(self) -> int:
+        stats = self.index.describe_index_stats()
+        if self.namespace:
+            namespace = stats.namespaces.get(self.namespace)
+            return namespace.vector_count if namespace else 0
+        return stats.total_vector_count
+
+
+def open_backend(spec: str) -> VectorStoreBackend:
+    """Backend from a spec: "memory", "sqlite:PATH" or "pinecone:INDEX" (PINECONE_API_KEY)"""
+    kind, _, target = spec.partition(":")
+    if kind == "memory":
+        return MemoryVectorStore()
+    if kind == "sqlite":
+        if not target:
+            raise ValueError("sqlite backend needs a path: sqlite:PATH")
+        return SqliteVectorStore(target)
+    if kind == "pinecone":
+        from pinecone import Pinecone
+        return PineconeVectorStore(Pinecone(api_key=os.environ["PINECONE_API_KEY"]).Index(target))
+    raise ValueError(f"Unknown vector store backend: {spec} (expected memory, sqlite:PATH or pinecone:INDEX)")
+
+
+def batched(records: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    iterator = iter(records)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class BulkUpserter:
+    """Pipelined batch upserts: at most `concurrency` batches in flight, each retried with backoff"""
+
+    def __init__(self, backend: VectorStoreBackend, batch_size: int = 100, concurrency: int = 4,
+                 max_retries: int = 3, backoff_seconds: float = 0.5):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def upsert_batch(self, batch: List[Dict[str, Any]]) -> int:
+        """Upsert one batch, retrying failures with exponential backoff"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.backend.upsert(batch)
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self.backoff_seconds * 2 ** attempt)
+
+    def run(self, records: Iterable[Dict[str, Any]], skip: int = 0,
+            on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """Upsert records after the first `skip`; on_progress gets the number of leading
+        records known to be stored (batches finish out of order, so this trails slightly)"""
+        start = time.perf_counter()
+        records = itertools.islice(iter(records), skip, None)
+
+        pending = {}
+        finished = {}
+        next_done = 0
+        done = skip
+        written = 0
+        batches = 0
+
+        def collect(futures):
+            nonlocal next_done, done, written
+            for future in futures:
+                index, size = pending.pop(future)
+                written += future.result()
+                finished[index] = size
+            # Advance the watermark over the contiguous run of finished batches
+            advanced = False
+            while next_done in finished:
+                done += finished.pop(next_done)
+                next_done += 1
+                advanced = True
+            if advanced and on_progress:
+                on_progress(done)
+
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="upsert")
+        try:
+            for index, batch in enumerate(batched(records, self.batch_size)):
+                # Bounded pipeline: read ahead only while fewer than `concurrency` batches are in flight
+                if len(pending) >= self.concurrency:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                pending[executor.submit(self.upsert_batch, batch)] = (index, len(batch))
+                batches += 1
+            while pending:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+        seconds = time.perf_counter() - start
+        return {
+            'backend': self.backend.name,
+            'skipped': skip,
+            'records': written,
+            'batches': batches,
+            'retries': self.retries,
+            'seconds': round(seconds, 3),
+            'records_per_second': round(written / seconds, 1) if seconds else None
+        }
+
+
+def load_checkpoint(path, key: str, fingerprint: list) -> int:
+    """Records already upserted to this backend from this exact source (0 if none)"""
+    path = Path(path)
+    if not path.exists():
+        return 0
+    with open(path, 'r', encoding='utf-8') as f:
+        entry = json.load(f).get(key)
+    if not entry:
+        return 0
+    if entry['fingerprint'] != fingerprint:
+        print(f"⚠ Source changed since the last upsert to {key}; starting over")
+        return 0
+    return entry['records_done']
+
+
+def save_checkpoint(path, key: str, fingerprint: list, records_done: int, complete: bool = False):
+    """Record progress atomically (write, then rename)"""
+    path = Path(path)
+    checkpoints = {}
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            checkpoints = json.load(f)
+    checkpoints[key] = {'fingerprint': fingerprint, 'records_done': records_done, 'complete': complete}
+    temp = path.with_suffix(path.suffix + ".tmp")
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump(checkpoints, f, indent=2)
+    os.replace(temp, path)
+
+
+def default_checkpoint_path(source) -> Path:
+    source = Path(source)
+    return source.parent / f"{source.name}.{CHECKPOINT_FILE}" if source.is_file() else source / CHECKPOINT_FILE
+
+
+def upsert_source(source, backend_spec: str, batch_size: int = 100, concurrency: int = 4, max_retries: int = 3,
+                  resume: bool = True, checkpoint_path=None) -> Dict[str, Any]:
+    """Upsert a knowledge base directory or NDJSON export into a backend, resuming from its checkpoint"""
+    records = iter_vector_records(source)
+    backend = open_backend(backend_spec)
+    try:
+        # Checkpoints only make sense for stores that keep what was upserted
+        checkpoint = None
+        skip = 0
+        if backend.persistent:
+            checkpoint = Path(checkpoint_path) if checkpoint_path else default_checkpoint_path(source)
+            fingerprint = source_fingerprint(source)
+            skip = load_checkpoint(checkpoint, backend_spec, fingerprint) if resume else 0
+            if skip:
+                print(f"✓ Resuming after {skip} records already upserted to {backend_spec}")
+
+        def on_progress(done: int):
+            if checkpoint:
+                save_checkpoint(checkpoint, backend_spec, fingerprint, done)
+
+        upserter = BulkUpserter(backend, batch_size=batch_size, concurrency=concurrency, max_retries=max_retries)
+        summary = upserter.run(records, skip=skip, on_progress=on_progress)
+        if checkpoint:
+            save_checkpoint(checkpoint, backend_spec, fingerprint, skip + summary['records'], complete=True)
+        summary['store_count'] = backend.count()
+    finally:
+        backend.close()
+    summary['checkpoint'] = str(checkpoint) if checkpoint else None
+    return summary
+
+
+def add_upsert_arguments(parser):
+    """Upsert options, shared by this script and the `upsert` subcommand of cli.py"""
+    project_root = Path(__file__).parent.parent.parent
+
+    parser.add_argument("source", nargs="?", default=str(project_root / "knowledge_base"),
+                        help="Knowledge base directory or NDJSON export")
+    parser.add_argument("--backend", default="sqlite:vectors.sqlite",
+                        help="memory, sqlite:PATH or pinecone:INDEX (default: sqlite:vectors.sqlite)")
+    parser.add_argument("--batch-size", type=int, default=100, help="Records per upsert call")
+    parser.add_argument("--concurrency", type=int, default=4, help="Upsert calls in flight")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per failed batch")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore the checkpoint and upsert everything")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: next to the source)")
+
+
+def run_upsert(args) -> Optional[Dict[str, Any]]:
+    """Upsert from parsed options"""
+    try:
+        summary = upsert_source(args.source, args.backend, batch_size=args.batch_size, concurrency=args.concurrency,
+                                max_retries=args.retries, resume=not args.no_resume, checkpoint_path=args.checkpoint)
+    except (FileNotFoundError, ValueError, ImportError, KeyError) as e:
+        print(f"ERROR: {e}")
+        return None
+
+    print(f"✓ Upserted {summary['records']} records in {summary['batches']} batches to {args.backend} "
+          f"({summary['seconds']:.2f}s, {summary['records_per_second'] or 0:.0f} records/s, {summary['retries']} retries)")
+    print(f"✓ Store now holds {summary['store_count']} vectors" +
+          (f"; checkpoint: {summary['checkpoint']}" if summary['checkpoint'] else ""))
+    return summary
+
+
+def main():
+    """Export vectors as NDJSON or bulk-upsert them into a vector store"""
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    export = subcommands.add_parser("export", help="Write a knowledge base's vectors as NDJSON")
+    export.add_argument("kb_dir", help="Knowledge base directory with a binary embedding store")
+    export.add_argument("--output", default=None, help=f"NDJSON file (default: KB_DIR/{EXPORT_FILE})")
+
+    upsert = subcommands.add_parser("upsert", help="Bulk-upsert vectors into a vector store")
+    add_upsert_arguments(upsert)
+
+    args = parser.parse_args()
+    if args.command == "export":
+        count = export_ndjson(args.kb_dir, args.output)
+        print(f"✓ Exported {count} vectors: {args.output or Path(args.kb_dir) / EXPORT_FILE}")
+        return
+    sys.exit(0 if run_upsert(args) is not None else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+NyayaSetu AI - Test fixtures
+Knowledge base builds of the bundled Consumer Protection Act with a stub encoder,
+so the build and retrieval invariants can be checked without the embedding model
+"""
+
+import sys
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from src.rag.rag_kb_setup import CPAKnowledgeBaseBuilder
+
+PDF_PATH = REPO_ROOT / "data" / "raw" / "CPA2019.pdf"
+STUB_DIMENSION = 384
+
+
+class StubEncoder:
+    """Deterministic stand-in for the sentence transformer: one seeded vector per text"""
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, **kwargs):
+        return np.array([
+            np.random.default_rng(zlib.crc32(text.encode('utf-8'))).normal(size=STUB_DIMENSION)
+            for text in texts
+        ], dtype=np.float32)
+
+
+def build_knowledge_base(output_dir: Path, streaming: bool = False) -> Path:
+    """Force a full build of the bundled act into output_dir with the stub encoder"""
+    builder = CPAKnowledgeBaseBuilder(PDF_PATH, output_dir, load_model=False)
+    builder.embedding_model = StubEncoder()
+    builder.streaming = streaming
+    builder.stream_batch_size = 16
+    try:
+        builder.build(force=True)
+    finally:
+        builder.close()
+    return output_dir
+
+
+@pytest.fixture(scope="session")
+def batch_kb(tmp_path_factory) -> Path:
+    return build_knowledge_base(tmp_path_factory.mktemp("batch_kb"))
+
+
+@pytest.fixture(scope="session")
+def streaming_kb(tmp_path_factory) -> Path:
+    return build_knowledge_base(tmp_path_factory.mktemp("streaming_kb"), streaming=True)
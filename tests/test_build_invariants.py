@@ -0,0 +1,49 @@
+"""
+NyayaSetu AI - Build invariant tests
+A streaming build must write the same knowledge base as a batch build, and the
+manifest must be reproducible byte for byte
+"""
+
+import json
+
+import numpy as np
+
+from src.rag.kb_manifest import ManifestWriter, assemble_manifest, save_manifest
+from src.rag.kb_store import load_embedding_store
+
+from conftest import build_knowledge_base
+
+
+def test_streaming_build_matches_batch_build(batch_kb, streaming_kb):
+    for name in ("knowledge_base.json", "manifest.json"):
+        assert (streaming_kb / name).read_bytes() == (batch_kb / name).read_bytes(), name
+
+    # The streaming writer pads the .npy header to a fixed size, so compare the arrays
+    batch_embeddings, batch_records = load_embedding_store(batch_kb, mmap=False)
+    streaming_embeddings, streaming_records = load_embedding_store(streaming_kb, mmap=False)
+    assert batch_embeddings.dtype == streaming_embeddings.dtype
+    np.testing.assert_array_equal(streaming_embeddings, batch_embeddings)
+    assert streaming_records == batch_records
+
+
+def test_manifest_is_reproducible(batch_kb, tmp_path):
+    rebuilt = build_knowledge_base(tmp_path / "rebuild")
+    assert (rebuilt / "manifest.json").read_bytes() == (batch_kb / "manifest.json").read_bytes()
+
+
+def test_manifest_writer_matches_save_manifest(batch_kb, tmp_path):
+    manifest = json.loads((batch_kb / "manifest.json").read_text(encoding='utf-8'))
+    for sections, chunks in ((manifest['sections'], manifest['chunks']), ([], [])):
+        expected_dir, written_dir = tmp_path / "expected", tmp_path / "written"
+        expected_dir.mkdir(exist_ok=True)
+        written_dir.mkdir(exist_ok=True)
+        save_manifest(assemble_manifest(manifest['source'], manifest['config'], sections, chunks), expected_dir)
+
+        writer = ManifestWriter(manifest['source'], manifest['config'])
+        for entry in sections:
+            writer.add_section(entry)
+        for entry in chunks:
+            writer.add_chunk(entry)
+        written = writer.save(written_dir)
+
+        assert written.read_bytes() == (expected_dir / written.name).read_bytes()
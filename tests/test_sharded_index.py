@@ -0,0 +1,63 @@
+"""
+NyayaSetu AI - Sharded index tests
+Scatter-gather search over shards must return the same top-k as a single-process scan
+"""
+
+import numpy as np
+import pytest
+
+from src.rag.kb_index import KnowledgeBaseIndex
+from src.rag.kb_store import save_embedding_store
+from src.rag.sharded_index import ShardedIndex
+
+ACTS = ("Consumer Protection Act, 2019", "Legal Metrology Act, 2009", "Food Safety and Standards Act, 2006")
+TOP_K = 7
+
+
+@pytest.fixture(scope="module", params=["float32", "float16"])
+def multi_act_store(request, tmp_path_factory):
+    """Store of interleaved acts, with repeated vectors so shards must break ties alike"""
+    rng = np.random.default_rng(7)
+    vectors = rng.normal(size=(120, 32)).astype(np.float32)
+    vectors[60:80] = vectors[:20]
+    chunks = [
+        {'text': f"chunk {i}", 'embedding': vector.tolist(),
+         'metadata': {'act': ACTS[i % len(ACTS)], 'chapter': f"Chapter {i % 4}",
+                      'section': f"Section {i % 10}", 'language': "English"}}
+        for i, vector in enumerate(vectors)
+    ]
+    store_dir = tmp_path_factory.mktemp(f"store_{request.param}")
+    save_embedding_store(chunks, store_dir, dtype=request.param)
+    return store_dir
+
+
+def query_matrix(dimension: int) -> np.ndarray:
+    return np.random.default_rng(11).normal(size=(6, dimension)).astype(np.float32)
+
+
+def assert_same_results(sharded, single):
+    assert len(sharded) == len(single)
+    for sharded_results, single_results in zip(sharded, single):
+        assert [(r['text'], r['similarity']) for r in sharded_results] == \
+               [(r['text'], r['similarity']) for r in single_results]
+
+
+@pytest.mark.parametrize("by, n_shards", [("rows", 3), ("rows", 1), ("act", None), ("act", 2)])
+@pytest.mark.parametrize("filters", [None, {'act': ACTS[1]}, {'chapter': "Chapter 2", 'act': [ACTS[0], ACTS[2]]}])
+def test_sharded_top_k_matches_single_process(multi_act_store, by, n_shards, filters):
+    single = KnowledgeBaseIndex.from_store(multi_act_store)
+    # Stored vectors as queries score their duplicates equally, so ties must merge alike
+    queries = np.vstack([query_matrix(single.dimension), np.asarray(single.embeddings[60:62], dtype=np.float32)])
+    expected = single.search_matrix(queries, top_k=TOP_K, filters=filters)
+
+    with ShardedIndex(multi_act_store, n_shards=n_shards, by=by) as sharded:
+        assert_same_results(sharded.search_matrix(queries, top_k=TOP_K, filters=filters), expected)
+
+
+def test_sharded_top_k_matches_single_process_on_built_kb(batch_kb):
+    single = KnowledgeBaseIndex.from_store(batch_kb)
+    queries = query_matrix(single.dimension)
+    expected = single.search_matrix(queries, top_k=TOP_K)
+
+    with ShardedIndex(batch_kb, n_shards=4) as sharded:
+        assert_same_results(sharded.search_matrix(queries, top_k=TOP_K), expected)